@@ -0,0 +1,71 @@
+"""
+Benchmark of the sequential vs. concurrent vs. batched AI categorization against the local fake OpenAI server.
+
+Usage (from the repository root):
+python benchmarks/bench_ai_concurrency.py --transactions 50 --latency 0.2 --workers 1 4 16 --batch-sizes 10 50
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('OPENAI_API_KEY', 'fake-key')
+
+from fake_openai_server import start_fake_server
+from AI_categorization import generate_categories_batch, generate_categories_concurrent, generate_category, make_client
+import AI_categorization
+
+categories_csv = './config/categories.csv'
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests-per-minute', type=float, default=None)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--invalid-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(args.latency, args.failure_rate, invalid_rate=args.invalid_rate)
+    client = make_client(base_url=base_url, api_key='fake-key')
+    # Merchant names without digits, so that the descriptions are not merged by the digit masking
+    descriptions = [(f"FAKE MERCHANT {chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i // 676)} TORONTO ON", '')
+                    for i in range(args.transactions)]
+
+    # Sequential baseline: one blocking request per transaction
+    AI_categorization.client = client
+    start = time.perf_counter()
+    for description1, description2 in descriptions:
+        generate_category(description1, description2, categories_csv, use_cache=False)
+    sequential = time.perf_counter() - start
+    print(f"sequential: {sequential:8.3f} s")
+
+    for workers in args.workers:
+        server.request_count = 0
+        start = time.perf_counter()
+        results = generate_categories_concurrent(descriptions, categories_csv, max_workers=workers,
+                                                 requests_per_minute=args.requests_per_minute,
+                                                 backoff=0.05, client=client, use_cache=False)
+        elapsed = time.perf_counter() - start
+        assert len(results) == len(descriptions)
+        print(f"workers={workers:3d}: {elapsed:8.3f} s  speedup {sequential / elapsed:6.2f}x  requests {server.request_count}")
+
+    for batch_size in args.batch_sizes:
+        server.request_count = 0
+        start = time.perf_counter()
+        results = generate_categories_batch(descriptions, categories_csv, batch_size=batch_size,
+                                            max_workers=max(args.workers),
+                                            requests_per_minute=args.requests_per_minute,
+                                            backoff=0.05, client=client, use_cache=False)
+        elapsed = time.perf_counter() - start
+        valid = sum(result is not None for result in results)
+        print(f"batch={batch_size:5d}: {elapsed:8.3f} s  speedup {sequential / elapsed:6.2f}x  requests {server.request_count}  valid {valid}/{len(results)}")
+
+    server.shutdown()
+#}}}
+
+if __name__ == "__main__":
+    main()
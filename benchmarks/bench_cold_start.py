@@ -0,0 +1,78 @@
+"""
+Benchmark of the cold start of the CLI and of the pipeline modules: every case runs in a fresh interpreter,
+the median wall time of the runs is compared with the target, and the heavy optional modules (openai,
+Google API, matplotlib) must not be imported by any of them.
+Exits with status 1 if a case is over its target or imports a heavy module, so it can guard against regressions.
+
+Usage (from the repository root):
+python benchmarks/bench_cold_start.py --runs 5 --target 0.3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+heavy_modules = ['openai', 'googleapiclient', 'matplotlib']
+
+# Case name -> (code run in a fresh interpreter with src on the path, kind of target)
+# The pipeline modules need pandas, so their target is relative to a bare 'import pandas'
+cases = {
+    'cli --help': ("import cli\ntry:\n    cli.main(['--help'])\nexcept SystemExit:\n    pass", 'target'),
+    'cli parse import': ("import cli\ncli.build_parser().parse_args(['import', '--incremental'])", 'target'),
+    'import pandas (reference)': ("import pandas", None),
+    'import AI_categorization': ("import AI_categorization", 'target'),
+    'import extract_from_csv': ("import extract_from_csv", 'pandas'),
+}
+
+def run_case(code, runs): #{{{
+    """
+    Runs the code in runs fresh interpreters.
+
+    Returns:
+    tuple: (median wall time in seconds, heavy modules imported, error output or None)
+    """
+    probe = code + f"\nimport sys\nprint('HEAVY:' + ','.join(m for m in {heavy_modules!r} if m in sys.modules))"
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(repo_dir, 'src'), os.environ.get('PYTHONPATH', '')]))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, env=environment, cwd=repo_dir)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None, [], result.stderr.strip().splitlines()[-1]
+    loaded = [module for module in result.stdout.rsplit('HEAVY:', 1)[-1].strip().split(',') if module]
+    return statistics.median(times), loaded, None
+#}}}
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target', type=float, default=0.3, help="Target for the CLI cases in seconds")
+    parser.add_argument('--pipeline-overhead', type=float, default=0.5,
+                        help="Allowed time of the pipeline modules on top of 'import pandas' in seconds")
+    args = parser.parse_args()
+
+    failed = False
+    reference = None
+    for name, (code, target_kind) in cases.items():
+        median, loaded, error = run_case(code, args.runs)
+        if error is not None:
+            # e.g. a module missing from the environment: the case is not timed, and counts as failed
+            print(f"{name:<28} not timed, the code failed: {error}")
+            failed = True
+            continue
+        if target_kind is None:
+            reference = median
+        target = {'target': args.target, 'pandas': (reference or 0) + args.pipeline_overhead}.get(target_kind)
+        over = target is not None and median > target
+        failed = failed or over or bool(loaded)
+        print(f"{name:<28} {median:7.3f} s" + (f"  (target {target:.3f} s{', OVER' if over else ''})" if target else '')
+              + (f"  imports {', '.join(loaded)}" if loaded else ''))
+    sys.exit(1 if failed else 0)
+#}}}
+
+if __name__ == "__main__":
+    main()
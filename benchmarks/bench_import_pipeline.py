@@ -0,0 +1,144 @@
+"""
+Benchmark of the import pipeline of extract_from_csv.main on synthetic inputs (see synthetic_data.py).
+Every stage is timed separately (wall and CPU time) and its peak of traced memory is recorded:
+ingest, account translation, categorization by the mappings, AI categorization (against the local fake
+OpenAI server), transfer matching, conversion to the MM format, history load (cold from the workbook and warm
+from the Parquet cache), join+dedup and write.
+
+Peak memory is measured with tracemalloc in a second run on the same inputs, since tracing distorts the times.
+It covers the allocations of Python, numpy and pandas, but not the ones made inside pyarrow.
+
+Usage (from the repository root):
+python benchmarks/bench_import_pipeline.py --sizes 1000 10000 100000 1000000 --json ./data/bench_import.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('OPENAI_API_KEY', 'fake-key')
+
+from fake_openai_server import start_fake_server
+from synthetic_data import write_synthetic_inputs
+from AI_categorization import generate_categories_batch, make_client
+from bank_formats import load_bank_formats, read_bank_csv, translate_accounts
+from description_index import DescriptionIndex
+from extract_from_csv import (add_categorization_columns, assign_amount_columns, categorize_df_batch, cleanup_df,
+                              finalize_MMxlsx_df, identify_transferout_transactions, join_dfs, read_account_translations)
+from history_store import load_history
+from writers import write_mm_tsv
+
+bank_formats_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'bank_formats.json')
+
+def run_stage(measurements, stage, function, *args, **kwargs): #{{{
+    """
+    Runs one stage of the pipeline and records its wall and CPU time, or its peak of traced memory
+    if tracemalloc is tracing.
+    """
+    gc.collect()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    result = function(*args, **kwargs)
+    measurement = measurements.setdefault(stage, {'stage': stage})
+    if tracing:
+        measurement['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+    else:
+        measurement['wall_s'] = round(time.perf_counter() - start_wall, 4)
+        measurement['cpu_s'] = round(time.process_time() - start_cpu, 4)
+    return result
+#}}}
+
+def categorize_with_ai(df, categories_csv, client, batch_size): #{{{
+    """
+    Categorizes the rows not resolved by the mappings with the batched AI categorization.
+    """
+    unresolved = df['Category'].isna()
+    descriptions = list(df.loc[unresolved, ['Description 1', 'Description 2']].fillna('').itertuples(index=False, name=None))
+    unique_descriptions = list(dict.fromkeys(descriptions))
+    contents = generate_categories_batch(unique_descriptions, categories_csv, batch_size=batch_size,
+                                         client=client, use_cache=False, backoff=0.05)
+    replies = {description: (content or '\n\n').split('\n', 2) for description, content in zip(unique_descriptions, contents)}
+    rows = [replies[description] for description in descriptions]
+    df.loc[unresolved, ['Category', 'Subcategory', 'Note']] = rows if rows else None
+    return df
+#}}}
+
+def bench_size(measurements, size, history_rows, args, client, directory): #{{{
+    """
+    Generates the inputs of one size and runs all stages on them.
+    """
+    transactions_file, account_translations_file, categorizer_csv, categories_csv, total_xlsx = write_synthetic_inputs(
+        directory, size, history_rows, args.accounts, int(size * args.transfer_rate), args.duplicate_rate,
+        args.unmatched_rate)
+    spec = load_bank_formats(bank_formats_file)['RBC']
+    mappings_df = pd.read_csv(categorizer_csv)
+    description_index = DescriptionIndex(mappings_df, partial_match=args.partial_match)
+    cache_dir = os.path.join(directory, 'cache')
+
+    df = run_stage(measurements, 'ingest', read_bank_csv, transactions_file, spec)
+    df = run_stage(measurements, 'account translation', translate_accounts, df,
+                   read_account_translations(account_translations_file))
+    df = run_stage(measurements, 'categorization (mappings)', lambda df: categorize_df_batch(
+        add_categorization_columns(df), mappings_df, None, None, fallback=False, description_index=description_index), df)
+    df = run_stage(measurements, 'categorization (AI stub)', categorize_with_ai, df, categories_csv, client, args.batch_size)
+    df = assign_amount_columns(df)
+    df = run_stage(measurements, 'transfer matching', identify_transferout_transactions, df)
+    df = run_stage(measurements, 'convert to MM format', finalize_MMxlsx_df, df)
+    run_stage(measurements, 'history load (workbook)', load_history, total_xlsx, cache_dir=cache_dir)
+    df_total = run_stage(measurements, 'history load (cache)', load_history, total_xlsx, cache_dir=cache_dir)
+    df_joined = run_stage(measurements, 'join+dedup', lambda: cleanup_df(join_dfs(df, df_total)))
+    run_stage(measurements, 'write tsv', write_mm_tsv, df_joined, os.path.join(directory, 'Funds2.tsv'))
+#}}}
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--history-rows', type=int, default=None, help="Rows of the history workbook. Default is the size")
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--transfer-rate', type=float, default=0.02, help="Transfer pairs per row")
+    parser.add_argument('--duplicate-rate', type=float, default=0.01)
+    parser.add_argument('--unmatched-rate', type=float, default=0.1)
+    parser.add_argument('--ai-latency', type=float, default=0.0)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--partial-match', action='store_true', help="Also match the rules by Description 1 only and as substrings")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="Skip the peak memory run")
+    parser.add_argument('--json', default=None, help="Path of the JSON report")
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(args.ai_latency)
+    client = make_client(base_url=base_url, api_key='fake-key')
+    report = []
+    try:
+        for size in args.sizes:
+            measurements = {}
+            # Times are measured without tracemalloc, which slows Python-heavy stages down several times,
+            # and the memory in a second run on the same inputs
+            for trace_memory in [False, True] if args.memory else [False]:
+                if trace_memory:
+                    tracemalloc.start()
+                with tempfile.TemporaryDirectory() as directory:
+                    bench_size(measurements, size, args.history_rows or size, args, client, directory)
+                tracemalloc.stop()
+            for measurement in measurements.values():
+                report.append({'rows': size, **measurement})
+                print(f"{size:>9} {measurement['stage']:<28} {measurement['wall_s']:9.3f} s {measurement['cpu_s']:9.3f} s cpu"
+                      + (f" {measurement['peak_mb']:10.1f} MB" if 'peak_mb' in measurement else ''))
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({'arguments': vars(args), 'stages': report}, json_file, indent=2)
+#}}}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark of the SQL aggregations of mmbak_analysis_lib.aggregations against the pandas equivalent
+(loading the raw INOUTCOME rows and the lookup tables, joining and grouping in pandas), on synthetic backups
+(see synthetic_mmbak.py). Both give the same totals, which is checked for every case.
+
+The time is the median of the runs; the peak memory is measured with tracemalloc in a separate run, since
+tracing distorts the times. It covers the memory of Python and pandas, not the one used inside SQLite.
+
+Usage (from the repository root):
+python benchmarks/bench_mmbak_aggregations.py --sizes 100000 1000000 --runs 3
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mmbak_analysis_lib.aggregations import aggregate_transactions
+from mmbak_analysis_lib.connection_pool import close_pools
+from mmbak_analysis_lib.db_driver import DbDriver
+from synthetic_mmbak import write_synthetic_mmbak
+
+# Case name -> (grouping keys, period)
+cases = {
+    'category per month': (('category',), 'month'),
+    'category/subcategory per week': (('category', 'subcategory'), 'week'),
+    'account per day': (('account',), 'day'),
+    'category/currency per year': (('category', 'currency'), 'year'),
+}
+# Grouping keys -> column of the joined pandas frame
+pandas_columns = {'category': 'Category', 'subcategory': 'Subcategory', 'account': 'Account', 'currency': 'Currency'}
+
+def pandas_aggregation(db_file, by, period): #{{{
+    """
+    The pandas equivalent of aggregate_transactions for the expenses: all rows are loaded, then joined and grouped.
+    """
+    db_driver = DbDriver(db_file)
+    df = db_driver.query_to_dataframe("SELECT ZDATE, DO_TYPE, IS_DEL, ZMONEY, ctgUid, assetUid, currencyUid FROM INOUTCOME")
+    category_df = db_driver.query_to_dataframe("SELECT uid, NAME, pUid FROM ZCATEGORY")
+    asset_df = db_driver.query_to_dataframe("SELECT uid, NIC_NAME FROM ASSET")
+    currency_df = db_driver.query_to_dataframe("SELECT uid, ISO FROM CURRENCY")
+    db_driver.close()
+
+    df = df[(df['IS_DEL'].fillna(0) == 0) & (df['DO_TYPE'] == 1)]
+    names = category_df.set_index('uid')['NAME']
+    parents = category_df.set_index('uid')['pUid']
+    parent = df['ctgUid'].map(parents)
+    df = df.assign(
+        Category=parent.map(names).fillna(df['ctgUid'].map(names)),
+        Subcategory=df['ctgUid'].map(names).where(parent.notna()),
+        Account=df['assetUid'].map(asset_df.set_index('uid')['NIC_NAME']),
+        Currency=df['currencyUid'].map(currency_df.set_index('uid')['ISO']),
+    )
+    dates = pd.to_datetime(df['ZDATE'], unit='ms')
+    df['Period'] = {'day': dates.dt.normalize(),
+                    'week': (dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.normalize(),
+                    'month': dates.dt.to_period('M').dt.to_timestamp(),
+                    'year': dates.dt.to_period('Y').dt.to_timestamp()}[period]
+    keys = ['Period'] + [pandas_columns[key] for key in by]
+    return df.groupby(keys, dropna=False).agg(Amount=('ZMONEY', 'sum'), Count=('ZMONEY', 'size')).reset_index()
+#}}}
+
+def measure(function, runs): #{{{
+    """
+    Returns the result of the function, the median time of the runs and the peak of traced memory of one more run.
+    """
+    times = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, statistics.median(times), peak / 1e6
+#}}}
+
+def same_totals(sql_df, pandas_df): #{{{
+    """
+    Checks that both aggregations give the same groups, totals and counts.
+    """
+    if len(sql_df) != len(pandas_df):
+        return False
+    keys = [column for column in sql_df.columns if column not in ('Amount', 'Count')]
+    sql_df = sql_df.astype({key: object for key in keys if key != 'Period'}).sort_values(keys, na_position='first')
+    pandas_df = pandas_df.sort_values(keys, na_position='first')
+    return (np.allclose(sql_df['Amount'].to_numpy(dtype=float), pandas_df['Amount'].to_numpy(dtype=float))
+            and (sql_df['Count'].to_numpy(dtype=int) == pandas_df['Count'].to_numpy(dtype=int)).all())
+#}}}
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            db_file = write_synthetic_mmbak(os.path.join(directory, f'synthetic_{size}.mmbak'), size)
+            print(f"{size} transactions ({os.path.getsize(db_file) / 1e6:.1f} MB)")
+            for name, (by, period) in cases.items():
+                sql_df, sql_time, sql_peak = measure(lambda: aggregate_transactions(db_file, by, period), args.runs)
+                pandas_df, pandas_time, pandas_peak = measure(lambda: pandas_aggregation(db_file, by, period), args.runs)
+                check = 'same totals' if same_totals(sql_df, pandas_df) else 'DIFFERENT TOTALS'
+                print(f"  {name:<32} SQL {sql_time:7.3f} s {sql_peak:8.1f} MB   pandas {pandas_time:7.3f} s {pandas_peak:8.1f} MB"
+                      f"   {len(sql_df)} groups, {check}")
+            close_pools()
+#}}}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark of the sidecar rollups of mmbak_analysis_lib.rollups on synthetic backups (see synthetic_mmbak.py):
+the first sync of a backup, the incremental sync of a later backup (with updated, deleted and new transactions),
+the sync of an unchanged backup, and the reports answered from the rollups against the same reports computed
+over INOUTCOME (aggregations.aggregate_transactions). Both give the same totals, which is checked for every report.
+The rollups have one row per day (or month) and DO_TYPE, account, category and currency, so the gain grows with the
+number of transactions per such key: few categories and accounts over many years give the smallest rollups.
+
+Usage (from the repository root):
+python benchmarks/bench_mmbak_rollups.py --sizes 100000 1000000 --runs 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mmbak_analysis_lib.aggregations import aggregate_transactions
+from mmbak_analysis_lib.connection_pool import close_pools
+from mmbak_analysis_lib.rollups import RollupStore
+from synthetic_mmbak import modify_mmbak, write_synthetic_mmbak
+
+# Report name -> arguments of the query
+reports = {
+    'category per month': dict(by=('category',), period='month'),
+    'account per year, all types': dict(by=('account', 'type'), period='year', types=(0, 1, 3)),
+    'category per week, one year': dict(by=('category',), period='week', start='2015-01-01', end='2016-01-01'),
+    'currency per month, mid-month range': dict(by=('currency',), period='month', start='2012-03-15', end='2018-09-15'),
+}
+
+def timed(function, runs=1): #{{{
+    """
+    Returns the result of the function and the median time of the runs.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+#}}}
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--subcategories', type=int, default=4)
+    parser.add_argument('--accounts', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            first_file = write_synthetic_mmbak(os.path.join(directory, f'first_{size}.mmbak'), size, args.categories,
+                                               args.subcategories, args.accounts)
+            second_file = modify_mmbak(first_file, os.path.join(directory, f'second_{size}.mmbak'))
+            store = RollupStore(os.path.join(directory, f'rollups_{size}.sqlite'))
+            print(f"{size} transactions")
+            for name, file in (('first sync', first_file), ('incremental sync', second_file), ('unchanged backup', second_file)):
+                counts, seconds = timed(lambda: store.sync(file))
+                print(f"  {name:<36} {seconds:8.3f} s   {counts['changed']} changed, {counts['removed']} removed")
+            print("  rollup rows: " + ', '.join(f"{table} {store.connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]}"
+                                                for table in ('rollup_daily', 'rollup_monthly')))
+            for name, kwargs in reports.items():
+                rollup_df, rollup_time = timed(lambda: store.query(**kwargs), args.runs)
+                full_df, full_time = timed(lambda: aggregate_transactions(second_file, **kwargs), args.runs)
+                same = (len(rollup_df) == len(full_df)
+                        and np.allclose(rollup_df['Amount'].to_numpy(dtype=float), full_df['Amount'].to_numpy(dtype=float))
+                        and (rollup_df['Count'].to_numpy(dtype=int) == full_df['Count'].to_numpy(dtype=int)).all())
+                print(f"  {name:<36} rollups {rollup_time * 1000:8.1f} ms   INOUTCOME {full_time * 1000:8.1f} ms"
+                      f"   {len(rollup_df)} rows, {'same totals' if same else 'DIFFERENT TOTALS'}")
+            store.close()
+            close_pools()
+#}}}
+
+if __name__ == "__main__":
+    main()
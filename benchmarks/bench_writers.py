@@ -0,0 +1,63 @@
+"""
+Benchmark of the output writers on a synthetic Money Manager history:
+pandas/openpyxl workbook built in memory vs. streaming write-only xlsx, full TSV rewrite vs. appending only
+the new rows, and a Parquet copy as the binary reference.
+
+Usage (from the repository root):
+python benchmarks/bench_writers.py --rows 100000 --new-rows 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dates import format_date_columns
+from schema import format_money_columns
+from synthetic_data import generate_history
+from writers import write_mm_tsv, write_mm_xlsx
+
+def timed(name, function): #{{{
+    start = time.perf_counter()
+    function()
+    print(f"{name:<40} {time.perf_counter() - start:8.2f} s")
+#}}}
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--new-rows', type=int, default=500)
+    parser.add_argument('--skip-inmemory-xlsx', action='store_true', help="Skip the slow in-memory openpyxl writer")
+    args = parser.parse_args()
+
+    df = generate_history(args.rows)
+    df_new = generate_history(args.new_rows, seed=2).drop(columns='Account.1')
+    print(f"{args.rows} rows of history, {args.new_rows} new rows")
+
+    with tempfile.TemporaryDirectory() as directory:
+        def path(name):
+            return os.path.join(directory, name)
+
+        def inmemory_xlsx():
+            # The previous writer: the whole workbook is built by openpyxl in memory
+            formatted = format_money_columns(format_date_columns(df))
+            formatted.columns = formatted.columns[:-1].tolist() + ['Account']
+            with pd.ExcelWriter(path('inmemory.xlsx'), engine='openpyxl') as writer:
+                formatted.to_excel(writer, sheet_name='Money Manager', index=False)
+
+        if not args.skip_inmemory_xlsx:
+            timed('xlsx, openpyxl in memory', inmemory_xlsx)
+        timed('xlsx, streaming write-only', lambda: write_mm_xlsx(df, path('streaming.xlsx')))
+        timed('tsv, full rewrite', lambda: write_mm_tsv(df, path('Funds2.tsv')))
+        timed('tsv, append of the new rows', lambda: write_mm_tsv(df_new, path('Funds2.tsv'), append=True))
+        timed('parquet (binary reference)', lambda: df.to_parquet(path('history.parquet'), index=False))
+
+        for name in sorted(os.listdir(directory)):
+            print(f"{name:<40} {os.path.getsize(path(name)) / 1e6:8.2f} MB")
+#}}}
+
+if __name__ == "__main__":
+    main()
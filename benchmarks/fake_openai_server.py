@@ -0,0 +1,118 @@
+"""
+Local stand-in for the OpenAI chat completions API, used to test and benchmark the AI categorization
+without network access or costs. Point the client to it with base_url (or $OPENAI_BASE_URL).
+
+Usage:
+python benchmarks/fake_openai_server.py --port 8000 --latency 0.5
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler): #{{{
+    """
+    Answers every POST .../chat/completions with a fixed categorization after the injected latency.
+    Requests with JSON output (batched categorization) get a JSON object with a reply for every transaction id.
+    A fraction of the requests can be answered with HTTP 429 (with a Retry-After header if retry_after is set)
+    to exercise the retries, and a fraction of
+    the batched transactions with an unknown category to exercise the validation.
+    """
+    latency = 0.0
+    failure_rate = 0.0
+    invalid_rate = 0.0
+    retry_after = None
+    content = "Other\n\nFake Vendor"
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        self.server.request_count += 1
+        time.sleep(self.latency)
+
+        if not self.path.endswith('/chat/completions'):
+            self._send(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        if random.random() < self.failure_rate:
+            headers = {'Retry-After': str(self.retry_after)} if self.retry_after is not None else {}
+            self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error'}}, headers)
+            return
+
+        content = self.content
+        if request.get('response_format', {}).get('type') == 'json_object':
+            transactions = json.loads(request['messages'][-1]['content'])
+            content = json.dumps({
+                transaction_id: {
+                    'category': 'Unknown Category' if random.random() < self.invalid_rate else 'Other',
+                    'subcategory': '',
+                    'vendor': 'Fake Vendor',
+                }
+                for transaction_id in transactions
+            })
+
+        self._send(200, {
+            'id': f'chatcmpl-fake-{self.server.request_count}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        })
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+#}}}
+
+def start_fake_server(latency=0.0, failure_rate=0.0, port=0, invalid_rate=0.0, retry_after=None): #{{{
+    """
+    Start the fake server in a background thread.
+
+    Args:
+    latency (float): Delay before every response in seconds.
+    failure_rate (float): Fraction of the requests answered with HTTP 429.
+    port (int): Port to listen on. Default is 0 (any free port).
+    invalid_rate (float): Fraction of the batched transactions answered with an unknown category.
+    retry_after (float, optional): Value of the Retry-After header of the HTTP 429 responses, in seconds.
+
+    Returns:
+    tuple: (server, base_url). Call server.shutdown() to stop it; server.request_count counts the requests.
+    """
+    handler = type('ConfiguredFakeOpenAIHandler', (FakeOpenAIHandler,),
+                   {'latency': latency, 'failure_rate': failure_rate, 'invalid_rate': invalid_rate,
+                    'retry_after': retry_after})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+#}}}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--invalid-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    server, base_url = start_fake_server(args.latency, args.failure_rate, args.port, args.invalid_rate)
+    print(f"Fake OpenAI server listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
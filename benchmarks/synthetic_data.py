@@ -0,0 +1,215 @@
+"""
+Generator of synthetic inputs for the import pipeline: RBC-format statement CSVs, Money Manager history workbooks
+and the config files (account translations, mappings, categories) that go with them.
+
+Usage (from the repository root):
+python benchmarks/synthetic_data.py --rows 10000 --history-rows 10000 --output ./data/synthetic
+"""
+import argparse
+import os
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from schema import enforce_schema
+from writers import write_mm_xlsx
+
+repo_config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config')
+rbc_columns = ["Account Type", "Account Number", "Transaction Date", "Cheque Number", "Description 1", "Description 2", "CAD$", "USD$"]
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def account_numbers(accounts): #{{{
+    """
+    Returns the RBC account numbers and MM account names of the synthetic accounts.
+    """
+    return [str(1000 + i) for i in range(accounts)], [f"Synthetic Account {chr(65 + i % 26)}{i // 26}" for i in range(accounts)]
+#}}}
+
+def unmatched_descriptions(count): #{{{
+    """
+    Returns count distinct merchant names unknown to the mappings. Letters only, so that the
+    digit masking of the description keys does not merge them.
+    """
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    names = [''.join(letters[i // 26 ** power % 26] for power in range(5)) for i in range(count)]
+    return [f"SYNTHETIC MERCHANT {name} TORONTO ON" for name in names]
+#}}}
+
+def generate_statement(rows, mappings_df, accounts=3, transfer_pairs=0, duplicate_rate=0.0, unmatched_rate=0.1,
+                       start_date='2023-01-01', days=365, seed=0): #{{{
+    """
+    Generates an RBC transactions export.
+
+    Args:
+    rows (int): Total number of rows, including the transfer pairs and the duplicates.
+    mappings_df (pd.DataFrame): Mappings of the descriptions, the known descriptions are taken from it.
+    accounts (int): Number of accounts.
+    transfer_pairs (int): Number of transfers between the accounts (an expense and an income of the same amount).
+    duplicate_rate (float): Fraction of the rows that repeat another row (as in overlapping exports).
+    unmatched_rate (float): Fraction of the rows with descriptions unknown to the mappings (sent to the AI).
+    start_date (str): Date of the first transaction.
+    days (int): Number of days covered by the statement.
+    seed (int): Seed of the random generator.
+
+    Returns:
+    pd.DataFrame: Transactions with the RBC columns, dates formatted as in the exports.
+    """
+    rng = np.random.default_rng(seed)
+    numbers, _ = account_numbers(accounts)
+    duplicates = int(rows * duplicate_rate)
+    transfer_pairs = min(transfer_pairs, (rows - duplicates) // 2)
+    plain = rows - duplicates - 2 * transfer_pairs
+
+    # Known descriptions, with the masked digits filled in
+    known = mappings_df[['Description 1', 'Description 2']].fillna('').astype(str)
+    known = known.apply(lambda column: column.str.replace('*', '7', regex=False))
+    unmatched = rng.random(plain) < unmatched_rate
+    choice = rng.integers(0, len(known), plain)
+    description1 = known['Description 1'].to_numpy()[choice].astype(object)
+    description2 = known['Description 2'].to_numpy()[choice].astype(object)
+    unknown_names = np.array(unmatched_descriptions(max(1, int(unmatched.sum()) // 4)), dtype=object)
+    description1[unmatched] = unknown_names[rng.integers(0, len(unknown_names), int(unmatched.sum()))]
+    description2[unmatched] = ''
+    amounts = np.round(rng.lognormal(3, 1.2, plain), 2) * np.where(rng.random(plain) < 0.1, 1, -1)
+    df = pd.DataFrame({
+        'Account Number': np.array(numbers)[rng.integers(0, accounts, plain)],
+        'Day': rng.integers(0, days, plain),
+        'Description 1': description1,
+        'Description 2': description2,
+        'CAD$': amounts,
+    })
+
+    if transfer_pairs:
+        source = rng.integers(0, accounts, transfer_pairs)
+        target = (source + rng.integers(1, max(accounts, 2), transfer_pairs)) % accounts
+        day = rng.integers(0, days, transfer_pairs)
+        amount = np.round(rng.uniform(10, 2000, transfer_pairs), 2)
+        transfers = pd.DataFrame({
+            'Account Number': np.concatenate([np.array(numbers)[source], np.array(numbers)[target]]),
+            'Day': np.concatenate([day, day]),
+            'Description 1': np.concatenate([np.full(transfer_pairs, 'Transfer'), np.full(transfer_pairs, 'Transfer')]),
+            'Description 2': np.concatenate([np.full(transfer_pairs, 'WWW TRANSFER - 7777 '), np.full(transfer_pairs, 'WWW TRANSFER - 7777 ')]),
+            'CAD$': np.concatenate([-amount, amount]),
+        })
+        df = pd.concat([df, transfers], ignore_index=True)
+    if duplicates:
+        df = pd.concat([df, df.iloc[rng.integers(0, len(df), duplicates)]], ignore_index=True)
+
+    df = df.sort_values('Day', kind='stable', ignore_index=True)
+    dates = pd.Timestamp(start_date) + pd.to_timedelta(df['Day'], unit='D')
+    return pd.DataFrame({
+        'Account Type': 'Chequing',
+        'Account Number': df['Account Number'],
+        'Transaction Date': dates.dt.strftime('%m/%d/%Y'),
+        'Cheque Number': '',
+        'Description 1': df['Description 1'],
+        'Description 2': df['Description 2'],
+        'CAD$': df['CAD$'],
+        'USD$': '',
+    }, columns=rbc_columns)
+#}}}
+
+def generate_history(rows, accounts=3, end_date='2022-12-31', days=3650, seed=1): #{{{
+    """
+    Generates the previous transactions in the canonical Money Manager schema.
+
+    Args:
+    rows (int): Number of transactions.
+    accounts (int): Number of accounts.
+    end_date (str): Date of the last transaction.
+    days (int): Number of days covered by the history.
+    seed (int): Seed of the random generator.
+
+    Returns:
+    pd.DataFrame: Transactions with the Money Manager columns (see schema.mm_columns).
+    """
+    rng = np.random.default_rng(seed)
+    _, names = account_numbers(accounts)
+    amounts = rng.integers(100, 200000, rows)
+    df = pd.DataFrame({
+        'Date': pd.Timestamp(end_date) - pd.to_timedelta(np.sort(rng.integers(0, days, rows))[::-1], unit='D'),
+        'Account': np.array(names)[rng.integers(0, accounts, rows)],
+        'Category': rng.choice(['Food', 'Household', 'Transportation', 'Salary'], rows),
+        'Subcategory': rng.choice(['Groceries', 'Eating out', 'Rent', 'Research'], rows),
+        'Note': rng.choice(['Chatime', 'LANDLORD PROP', 'PRESTO', 'U of T'], rows),
+        'CAD': amounts,
+        'Income/Expense': rng.choice(['Expense', 'Income'], rows, p=[0.9, 0.1]),
+        'Description': '',
+        'Amount': amounts,
+        'Currency': 'CAD',
+        'Account.1': amounts,
+    })
+    return enforce_schema(df)
+#}}}
+
+def write_config(directory, accounts=3): #{{{
+    """
+    Writes the config files of the synthetic data: account translations, and copies of the repository
+    mappings and categories.
+
+    Args:
+    directory (str): Directory for the config files.
+    accounts (int): Number of accounts.
+
+    Returns:
+    tuple: Paths of (account translations, mappings, categories).
+    """
+    os.makedirs(directory, exist_ok=True)
+    numbers, names = account_numbers(accounts)
+    account_translations_file = os.path.join(directory, 'accounts.csv')
+    pd.DataFrame({'RBCAccount': numbers, 'MoneyManagerAccount': names}).to_csv(account_translations_file, index=False)
+    categorizer_csv = os.path.join(directory, 'descriptions_categorization.csv')
+    categories_csv = os.path.join(directory, 'categories.csv')
+    shutil.copy(os.path.join(repo_config_dir, 'descriptions_categorization.csv'), categorizer_csv)
+    shutil.copy(os.path.join(repo_config_dir, 'categories.csv'), categories_csv)
+    return account_translations_file, categorizer_csv, categories_csv
+#}}}
+
+def write_synthetic_inputs(directory, rows, history_rows, accounts=3, transfer_pairs=0, duplicate_rate=0.0,
+                           unmatched_rate=0.1, seed=0): #{{{
+    """
+    Writes a complete set of synthetic inputs of the import pipeline.
+
+    Args:
+    directory (str): Output directory.
+    rows (int): Number of rows of the statement.
+    history_rows (int): Number of rows of the history workbook.
+    accounts, transfer_pairs, duplicate_rate, unmatched_rate, seed: See generate_statement.
+
+    Returns:
+    tuple: file_locations in the order expected by extract_from_csv.main.
+    """
+    account_translations_file, categorizer_csv, categories_csv = write_config(os.path.join(directory, 'config'), accounts)
+    os.makedirs(os.path.join(directory, 'data'), exist_ok=True)
+    transactions_file = os.path.join(directory, 'data', 'Funds.csv')
+    total_xlsx = os.path.join(directory, 'data', 'history.xlsx')
+    mappings_df = pd.read_csv(categorizer_csv)
+    generate_statement(rows, mappings_df, accounts, transfer_pairs, duplicate_rate, unmatched_rate,
+                       seed=seed).to_csv(transactions_file, index=False)
+    write_mm_xlsx(generate_history(history_rows, accounts, seed=seed + 1), total_xlsx)
+    return transactions_file, account_translations_file, categorizer_csv, categories_csv, total_xlsx
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--history-rows', type=int, default=10000)
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--transfer-pairs', type=int, default=100)
+    parser.add_argument('--duplicate-rate', type=float, default=0.01)
+    parser.add_argument('--unmatched-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='./data/synthetic')
+    args = parser.parse_args()
+
+    file_locations = write_synthetic_inputs(args.output, args.rows, args.history_rows, args.accounts, args.transfer_pairs,
+                                            args.duplicate_rate, args.unmatched_rate, args.seed)
+    print('\n'.join(file_locations))
+#}}}
+
+if __name__ == "__main__":
+    main()
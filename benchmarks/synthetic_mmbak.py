@@ -0,0 +1,177 @@
+"""
+Generator of synthetic Money Manager backups (mmbak): an INOUTCOME table with income, expense and transfer rows,
+and the ZCATEGORY (with subcategories), ASSET and CURRENCY lookup tables they reference by uid.
+All columns of INOUTCOME listed in mmbak_structure.txt are created, the ones not used by the library stay NULL.
+
+Usage (from the repository root):
+python benchmarks/synthetic_mmbak.py --rows 1000000 --output ./data/synthetic.mmbak
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mmbak_analysis_lib.mmbak_schema import mmbak_dtypes
+
+currencies = [('cur-cad', 'CAD', 'Canadian dollar', '$'), ('cur-usd', 'USD', 'US dollar', 'US$'), ('cur-eur', 'EUR', 'Euro', '€')]
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def lookup_tables(categories=12, subcategories=4, accounts=5): #{{{
+    """
+    Returns the DataFrames of the ZCATEGORY, ASSET and CURRENCY tables.
+    Every category has subcategories numbered from 1; the uids of the transactions point to either.
+    """
+    rows = []
+    for i in range(categories):
+        rows.append((f'ctg-{i}', f'Category {i}', 1, 0, None, None))
+        rows += [(f'ctg-{i}-{j}', f'Subcategory {i}.{j}', 1, 0, f'ctg-{i}', None) for j in range(1, subcategories + 1)]
+    category_df = pd.DataFrame(rows, columns=list(mmbak_dtypes['ZCATEGORY']))
+    asset_df = pd.DataFrame([(f'ast-{i}', f'Account {i}', 1, 0) for i in range(accounts)], columns=list(mmbak_dtypes['ASSET']))
+    currency_df = pd.DataFrame(currencies, columns=list(mmbak_dtypes['CURRENCY']))
+    return category_df, asset_df, currency_df
+#}}}
+
+def generate_inoutcome(rows, category_uids, asset_uids, currency_uids, start_ms=1262304000000, days=3650,
+                       deleted_rate=0.01, first_id=0, seed=1): #{{{
+    """
+    Returns rows of the INOUTCOME table: 75% expenses, 15% income and 10% transfers, spread over days days
+    from start_ms (2010-01-01 by default), with deleted_rate of them deleted.
+
+    Args:
+    rows (int): Number of rows.
+    category_uids, asset_uids, currency_uids (list): uids of the lookup tables.
+    first_id (int): Number of the first row, so that successive calls give distinct uids.
+    seed (int): Seed of the random generator.
+
+    Returns:
+    pd.DataFrame: Rows with the columns used by mmbak_analysis_lib.
+    """
+    rng = np.random.default_rng(seed)
+    do_type = rng.choice(np.array([1, 0, 3]), size=rows, p=[0.75, 0.15, 0.10])
+    zdate = np.sort(start_ms + rng.integers(0, days * 86400000, size=rows))
+    asset = rng.integers(0, len(asset_uids), size=rows)
+    to_asset = (asset + 1 + rng.integers(0, max(len(asset_uids) - 1, 1), size=rows)) % len(asset_uids)
+    money = np.round(rng.lognormal(3.5, 1.0, size=rows), 2)
+    asset_uids = np.asarray(asset_uids, dtype=object)
+    return pd.DataFrame({
+        'uid': [f'tx-{i}' for i in range(first_id, first_id + rows)],
+        'ZDATE': zdate,
+        'WDATE': zdate,
+        'UTIME': zdate + rng.integers(0, 86400000, size=rows),
+        'DO_TYPE': do_type,
+        'ZMONEY': money,
+        'AMOUNT_ACCOUNT': money,
+        'ZCONTENT': [f'Synthetic transaction {i}' for i in range(first_id, first_id + rows)],
+        'ctgUid': np.where(do_type == 3, None, np.asarray(category_uids, dtype=object)[rng.integers(0, len(category_uids), size=rows)]),
+        'currencyUid': np.asarray(currency_uids, dtype=object)[rng.integers(0, len(currency_uids), size=rows)],
+        'assetUid': asset_uids[asset],
+        'toAssetUid': np.where(do_type == 3, asset_uids[to_asset], None),
+        'IS_DEL': (rng.random(rows) < deleted_rate).astype(int),
+        'syncVersion': np.ones(rows, dtype=int),
+    })
+#}}}
+
+def write_synthetic_mmbak(file_path, rows, categories=12, subcategories=4, accounts=5, seed=1): #{{{
+    """
+    Writes a synthetic mmbak file (replacing an existing one).
+
+    Args:
+    file_path (str): Path of the mmbak file.
+    rows (int): Number of INOUTCOME rows.
+    categories (int): Number of top level categories.
+    subcategories (int): Number of subcategories per category.
+    accounts (int): Number of accounts.
+    seed (int): Seed of the random generator.
+
+    Returns:
+    str: Path of the mmbak file.
+    """
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    category_df, asset_df, currency_df = lookup_tables(categories, subcategories, accounts)
+    connection = sqlite3.connect(file_path)
+    try:
+        for table, df in (('ZCATEGORY', category_df), ('ASSET', asset_df), ('CURRENCY', currency_df)):
+            df.to_sql(table, connection, index=False)
+        connection.execute(f"CREATE TABLE INOUTCOME ({', '.join(mmbak_dtypes['INOUTCOME'])})")
+        append_inoutcome(connection, generate_inoutcome(rows, category_df['uid'].tolist(), asset_df['uid'].tolist(),
+                                                        currency_df['uid'].tolist(), seed=seed))
+        connection.commit()
+    finally:
+        connection.close()
+    return file_path
+#}}}
+
+def append_inoutcome(connection, df): #{{{
+    """
+    Inserts the rows into the INOUTCOME table of the connection (not committed).
+    """
+    connection.executemany(f"INSERT INTO INOUTCOME ({', '.join(df.columns)}) VALUES ({', '.join('?' * len(df.columns))})",
+                           df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+#}}}
+
+def modify_mmbak(file_path, new_file_path, updated=0.01, deleted=0.005, inserted=0.01, seed=2): #{{{
+    """
+    Writes a later backup of a synthetic mmbak file: a fraction of the transactions are updated (new amount,
+    UTIME and syncVersion), some are marked deleted (IS_DEL), some are removed, and new ones are inserted.
+
+    Args:
+    file_path (str): Path of the synthetic mmbak file.
+    new_file_path (str): Path of the new backup (replaced if it exists).
+    updated (float): Fraction of the transactions updated.
+    deleted (float): Fraction of the transactions deleted, half marked with IS_DEL and half removed.
+    inserted (float): Number of new transactions, as a fraction of the existing ones.
+    seed (int): Seed of the random generator.
+
+    Returns:
+    str: Path of the new backup.
+    """
+    shutil.copyfile(file_path, new_file_path)
+    rng = np.random.default_rng(seed)
+    connection = sqlite3.connect(new_file_path)
+    try:
+        rows = connection.execute("SELECT COUNT(*) FROM INOUTCOME").fetchone()[0]
+        ids = rng.permutation(rows)
+        updated_ids = ids[:int(rows * updated)]
+        deleted_ids = ids[len(updated_ids):len(updated_ids) + int(rows * deleted)]
+        # The uids are matched through temporary tables, INOUTCOME has no index on uid
+        for name, selected_ids in (('updated', updated_ids), ('marked', deleted_ids[::2]), ('removed', deleted_ids[1::2])):
+            connection.execute(f"CREATE TEMP TABLE {name} (uid TEXT PRIMARY KEY)")
+            connection.executemany(f"INSERT INTO {name} VALUES (?)", [(f'tx-{i}',) for i in selected_ids])
+        connection.execute("UPDATE INOUTCOME SET ZMONEY = ZMONEY + 1, UTIME = UTIME + 1000, syncVersion = syncVersion + 1 "
+                           "WHERE uid IN (SELECT uid FROM temp.updated)")
+        connection.execute("UPDATE INOUTCOME SET IS_DEL = 1, UTIME = UTIME + 1000, syncVersion = syncVersion + 1 "
+                           "WHERE uid IN (SELECT uid FROM temp.marked)")
+        connection.execute("DELETE FROM INOUTCOME WHERE uid IN (SELECT uid FROM temp.removed)")
+        category_uids, asset_uids, currency_uids = (pd.read_sql_query(f"SELECT uid FROM {table}", connection)['uid'].tolist()
+                                              for table in ('ZCATEGORY', 'ASSET', 'CURRENCY'))
+        first_id = int(connection.execute("SELECT MAX(CAST(substr(uid, 4) AS INTEGER)) FROM INOUTCOME").fetchone()[0]) + 1
+        append_inoutcome(connection, generate_inoutcome(int(rows * inserted), category_uids, asset_uids, currency_uids,
+                                                        first_id=first_id, seed=seed))
+        connection.commit()
+    finally:
+        connection.close()
+    return new_file_path
+#}}}
+
+def main(): #{{{
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--subcategories', type=int, default=4)
+    parser.add_argument('--accounts', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='./data/synthetic.mmbak')
+    args = parser.parse_args()
+    write_synthetic_mmbak(args.output, args.rows, args.categories, args.subcategories, args.accounts, args.seed)
+    print(f"Wrote {args.rows} transactions to {args.output}")
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import pandas as pd
+from .db_driver import DbDriver
+from .mmbak_schema import apply_dtypes
+from .transactions import active_condition
+
+# Grouping keys -> SQL expression over INOUTCOME (i) joined with ZCATEGORY (c, and its parent p), ASSET (a) and CURRENCY (cur).
+# Subcategories are the categories with a parent (pUid): their category is the name of the parent.
+group_expressions = {
+    'category': "COALESCE(p.NAME, c.NAME)",
+    'subcategory': "CASE WHEN p.uid IS NOT NULL THEN c.NAME END",
+    'account': "a.NIC_NAME",
+    'currency': "cur.ISO",
+    'type': "i.DO_TYPE",
+}
+# Periods -> SQL expression of the first day of the period of ZDATE (epoch milliseconds, UTC). Weeks start on Monday.
+period_expressions = {
+    'day': "date(i.ZDATE / 1000, 'unixepoch')",
+    'week': "date(i.ZDATE / 1000, 'unixepoch', '-6 days', 'weekday 1')",
+    'month': "strftime('%Y-%m-01', i.ZDATE / 1000, 'unixepoch')",
+    'year': "strftime('%Y-01-01', i.ZDATE / 1000, 'unixepoch')",
+}
+joins = ("LEFT JOIN ZCATEGORY c ON c.uid = i.ctgUid LEFT JOIN ZCATEGORY p ON p.uid = c.pUid "
+         "LEFT JOIN ASSET a ON a.uid = i.assetUid LEFT JOIN CURRENCY cur ON cur.uid = i.currencyUid")
+
+def to_epoch_ms(date):
+    """
+    Converts a date (string, datetime or Timestamp, UTC if naive) to epoch milliseconds, the unit of ZDATE.
+    """
+    return int(pd.Timestamp(date).timestamp() * 1000)
+
+def compile_aggregation(by=('category',), period='month', types=(1,), currency=None, start=None, end=None):
+    """
+    Compiles the aggregation to a SQL GROUP BY query over INOUTCOME and the lookup tables.
+
+    Args:
+    by (tuple): Grouping keys (see group_expressions).
+    period (str, optional): Period of the totals (see period_expressions), or None for totals over the whole range.
+    types (tuple): DO_TYPE values of the transactions (1 expense, 0 income, 3 transfer).
+    currency (str, optional): ISO code of the only currency to aggregate.
+    start (optional): First date included.
+    end (optional): First date excluded.
+
+    Returns:
+    tuple: (SQL query, parameters, names of the result columns)
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    unknown = [key for key in by if key not in group_expressions]
+    if unknown:
+        raise ValueError(f"Unknown grouping keys: {', '.join(unknown)}, known keys: {', '.join(group_expressions)}")
+    if period is not None and period not in period_expressions:
+        raise ValueError(f"Unknown period {period}, known periods: {', '.join(period_expressions)}")
+
+    keys = ([('Period', period_expressions[period])] if period is not None else []) + \
+           [(key.capitalize(), group_expressions[key]) for key in by]
+    conditions = [active_condition, f"i.DO_TYPE IN ({', '.join('?' * len(types))})"]
+    params = list(types)
+    if currency is not None:
+        conditions.append("cur.ISO = ?")
+        params.append(currency)
+    if start is not None:
+        conditions.append("i.ZDATE >= ?")
+        params.append(to_epoch_ms(start))
+    if end is not None:
+        conditions.append("i.ZDATE < ?")
+        params.append(to_epoch_ms(end))
+
+    select = [f"{expression} AS [{name}]" for name, expression in keys]
+    select += ["SUM(i.ZMONEY) AS Amount", "COUNT(*) AS Count"]
+    query = f"SELECT {', '.join(select)} FROM INOUTCOME i {joins} WHERE {' AND '.join(conditions)}"
+    if keys:
+        positions = ', '.join(str(position) for position in range(1, len(keys) + 1))
+        query += f" GROUP BY {positions} ORDER BY {positions}"
+    return query, tuple(params), [name for name, _ in keys] + ['Amount', 'Count']
+
+def aggregate_transactions(db_file, by=('category',), period='month', types=(1,), currency=None, start=None, end=None,
+                           in_memory=False):
+    """
+    Returns the totals and counts of the transactions per period and grouping keys.
+    The grouping runs in SQLite, only the aggregated rows are loaded into pandas.
+    Without currency (as filter or grouping key), the amounts in different currencies are added together.
+
+    Args:
+    db_file (str): Path to the mmbak file.
+    by (tuple): Grouping keys, any of 'category', 'subcategory', 'account', 'currency', 'type'.
+    period (str, optional): 'day', 'week', 'month' or 'year', or None for totals over the whole range.
+    types (tuple): DO_TYPE values of the transactions (1 expense, 0 income, 3 transfer).
+    currency (str, optional): ISO code of the only currency to aggregate.
+    start (optional): First date included.
+    end (optional): First date excluded.
+    in_memory (bool): Whether to query an in-memory copy of the file (loaded once, for repeated analytics).
+
+    Returns:
+    DataFrame: One row per group, with the Period (datetime64, first day of the period), the grouping keys,
+               the Amount and the Count of the transactions.
+    """
+    query, params, _ = compile_aggregation(by, period, types, currency, start, end)
+    db_driver = DbDriver(db_file, pooled=True, in_memory=in_memory)
+    df = db_driver.query_to_dataframe(query, params)
+    db_driver.close()
+    return format_aggregation(df)
+
+def format_aggregation(df):
+    """
+    Converts the columns of an aggregation result to their types: the Period to datetime64,
+    the names to categories, the Type, Amount and Count to nullable numbers.
+
+    Args:
+    df (DataFrame): Result of an aggregation query.
+
+    Returns:
+    DataFrame: Typed result.
+    """
+    dtypes = {name: 'category' for name in df.columns if name not in ('Period', 'Type', 'Amount', 'Count')}
+    df = apply_dtypes(df, dict(dtypes, Type='Int8', Amount='Float64', Count='Int64'))
+    if 'Period' in df.columns:
+        df['Period'] = pd.to_datetime(df['Period']).astype('datetime64[s]')
+    return df
+
+def spending(db_file, by='category', period='month', currency=None, start=None, end=None, in_memory=False):
+    """
+    Returns the expenses per period and category, subcategory or account (see aggregate_transactions).
+
+    Args:
+    db_file (str): Path to the mmbak file.
+    by (str or tuple): Grouping key(s): 'category', 'subcategory', 'account', 'currency'.
+    period (str, optional): 'day', 'week', 'month' or 'year', or None for totals over the whole range.
+    currency (str, optional): ISO code of the only currency to aggregate.
+    start (optional): First date included.
+    end (optional): First date excluded.
+    in_memory (bool): Whether to query an in-memory copy of the file.
+
+    Returns:
+    DataFrame: Expenses per group.
+    """
+    return aggregate_transactions(db_file, by, period, (1,), currency, start, end, in_memory)
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+from .transactions import load_transactions
+
+# Sign of ZMONEY on the account (assetUid) of the transaction, per DO_TYPE. Transfers also add ZMONEY to toAssetUid.
+account_signs = {0: 1, 1: -1, 3: -1}
+
+def ledger_entries(transactions, opening_balances=None):
+    """
+    Turns the income, expense and transfer transactions into signed entries of the accounts: income adds to the
+    account, an expense takes from it, and a transfer takes from the account and adds to the target account
+    (the amount is taken as is, so transfers between accounts of different currencies are not converted).
+
+    Args:
+    transactions (dict): Result of transactions.load_transactions, with the ZDATE, ZMONEY and ASSET columns
+                         (and TO_ASSET for the transfers).
+    opening_balances (dict, optional): Account -> balance before the first transaction.
+
+    Returns:
+    DataFrame: Account, Date (datetime64[ms]) and Amount (int64 cents) of the entries, unsorted.
+    """
+    entries = []
+    for do_type, name in ((0, 'income'), (1, 'expense'), (3, 'transfer')):
+        df = transactions.get(name)
+        if df is None or df.empty:
+            continue
+        cents = (df['ZMONEY'].astype('Float64').fillna(0).to_numpy(dtype=float) * 100).round().astype(np.int64)
+        # Accounts missing from ASSET are named by their uid
+        account = df['ASSET'].astype(object).fillna(df['assetUid'].astype(object)) if 'assetUid' in df.columns else df['ASSET']
+        entries.append(pd.DataFrame({'Account': account.to_numpy(dtype=object), 'Date': df['ZDATE'].to_numpy(),
+                                     'Amount': account_signs[do_type] * cents}))
+        if do_type == 3:
+            target = df['TO_ASSET'].astype(object).fillna(df['toAssetUid'].astype(object))
+            entries.append(pd.DataFrame({'Account': target.to_numpy(dtype=object), 'Date': df['ZDATE'].to_numpy(),
+                                         'Amount': cents}))
+    if opening_balances:
+        # Dated at the epoch, so that they count for any date
+        entries.append(pd.DataFrame({'Account': list(opening_balances), 'Date': np.zeros(len(opening_balances), dtype='datetime64[ms]'),
+                                     'Amount': (np.array(list(opening_balances.values()), dtype=float) * 100).round().astype(np.int64)}))
+    if not entries:
+        return pd.DataFrame({'Account': pd.Series(dtype=object), 'Date': pd.Series(dtype='datetime64[ms]'),
+                             'Amount': pd.Series(dtype=np.int64)})
+    ledger = pd.concat(entries, ignore_index=True)
+    return ledger[ledger['Account'].notna() & ledger['Date'].notna()]
+
+class Balances:
+    """
+    Running balances of the accounts. The entries are sorted once by account and date, and the running balances
+    are computed with one cumulative sum (in integer cents, so that they are exact). Balances at any date are then
+    found by binary search (searchsorted) in the sorted entries, without going through the transactions again.
+
+    Methods:
+    __init__(self, ledger) - Sort the entries and compute the running balances.
+    as_of(self, dates) - Return the balances of every account at the end of the given date(s).
+    history(self) - Return the entries with the running balance of their account.
+    """
+    def __init__(self, ledger):
+        """
+        Sort the entries and compute the running balances.
+
+        Args:
+        ledger (DataFrame): Account, Date and Amount (int64 cents) of the entries (see ledger_entries).
+        """
+        codes, self.accounts = pd.factorize(ledger['Account'], sort=True)
+        dates = ledger['Date'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        order = np.lexsort((dates, codes))
+        self.codes = codes[order]
+        self.dates = dates[order]
+        self.amounts = ledger['Amount'].to_numpy(dtype=np.int64)[order]
+        running = np.cumsum(self.amounts)
+        # First entry of every account, and the balance to subtract so that every account starts from 0
+        self.starts = np.searchsorted(self.codes, np.arange(len(self.accounts)))
+        before = np.concatenate(([0], running))[self.starts]
+        self.balances = running - before[self.codes]
+        # Sorted key (account, date) of the entries, to search an account and a date at once
+        self.first_date = int(self.dates.min()) if len(self.dates) else 0
+        self.span = (int(self.dates.max()) - self.first_date + 2) if len(self.dates) else 2
+        self.keys = self.codes.astype(np.int64) * self.span + (self.dates - self.first_date + 1)
+
+    def as_of(self, dates):
+        """
+        Return the balances of every account at the end of the given date(s), i.e. including the transactions
+        at or before each date.
+
+        Args:
+        dates: A date, or a list of dates (anything accepted by pd.to_datetime). A date without a time is
+               taken at its end of day (UTC).
+
+        Returns:
+        Series (one date) or DataFrame (one row per date): Balance of every account.
+        """
+        single = np.ndim(dates) == 0
+        timestamps = pd.to_datetime(pd.Index(np.atleast_1d(dates)))
+        # Dates without a time of day include the whole day
+        ends = np.where(timestamps == timestamps.normalize(), timestamps + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1), timestamps)
+        targets = pd.DatetimeIndex(ends).as_unit('ms').asi8
+        relative = np.clip(targets - self.first_date + 1, 0, self.span - 1)
+
+        codes = np.arange(len(self.accounts))
+        queries = codes[None, :].astype(np.int64) * self.span + relative[:, None]
+        positions = np.searchsorted(self.keys, queries, side='right') - 1
+        # No entry of the account at or before the date: the position falls in the previous account
+        found = positions >= self.starts[None, :]
+        values = np.where(found, self.balances[np.maximum(positions, 0)], 0) / 100
+        df = pd.DataFrame(values, index=timestamps, columns=pd.Index(self.accounts, name='Account'))
+        return df.iloc[0].rename(None) if single else df
+
+    def history(self):
+        """
+        Return the entries sorted by account and date, with the running balance of their account.
+
+        Returns:
+        DataFrame: Account, Date, Amount and Balance.
+        """
+        return pd.DataFrame({
+            'Account': pd.Categorical.from_codes(self.codes, categories=self.accounts),
+            'Date': self.dates.astype('datetime64[ms]'),
+            'Amount': self.amounts / 100,
+            'Balance': self.balances / 100,
+        })
+
+def load_balances(db_file, in_memory=False, opening_balances=None):
+    """
+    Loads the transactions of the mmbak file and computes the running balances of the accounts.
+
+    Args:
+    db_file (str): Path to the mmbak file.
+    in_memory (bool): Whether to query an in-memory copy of the file (loaded once, for repeated analytics).
+    opening_balances (dict, optional): Account name -> balance before the first transaction.
+
+    Returns:
+    Balances: Running balances, to query with as_of or history.
+    """
+    transactions = load_transactions(db_file, columns=['ZDATE', 'DO_TYPE', 'ZMONEY', 'assetUid', 'toAssetUid'], in_memory=in_memory)
+    return Balances(ledger_entries(transactions, opening_balances))
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+import urllib.parse
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+class ConnectionPool:
+    """
+    Read-only connections to one mmbak file, reused between queries.
+    Every thread gets its own connection (a sqlite3 connection must not be used by several threads at once),
+    created on the first query of the thread and kept open, so that the prepared statements cached
+    by sqlite3 are reused too. The mmbak file is a backup snapshot, so it is opened as immutable:
+    SQLite then skips the locking and the change detection.
+    With in_memory, the file is copied once into a shared in-memory database (SQLite backup API),
+    and the connections of all threads read that copy.
+
+    Methods:
+    __init__(self, file, in_memory, cached_statements) - Open the pool.
+    connection(self) - Return the connection of the current thread.
+    close(self) - Close all connections of the pool.
+    """
+    def __init__(self, file, in_memory=False, cached_statements=256):
+        """
+        Open the pool.
+
+        Args:
+        file (str): Path to the mmbak file.
+        in_memory (bool): Whether to load the whole file into memory first.
+        cached_statements (int): Number of prepared statements cached by every connection.
+        """
+        if not os.path.exists(file):
+            raise FileNotFoundError(f"No file found at specified path: {file}")
+        self.file = os.path.abspath(file)
+        self.in_memory = in_memory
+        self.cached_statements = cached_statements
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.uri = f"file:{urllib.parse.quote(self.file)}?mode=ro&immutable=1"
+        self.memory_keeper = None
+        if in_memory:
+            # The named shared in-memory database lives as long as at least one connection to it is open
+            self.uri = f"file:mmbak_{id(self)}?mode=memory&cache=shared"
+            self.memory_keeper = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            source = sqlite3.connect(f"file:{urllib.parse.quote(self.file)}?mode=ro&immutable=1", uri=True)
+            try:
+                source.backup(self.memory_keeper)
+            finally:
+                source.close()
+
+    def connection(self):
+        """
+        Return the connection of the current thread, opening it on the first call.
+
+        Returns:
+        sqlite3.Connection: Read-only connection.
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            # Used only by this thread, but closed by close() from any thread
+            connection = sqlite3.connect(self.uri, uri=True, cached_statements=self.cached_statements,
+                                         check_same_thread=False)
+            if self.in_memory:
+                # The in-memory copy is writable, it is protected here instead
+                connection.execute("PRAGMA query_only = 1")
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def close(self):
+        """
+        Close all connections of the pool (and drop the in-memory copy).
+        Connections of other threads must not be in use anymore.
+        """
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
+        if self.memory_keeper is not None:
+            self.memory_keeper.close()
+            self.memory_keeper = None
+
+def get_pool(file, in_memory=False):
+    """
+    Return the pool of the mmbak file, opening it on the first call.
+    A pool is kept per file and mode; if the file was replaced (other mtime or size), a new pool is opened.
+
+    Args:
+    file (str): Path to the mmbak file.
+    in_memory (bool): Whether the pool reads an in-memory copy of the file.
+
+    Returns:
+    ConnectionPool: Pool of the file.
+    """
+    path = os.path.abspath(file)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _pools_lock:
+        entry = _pools.get((path, in_memory))
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        if entry is not None:
+            entry[1].close()
+        pool = ConnectionPool(path, in_memory)
+        _pools[(path, in_memory)] = (signature, pool)
+        return pool
+
+def close_pools():
+    """
+    Close all pools.
+    """
+    with _pools_lock:
+        for _, pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -2,17 +2,18 @@
 import pandas as pd
 from .db_driver import DbDriver
 
-def get_currencies(db_file):
+def get_currencies(db_file, in_memory=False):
     """
     Returns a list of currencies from the mmbak file.
 
     Args:
     db_file (str): Path to the mmbak file.
+    in_memory (bool): Whether to query an in-memory copy of the file (loaded once, for repeated analytics).
 
     Returns:
     DataFrame: Currencies.
     """
-    db_driver = DbDriver(db_file)
+    db_driver = DbDriver(db_file, pooled=True, in_memory=in_memory)
     query = "SELECT * FROM CURRENCY"
     currencies_df = db_driver.query_to_dataframe(query)
     db_driver.close()
@@ -1,7 +1,108 @@
+import os
+import re
+import numpy as np
 
-import matplotlib.pyplot as plt
+default_max_points = 2000 # Points drawn per series, longer series are downsampled (see lttb_indices)
+marker_max_points = 200 # Points drawn with markers; longer series are drawn as lines only
 
-def plot_data(df, title, x_col, y_col, log_scale=False):
+def lttb_indices(x, y, threshold):
+    """
+    Selects the points of a series to draw with the Largest-Triangle-Three-Buckets algorithm: the first and last
+    points are kept, the others are split into threshold - 2 buckets, and from every bucket the point forming the
+    largest triangle with the point kept in the previous bucket and the average of the next bucket is kept.
+    The shape of the series (peaks, drops) is preserved much better than by taking every n-th point.
+
+    Args:
+    x (np.ndarray): x values (numbers), sorted.
+    y (np.ndarray): y values (numbers).
+    threshold (int): Number of points to keep.
+
+    Returns:
+    np.ndarray: Indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # Edges of the buckets of the points between the first and the last one, then the last point as a last bucket
+    edges = np.append(np.linspace(1, n - 1, threshold - 1).astype(np.int64), n)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end, next_end = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def downsample(x, y, max_points=default_max_points):
+    """
+    Returns the points of the series to draw: the points with a missing value are dropped, and the series
+    is reduced to max_points points with lttb_indices if it is longer.
+
+    Args:
+    x (array-like): x values, numbers or dates, sorted.
+    y (array-like): y values.
+    max_points (int, optional): Number of points to keep, or None to keep all.
+
+    Returns:
+    tuple: (x, y) numpy arrays of the kept points.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    numeric_x = x.astype('datetime64[ns]').astype(np.int64).astype(float) if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+    valid = ~(np.isnan(numeric_x) | np.isnan(y))
+    if np.issubdtype(x.dtype, np.datetime64):
+        valid &= ~np.isnat(x)
+    x, y, numeric_x = x[valid], y[valid], numeric_x[valid]
+    if max_points is None or len(x) <= max_points:
+        return x, y
+    indices = lttb_indices(numeric_x, y, max_points)
+    return x[indices], y[indices]
+
+def render_chart(x, y, title, x_col, y_col, log_scale=False, output_file=None):
+    """
+    Draws one chart. With output_file, the chart is rendered by the Agg backend (or the SVG one for .svg files)
+    to the file, without pyplot, so it works without a display and from worker processes.
+    Without output_file, the chart is shown in a pyplot window.
+
+    Args:
+    x, y (np.ndarray): Points to draw.
+    title (str): The title of the plot.
+    x_col (str): The label of the x-axis.
+    y_col (str): The label of the y-axis.
+    log_scale (bool): Whether to use a logarithmic scale for the y-axis.
+    output_file (str, optional): Path of the PNG or SVG file to write.
+
+    Returns:
+    str: Path of the written file, or None.
+    """
+    # matplotlib is imported only when plotting, it is slow to import
+    if output_file is not None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figure = Figure(figsize=(12, 6))
+        FigureCanvasAgg(figure)
+    else:
+        import matplotlib.pyplot as plt
+        figure = plt.figure(figsize=(12, 6))
+    axes = figure.add_subplot()
+    axes.plot(x, y, marker='o' if len(x) <= marker_max_points else None)
+    axes.set_xlabel(x_col)
+    axes.set_ylabel(y_col)
+    if log_scale:
+        axes.set_yscale('log')
+    axes.set_title(title)
+    axes.grid(True)
+    if output_file is None:
+        plt.show()
+        return None
+    figure.savefig(output_file)
+    return output_file
+
+def plot_data(df, title, x_col, y_col, log_scale=False, output_file=None, max_points=default_max_points):
     """
     Plot the data from a DataFrame.
 
@@ -11,13 +112,53 @@ def plot_data(df, title, x_col, y_col, log_scale=False):
     x_col (str): The column name for the x-axis.
     y_col (str): The column name for the y-axis.
     log_scale (bool): Whether to use a logarithmic scale for the y-axis.
+    output_file (str, optional): Path of a PNG or SVG file to write instead of showing the plot (headless).
+    max_points (int, optional): Longer series are downsampled to this many points (None to draw all).
+
+    Returns:
+    str: Path of the written file, or None.
     """
-    plt.figure(figsize=(12, 6))
-    plt.plot(df[x_col], df[y_col].astype(float), marker='o')
-    plt.xlabel(x_col)
-    plt.ylabel(y_col)
-    if log_scale:
-        plt.yscale('log')
-    plt.title(title)
-    plt.grid(True)
-    plt.show()
+    x, y = downsample(df[x_col].to_numpy(), df[y_col].astype(float).to_numpy(), max_points)
+    return render_chart(x, y, title, x_col, y_col, log_scale, output_file)
+
+def chart_file_name(title, file_format):
+    """
+    Returns the file name of a chart: its title with the characters other than letters, digits, '-' and '_' replaced.
+    """
+    return re.sub(r'[^\w-]+', '_', title).strip('_') + '.' + file_format
+
+def plot_batch(charts, output_dir, file_format='png', log_scale=False, max_points=default_max_points, processes=None):
+    """
+    Writes many charts (e.g. one per account or category) to files in one call. The series are downsampled
+    first, so only the points kept are passed to the renderers; with processes, the charts are rendered in
+    parallel by a process pool.
+
+    Args:
+    charts (list): (df, title, x_col, y_col) of every chart.
+    output_dir (str): Directory of the files, created if missing. The files are named after the titles
+                      (titles giving the same file name get the index of their chart appended).
+    file_format (str): 'png' or 'svg'.
+    log_scale (bool): Whether to use a logarithmic scale for the y-axes.
+    max_points (int, optional): Longer series are downsampled to this many points (None to draw all).
+    processes (int, optional): Number of worker processes. None or 1 renders in this process.
+
+    Returns:
+    list: Paths of the written files, in the order of the charts.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    file_names = set()
+    for index, (df, title, x_col, y_col) in enumerate(charts):
+        # e.g. 'a/b' and 'a b' both give 'a_b', the later chart would overwrite the earlier one
+        file_name, suffix = chart_file_name(title, file_format), index
+        while file_name in file_names:
+            file_name = chart_file_name(f'{title}_{suffix}', file_format)
+            suffix += 1
+        file_names.add(file_name)
+        x, y = downsample(df[x_col].to_numpy(), df[y_col].astype(float).to_numpy(), max_points)
+        jobs.append((x, y, title, x_col, y_col, log_scale, os.path.join(output_dir, file_name)))
+    if processes is None or processes <= 1 or len(jobs) <= 1:
+        return [render_chart(*job) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(render_chart, *zip(*jobs)))
@@ -1,46 +1,159 @@
 
 import sqlite3
 import pandas as pd
+from .connection_pool import get_pool
+from .mmbak_schema import apply_dtypes, known_dtypes, mmbak_dtypes
+
+default_chunksize = 50000 # Number of rows fetched at once by the streaming queries
 
 class DbDriver:
     """
     Class to handle database operations for mmbak files.
 
     Methods:
-    __init__(self, file) - Initialize the database connection.
-    query_to_dataframe(self, query) - Execute a SQL query and return results as a pandas DataFrame.
+    __init__(self, file, pooled, in_memory) - Initialize the database connection.
+    query_to_dataframe(self, query, params, dtypes) - Execute a SQL query and return results as a pandas DataFrame.
+    iter_query(self, query, params, chunksize, dtypes) - Execute a SQL query and yield the results in DataFrame chunks.
+    iter_arrow_batches(self, query, params, batch_size, dtypes) - Execute a SQL query and yield the results as Arrow record batches.
+    read_table(self, table, columns, where, params, chunksize) - Read the given columns of a mmbak table with their known dtypes.
     close(self) - Close the database connection.
     """
-    def __init__(self, file="db.mmbak"):
+    def __init__(self, file="db.mmbak", pooled=False, in_memory=False):
         """
         Initialize the database connection.
 
         Args:
         file (str): Path to the mmbak file.
+        pooled (bool): Whether to use the shared read-only connections of the file (see connection_pool),
+                       which are reused by all pooled drivers and are safe to use from several threads.
+        in_memory (bool): Whether to load the file into memory once and query the copy (implies pooled).
         """
+        self.pool = None
         try:
-            self.connection = sqlite3.connect(file)
+            if pooled or in_memory:
+                self.pool = get_pool(file, in_memory)
+            else:
+                self._connection = sqlite3.connect(file)
         except Exception as e:
             raise Exception(f"Error connecting to database: {e}")
 
-    def query_to_dataframe(self, query):
+    @property
+    def connection(self):
+        """
+        Connection to the database (for pooled drivers, the connection of the current thread).
+        """
+        if self.pool is not None:
+            return self.pool.connection()
+        return self._connection
+
+    def query_to_dataframe(self, query, params=None, dtypes=None):
         """
         Execute a query and return the results as a pandas DataFrame.
 
         Args:
-        query (str): SQL query to execute.
+        query (str): SQL query to execute, with '?' (or ':name') placeholders for the parameters.
+        params (tuple or dict, optional): Parameters of the query.
+        dtypes (dict, optional): Column name -> dtype of the result columns (see mmbak_schema.apply_dtypes).
 
         Returns:
         DataFrame: Resulting data in a pandas DataFrame.
         """
         try:
-            df = pd.read_sql_query(query, self.connection)
-            return df
+            df = pd.read_sql_query(query, self.connection, params=params)
+        except Exception as e:
+            raise Exception(f"Error executing query: {e}")
+        if dtypes:
+            df = apply_dtypes(df, dtypes)
+        return df
+
+    def iter_query(self, query, params=None, chunksize=default_chunksize, dtypes=None):
+        """
+        Execute a query and yield the results chunksize rows at a time.
+        The rows are fetched from the cursor chunk by chunk, so the memory is bounded by the chunk size
+        and not by the size of the result.
+
+        Args:
+        query (str): SQL query to execute, with '?' (or ':name') placeholders for the parameters.
+        params (tuple or dict, optional): Parameters of the query.
+        chunksize (int): Number of rows per chunk.
+        dtypes (dict, optional): Column name -> dtype of the result columns (see mmbak_schema.apply_dtypes).
+
+        Yields:
+        DataFrame: Chunk of the results. No chunk is yielded for an empty result.
+        """
+        try:
+            cursor = self.connection.execute(query, params if params is not None else ())
         except Exception as e:
             raise Exception(f"Error executing query: {e}")
+        try:
+            columns = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                chunk = pd.DataFrame.from_records(rows, columns=columns)
+                yield apply_dtypes(chunk, dtypes) if dtypes else chunk
+        finally:
+            cursor.close()
+
+    def iter_arrow_batches(self, query, params=None, batch_size=default_chunksize, dtypes=None):
+        """
+        Execute a query and yield the results as Arrow record batches of batch_size rows.
+        The batches of one query share the same schema (given by the dtypes), so they can be
+        written to a Parquet/Feather file or collected into a pyarrow Table.
+
+        Args:
+        query (str): SQL query to execute, with '?' (or ':name') placeholders for the parameters.
+        params (tuple or dict, optional): Parameters of the query.
+        batch_size (int): Number of rows per batch.
+        dtypes (dict, optional): Column name -> dtype of the result columns. Defaults to the known mmbak dtypes.
+
+        Yields:
+        pyarrow.RecordBatch: Batch of the results.
+        """
+        import pyarrow as pa
+
+        dtypes = known_dtypes() if dtypes is None else dtypes
+        schema = None
+        for chunk in self.iter_query(query, params, batch_size, dtypes):
+            batch = pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+            if schema is None:
+                # Columns without a known dtype are typed by the first batch
+                schema = batch.schema
+            yield batch
+
+    def read_table(self, table, columns=None, where=None, params=None, chunksize=None):
+        """
+        Read the given columns of a mmbak table, converted to their known dtypes (see mmbak_structure.txt).
+        Selecting only the needed columns avoids loading the ~50 columns of INOUTCOME.
+
+        Args:
+        table (str): Name of the table (one of mmbak_schema.mmbak_dtypes).
+        columns (list, optional): Columns to read. Defaults to all known columns of the table.
+        where (str, optional): SQL condition on the rows, with placeholders for the parameters (e.g. 'IS_DEL = ?').
+        params (tuple or dict, optional): Parameters of the condition.
+        chunksize (int, optional): If given, an iterator of DataFrame chunks is returned instead of one DataFrame.
+
+        Returns:
+        DataFrame or iterator: Resulting data.
+        """
+        if table not in mmbak_dtypes:
+            raise ValueError(f"Unknown table {table}, known tables: {', '.join(mmbak_dtypes)}")
+        dtypes = mmbak_dtypes[table]
+        columns = list(dtypes) if columns is None else list(columns)
+        unknown = [column for column in columns if column not in dtypes]
+        if unknown:
+            raise ValueError(f"Unknown columns of {table}: {', '.join(unknown)}")
+        query = f'SELECT {", ".join(f"[{column}]" for column in columns)} FROM [{table}]'
+        if where:
+            query += f" WHERE {where}"
+        if chunksize:
+            return self.iter_query(query, params, chunksize, dtypes)
+        return self.query_to_dataframe(query, params, dtypes)
 
     def close(self):
         """
-        Close the database connection.
+        Close the database connection. The pooled connections stay open for the other drivers.
         """
-        self.connection.close()
+        if self.pool is None:
+            self._connection.close()
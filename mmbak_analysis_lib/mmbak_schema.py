@@ -0,0 +1,83 @@
+import pandas as pd
+
+# Types of the known mmbak columns (see mmbak_structure.txt), as compact pandas dtypes.
+# Nullable dtypes are used, since any column of the backup may contain NULLs.
+# Dates (ZDATE, WDATE, UTIME, ...) are epoch milliseconds, money columns are floats in the currency of the row.
+mmbak_dtypes = {
+    'BUDGET': {
+        'ID': 'string', 'B_UID': 'string', 'CATEGORY_ID': 'string', 'TO_ACCOUNT_ID': 'string',
+        'DO_TYPE': 'Int8', 'PERIOD_TYPE': 'Int8', 'IS_TOTAL': 'Int8', 'IS_DEL': 'Int8', 'TRANSFER_TYPE': 'Int8',
+        'ORDER_SEQ': 'Int64', 'MODIFY_DATE': 'Int64', 'uid': 'string', 'targetUid': 'string',
+        'syncTime': 'Int64', 'syncVersion': 'Int64', 'isSynced': 'Int8',
+    },
+    'INOUTCOME': {
+        'AID': 'string', 'ASSET_GROUP': 'Int64', 'ASSET_ID': 'string', 'ASSET_NIC': 'category', 'ASSET_NAME': 'category',
+        'CARDDIVIDID': 'string', 'CARDDIVIDMONTH': 'Int64', 'CATEGORY_ID': 'string', 'CATEGORY_NAME': 'category',
+        'ZCONTENT': 'string', 'ZDATE': 'Int64', 'WDATE': 'Int64', 'DO_TYPE': 'Int8', 'ZMONEY': 'Float64',
+        'OPPOSITEAID': 'string', 'ZDATA': 'string', 'ZDATA1': 'string', 'ZDATA2': 'string', 'SMS_RDATE': 'Int64',
+        'IN_ZMONEY': 'Float64', 'CARD_DIVIDE_CID': 'string', 'CARD_DIVIDE_MONTH_STR': 'string',
+        'CARD_TIME_STAMP_STR': 'string', 'IMPORTANT': 'Int8', 'FEE_ID': 'string', 'SMS_ORIGIN': 'string',
+        'SMS_PARSE_CONTENT': 'string', 'IS_DEL': 'Int8', 'SYNC_CHECK': 'Int8', 'UTIME': 'Int64',
+        'CURRENCY_ID': 'string', 'AMOUNT_ACCOUNT': 'Float64', 'TX_UID': 'string', 'txUidFee': 'string',
+        'cardDivideUid': 'string', 'uid': 'string', 'currencyUid': 'category', 'assetUid': 'category',
+        'categoryUid': 'category', 'txUidTrans': 'string', 'MARK': 'string', 'syncTime': 'Int64',
+        'syncVersion': 'Int64', 'ctgUid': 'category', 'toAssetUid': 'category', 'isSynced': 'Int8',
+        'lat': 'Float64', 'lng': 'Float64', 'gstd': 'string', 'wtime': 'string', 'paid': 'Int8',
+    },
+    # Lookup tables, only the columns used by the library (assumed, see mmbak_structure.txt)
+    'ZCATEGORY': {
+        'uid': 'string', 'NAME': 'string', 'TYPE': 'Int8', 'STATUS': 'Int8', 'pUid': 'string', 'C_IS_DEL': 'Int8',
+    },
+    'CURRENCY': {
+        'uid': 'string', 'ISO': 'string', 'NAME': 'string', 'SYMBOL': 'string',
+    },
+    'ASSET': {
+        'uid': 'string', 'NIC_NAME': 'string', 'ZGROUP': 'Int64', 'IS_DEL': 'Int8',
+    },
+}
+
+numeric_dtypes = {'Int8', 'Int16', 'Int32', 'Int64', 'Float32', 'Float64'}
+
+def known_dtypes(table=None):
+    """
+    Returns the dtypes of the known columns of a table, or of all tables merged (for queries over several tables).
+
+    Args:
+    table (str, optional): Name of the table.
+
+    Returns:
+    dict: Column name -> dtype.
+    """
+    if table is not None:
+        return mmbak_dtypes.get(table, {})
+    dtypes = {}
+    for table_dtypes in mmbak_dtypes.values():
+        # The columns shared by several tables (uid, IS_DEL, ...) have the same type in all of them
+        dtypes.update(table_dtypes)
+    return dtypes
+
+def apply_dtypes(df, dtypes):
+    """
+    Converts the columns of the DataFrame to the given dtypes. Columns without a dtype are left as they are.
+    SQLite does not enforce the column types, so numbers stored as text are parsed, and invalid values become NA.
+
+    Args:
+    df (DataFrame): Query result.
+    dtypes (dict): Column name -> dtype.
+
+    Returns:
+    DataFrame: DataFrame with the typed columns.
+    """
+    for column in df.columns:
+        dtype = dtypes.get(column)
+        if dtype is None:
+            continue
+        if dtype in numeric_dtypes:
+            values = pd.to_numeric(df[column], errors='coerce')
+            if dtype.startswith('Int'):
+                # Integers stored as floats (e.g. 1.0) are kept, fractions would not fit the integer dtype
+                values = values.round()
+            df[column] = values.astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
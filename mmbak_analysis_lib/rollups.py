@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import urllib.parse
+import pandas as pd
+from .aggregations import format_aggregation
+
+default_rollups_file = './data/mmbak_rollups.sqlite' # Sidecar database of the rollups
+
+# Rollup tables -> period column. Both are keyed by the period, DO_TYPE and the account, category and currency uids
+# (stored as '' when missing, since NULLs are never equal in a primary key).
+rollup_tables = {'rollup_daily': 'day', 'rollup_monthly': 'month'}
+# Grouping keys -> (column of the rollup tables, SQL expression over the totals per column (r) joined with the lookup
+# names of the category (c, and its parent p), account (a) and currency (cur)). Same keys as aggregations.group_expressions.
+group_expressions = {
+    'category': ('category_uid', "COALESCE(p.name, c.name)"),
+    'subcategory': ('category_uid', "CASE WHEN p.uid IS NOT NULL THEN c.name END"),
+    'account': ('asset_uid', "a.name"),
+    'currency': ('currency_uid', "cur.name"),
+    'type': ('do_type', "r.do_type"),
+}
+# Periods -> (rollup table, SQL expression of the first day of the period)
+period_expressions = {
+    'day': ('rollup_daily', "day"),
+    'week': ('rollup_daily', "date(day, '-6 days', 'weekday 1')"),
+    'month': ('rollup_monthly', "month || '-01'"),
+    'year': ('rollup_monthly', "substr(month, 1, 4) || '-01-01'"),
+}
+# Column of the rollup tables -> joins of its lookup names
+joins = {
+    'category_uid': ("LEFT JOIN rollup_lookup c ON c.kind = 'category' AND c.uid = r.category_uid "
+                     "LEFT JOIN rollup_lookup p ON p.kind = 'category' AND p.uid = c.parent_uid"),
+    'asset_uid': "LEFT JOIN rollup_lookup a ON a.kind = 'asset' AND a.uid = r.asset_uid",
+    'currency_uid': "LEFT JOIN rollup_lookup cur ON cur.kind = 'currency' AND cur.uid = r.currency_uid",
+    'do_type': "",
+}
+rollup_keys = "do_type, asset_uid, category_uid, currency_uid"
+
+schema = [
+    # Contribution of every transaction currently counted in the rollups, to take it back when it changes
+    """CREATE TABLE IF NOT EXISTS rollup_rows (uid TEXT PRIMARY KEY, utime INTEGER, sync_version INTEGER, day TEXT,
+       do_type INTEGER, asset_uid TEXT, category_uid TEXT, currency_uid TEXT, amount REAL)""",
+    *[f"""CREATE TABLE IF NOT EXISTS {table} ({period} TEXT, do_type INTEGER, asset_uid TEXT, category_uid TEXT,
+          currency_uid TEXT, amount REAL, count INTEGER, PRIMARY KEY ({period}, {rollup_keys}))"""
+      for table, period in rollup_tables.items()],
+    # Names of the categories, accounts and currencies of the last synced backup
+    "CREATE TABLE IF NOT EXISTS rollup_lookup (kind TEXT, uid TEXT, name TEXT, parent_uid TEXT, PRIMARY KEY (kind, uid))",
+    "CREATE TABLE IF NOT EXISTS rollup_state (key TEXT PRIMARY KEY, value)",
+]
+
+class RollupStore:
+    """
+    Daily and monthly totals of the mmbak transactions per account, category and currency, kept in a sidecar
+    SQLite database and updated incrementally from each new backup: only the rows that are new, changed
+    (other UTIME or syncVersion) or deleted (IS_DEL set, or missing from the backup) since the last sync are
+    taken back from or added to the totals, so reports over many years read a few thousand rollup rows
+    instead of the whole INOUTCOME table.
+
+    Methods:
+    __init__(self, file) - Open (or create) the sidecar database.
+    sync(self, mmbak_file) - Update the rollups from a backup.
+    query(self, by, period, types, currency, start, end) - Return the totals per period and grouping keys.
+    close(self) - Close the sidecar database.
+    """
+    def __init__(self, file=default_rollups_file):
+        """
+        Open (or create) the sidecar database.
+
+        Args:
+        file (str): Path to the sidecar database.
+        """
+        self.file = file
+        # URIs are enabled to attach the backups read-only
+        self.connection = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(file))}", uri=True)
+        with self.connection:
+            for statement in schema:
+                self.connection.execute(statement)
+
+    def sync(self, mmbak_file):
+        """
+        Update the rollups from a backup. A backup already synced (same path, mtime and size) is skipped.
+
+        Args:
+        mmbak_file (str): Path to the mmbak file.
+
+        Returns:
+        dict: Number of transactions added or updated ('changed') and taken out ('removed') of the rollups.
+        """
+        if not os.path.exists(mmbak_file):
+            raise FileNotFoundError(f"No file found at specified path: {mmbak_file}")
+        path = os.path.abspath(mmbak_file)
+        stat = os.stat(path)
+        signature = f"{path}|{stat.st_mtime_ns}|{stat.st_size}"
+        if self.state('signature') == signature:
+            return {'changed': 0, 'removed': 0}
+
+        connection = self.connection
+        connection.execute("ATTACH DATABASE ? AS snapshot", (f"file:{urllib.parse.quote(path)}?mode=ro&immutable=1",))
+        try:
+            with connection:
+                # Rows new or changed since the last sync (the deleted ones are kept to be taken out)
+                connection.execute("DROP TABLE IF EXISTS temp.incoming")
+                connection.execute("""
+                    CREATE TEMP TABLE incoming AS
+                    SELECT i.uid, i.UTIME AS utime, i.syncVersion AS sync_version, IFNULL(i.IS_DEL, 0) != 0 AS is_del,
+                           IFNULL(date(i.ZDATE / 1000, 'unixepoch'), '') AS day, IFNULL(i.DO_TYPE, -1) AS do_type, IFNULL(i.assetUid, '') AS asset_uid,
+                           IFNULL(i.ctgUid, '') AS category_uid, IFNULL(i.currencyUid, '') AS currency_uid, i.ZMONEY AS amount
+                    FROM snapshot.INOUTCOME i LEFT JOIN rollup_rows r ON r.uid = i.uid
+                    WHERE i.uid IS NOT NULL AND (
+                        (r.uid IS NULL AND IFNULL(i.IS_DEL, 0) = 0)
+                        OR (r.uid IS NOT NULL AND (r.utime IS NOT i.UTIME OR r.sync_version IS NOT i.syncVersion
+                                                   OR IFNULL(i.IS_DEL, 0) != 0)))""")
+                # Rows counted before that are not in the backup anymore, or are changed
+                connection.execute("DROP TABLE IF EXISTS temp.outgoing")
+                connection.execute("""
+                    CREATE TEMP TABLE outgoing AS
+                    SELECT uid FROM rollup_rows
+                    WHERE uid NOT IN (SELECT uid FROM snapshot.INOUTCOME WHERE uid IS NOT NULL)
+                       OR uid IN (SELECT uid FROM temp.incoming)""")
+                removed = connection.execute(
+                    "SELECT COUNT(*) FROM temp.outgoing WHERE uid NOT IN (SELECT uid FROM temp.incoming WHERE NOT is_del)").fetchone()[0]
+
+                self.add_to_rollups("SELECT * FROM rollup_rows WHERE uid IN (SELECT uid FROM temp.outgoing)", -1)
+                connection.execute("DELETE FROM rollup_rows WHERE uid IN (SELECT uid FROM temp.outgoing)")
+                connection.execute(f"""
+                    INSERT INTO rollup_rows (uid, utime, sync_version, day, {rollup_keys}, amount)
+                    SELECT uid, utime, sync_version, day, {rollup_keys}, amount FROM temp.incoming WHERE NOT is_del""")
+                self.add_to_rollups("SELECT * FROM temp.incoming WHERE NOT is_del", 1)
+                for table in rollup_tables:
+                    connection.execute(f"DELETE FROM {table} WHERE count = 0")
+                changed = connection.execute("SELECT COUNT(*) FROM temp.incoming WHERE NOT is_del").fetchone()[0]
+
+                connection.execute("DELETE FROM rollup_lookup")
+                connection.execute("""
+                    INSERT OR REPLACE INTO rollup_lookup
+                    SELECT 'category', uid, NAME, pUid FROM snapshot.ZCATEGORY WHERE uid IS NOT NULL
+                    UNION ALL SELECT 'asset', uid, NIC_NAME, NULL FROM snapshot.ASSET WHERE uid IS NOT NULL
+                    UNION ALL SELECT 'currency', uid, ISO, NULL FROM snapshot.CURRENCY WHERE uid IS NOT NULL""")
+                connection.execute("INSERT OR REPLACE INTO rollup_state VALUES ('signature', ?)", (signature,))
+                connection.execute("DROP TABLE temp.incoming")
+                connection.execute("DROP TABLE temp.outgoing")
+        finally:
+            connection.execute("DETACH DATABASE snapshot")
+        return {'changed': changed, 'removed': removed}
+
+    def add_to_rollups(self, rows_query, sign):
+        """
+        Add (sign 1) or take out (sign -1) the transactions of the query from the daily and monthly rollups.
+
+        Args:
+        rows_query (str): Query of the transactions, with the day, keys and amount columns of rollup_rows.
+        sign (int): 1 or -1.
+        """
+        periods = {'rollup_daily': "day", 'rollup_monthly': "substr(day, 1, 7)"}
+        for table, period in rollup_tables.items():
+            self.connection.execute(f"""
+                INSERT INTO {table} ({period}, {rollup_keys}, amount, count)
+                SELECT {periods[table]}, {rollup_keys}, {sign} * SUM(amount), {sign} * COUNT(*) FROM ({rows_query}) WHERE true
+                GROUP BY 1, 2, 3, 4, 5
+                ON CONFLICT ({period}, {rollup_keys}) DO UPDATE SET amount = amount + excluded.amount, count = count + excluded.count""")
+
+    def state(self, key):
+        """
+        Return a value of the sync state, or None.
+        """
+        row = self.connection.execute("SELECT value FROM rollup_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def query(self, by=('category',), period='month', types=(1,), currency=None, start=None, end=None):
+        """
+        Return the totals and counts of the transactions per period and grouping keys, from the rollups.
+        Same arguments and result as aggregations.aggregate_transactions, except that the range is taken in whole days
+        (UTC). The month and year totals are read from the monthly rollups when the range starts and ends on the first
+        day of a month, otherwise from the daily ones.
+
+        Args:
+        by (tuple): Grouping keys, any of 'category', 'subcategory', 'account', 'currency', 'type'.
+        period (str, optional): 'day', 'week', 'month' or 'year', or None for totals over the whole range.
+        types (tuple): DO_TYPE values of the transactions (1 expense, 0 income, 3 transfer).
+        currency (str, optional): ISO code of the only currency to aggregate.
+        start (optional): First date included.
+        end (optional): First date excluded.
+
+        Returns:
+        DataFrame: One row per group, with the Period, the grouping keys, the Amount and the Count of the transactions.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = [key for key in by if key not in group_expressions]
+        if unknown:
+            raise ValueError(f"Unknown grouping keys: {', '.join(unknown)}, known keys: {', '.join(group_expressions)}")
+        if period is not None and period not in period_expressions:
+            raise ValueError(f"Unknown period {period}, known periods: {', '.join(period_expressions)}")
+
+        table, period_expression = period_expressions[period or 'month']
+        if table == 'rollup_monthly' and any(pd.Timestamp(date) != pd.Timestamp(date).normalize() or pd.Timestamp(date).day != 1
+                                             for date in (start, end) if date is not None):
+            # The range does not fall on month boundaries, so the daily rollups are used
+            table = 'rollup_daily'
+            period_expression = {'month': "strftime('%Y-%m-01', day)", 'year': "strftime('%Y-01-01', day)"}.get(period)
+        day = "day" if table == 'rollup_daily' else "month || '-01'"
+
+        conditions = [f"do_type IN ({', '.join('?' * len(types))})"]
+        params = list(types)
+        if currency is not None:
+            conditions.append("currency_uid IN (SELECT uid FROM rollup_lookup WHERE kind = 'currency' AND name = ?)")
+            params.append(currency)
+        if start is not None:
+            conditions.append(f"{day} >= ?")
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            # A day is included if it starts before the end
+            conditions.append(f"{day} < ?")
+            params.append(pd.Timestamp(end).ceil('D').strftime('%Y-%m-%d'))
+
+        # The rollups are first summed per period and uid in the table, then the few resulting rows are joined to
+        # the names and summed per name (several uids can have the same name, e.g. the subcategories of a category)
+        columns = list(dict.fromkeys(group_expressions[key][0] for key in by))
+        inner_keys = ([f"{period_expression} AS period"] if period is not None else []) + columns
+        inner = f"SELECT {', '.join(inner_keys + ['SUM(amount) AS amount', 'SUM(count) AS count'])} FROM {table} WHERE {' AND '.join(conditions)}"
+        if inner_keys:
+            inner += f" GROUP BY {', '.join(str(position) for position in range(1, len(inner_keys) + 1))}"
+
+        keys = ([('Period', "r.period")] if period is not None else []) + \
+               [(key.capitalize(), group_expressions[key][1]) for key in by]
+        select = [f"{expression} AS [{name}]" for name, expression in keys] + ["SUM(r.amount) AS Amount", "SUM(r.count) AS Count"]
+        query = f"SELECT {', '.join(select)} FROM ({inner}) r {' '.join(joins[column] for column in columns)}"
+        if keys:
+            positions = ', '.join(str(position) for position in range(1, len(keys) + 1))
+            query += f" GROUP BY {positions} ORDER BY {positions}"
+        return format_aggregation(pd.read_sql_query(query, self.connection, params=params))
+
+    def close(self):
+        """
+        Close the sidecar database.
+        """
+        self.connection.close()
@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import urllib.parse
+import pandas as pd
+from .mmbak_schema import apply_dtypes, known_dtypes
+
+# Tables compared by default -> column flagging the deleted rows (the rows are kept by Money Manager), or None
+diff_tables = {'INOUTCOME': 'IS_DEL', 'ZCATEGORY': 'C_IS_DEL', 'BUDGET': 'IS_DEL', 'CURRENCY': None}
+version_column = 'syncVersion'
+change_dtype = pd.CategoricalDtype(['inserted', 'updated', 'deleted'])
+
+def table_columns(connection, schema, table):
+    """
+    Returns the columns of a table of an attached database, or an empty list if the table does not exist.
+    """
+    return [row[1] for row in connection.execute(f"PRAGMA {schema}.table_info([{table}])")]
+
+def compile_diff(table, old_columns, new_columns, delete_column=None, columns=()):
+    """
+    Compiles the query of the changes of a table between the attached databases old and new.
+    Rows are matched by uid. A row is live if it is not flagged deleted; it is inserted if it is live only in new,
+    deleted if it is live only in old, and updated if it is live in both with another syncVersion
+    (or, for tables without syncVersion, with another value in any of the common columns).
+
+    Args:
+    table (str): Name of the table.
+    old_columns, new_columns (list): Columns of the table in each snapshot.
+    delete_column (str, optional): Column flagging the deleted rows.
+    columns (tuple): Columns of the new row to add to the inserted and updated rows.
+
+    Returns:
+    str: SQL query giving uid, change, old_version, new_version and the columns.
+    """
+    def live(alias, table_columns):
+        if delete_column in table_columns:
+            return f"IFNULL({alias}.[{delete_column}], 0) = 0"
+        return "1"
+
+    def version(alias, table_columns):
+        return f"{alias}.[{version_column}]" if version_column in table_columns else "NULL"
+
+    if version_column in old_columns and version_column in new_columns:
+        modified = f"o.[{version_column}] IS NOT n.[{version_column}]"
+    else:
+        common = [column for column in new_columns if column in old_columns and column != 'uid']
+        modified = ' OR '.join(f"o.[{column}] IS NOT n.[{column}]" for column in common) or "0"
+    new_values = ''.join(f", n.[{column}]" for column in columns)
+    null_values = ''.join(f", NULL AS [{column}]" for column in columns)
+    old_live, new_live = live('o', old_columns), live('n', new_columns)
+    versions = f"{version('o', old_columns)}, {version('n', new_columns)}"
+    return f"""
+        SELECT n.uid, 'inserted', {versions}{new_values} FROM new.[{table}] n LEFT JOIN old.[{table}] o ON o.uid = n.uid
+        WHERE n.uid IS NOT NULL AND {new_live} AND (o.uid IS NULL OR NOT ({old_live}))
+        UNION ALL
+        SELECT n.uid, 'updated', {versions}{new_values} FROM new.[{table}] n JOIN old.[{table}] o ON o.uid = n.uid
+        WHERE n.uid IS NOT NULL AND {new_live} AND {old_live} AND ({modified})
+        UNION ALL
+        SELECT o.uid, 'deleted', {versions}{null_values} FROM old.[{table}] o LEFT JOIN new.[{table}] n ON n.uid = o.uid
+        WHERE o.uid IS NOT NULL AND {old_live} AND (n.uid IS NULL OR NOT ({new_live}))"""
+
+def diff_snapshots(old_file, new_file, tables=tuple(diff_tables), columns=None):
+    """
+    Computes the rows inserted, updated and deleted between two mmbak snapshots, per table, by uid and syncVersion.
+    Both files are attached read-only to one SQLite connection and compared in SQL, so only the changed rows are
+    loaded into pandas. Tables missing from either snapshot are skipped.
+
+    Args:
+    old_file (str): Path to the older mmbak file.
+    new_file (str): Path to the newer mmbak file.
+    tables (tuple): Tables to compare (see diff_tables).
+    columns (dict, optional): Table -> columns of the new rows to add to the inserted and updated rows
+                              (e.g. {'INOUTCOME': ['ZDATE', 'ZMONEY', 'ctgUid']}), to update caches without reading the rows again.
+
+    Returns:
+    dict: Table -> DataFrame of its changes, with the uid, the change ('inserted', 'updated' or 'deleted'),
+          the old_version and new_version (syncVersion in each snapshot) and the requested columns.
+    """
+    columns = columns or {}
+    for file in (old_file, new_file):
+        if not os.path.exists(file):
+            raise FileNotFoundError(f"No file found at specified path: {file}")
+    connection = sqlite3.connect(":memory:", uri=True)
+    try:
+        for schema, file in (('old', old_file), ('new', new_file)):
+            connection.execute(f"ATTACH DATABASE ? AS {schema}",
+                               (f"file:{urllib.parse.quote(os.path.abspath(file))}?mode=ro&immutable=1",))
+        changes = {}
+        for table in tables:
+            old_columns = table_columns(connection, 'old', table)
+            new_columns = table_columns(connection, 'new', table)
+            if 'uid' not in old_columns or 'uid' not in new_columns:
+                continue
+            extra_columns = columns.get(table, ())
+            unknown = [column for column in extra_columns if column not in new_columns]
+            if unknown:
+                raise ValueError(f"Unknown columns of {table}: {', '.join(unknown)}")
+            query = compile_diff(table, old_columns, new_columns, diff_tables.get(table), extra_columns)
+            df = pd.read_sql_query(query, connection)
+            df.columns = ['uid', 'change', 'old_version', 'new_version'] + list(extra_columns)
+            df = apply_dtypes(df, dict(known_dtypes(table), uid='string', old_version='Int64', new_version='Int64'))
+            df['change'] = df['change'].astype(change_dtype)
+            changes[table] = df
+    finally:
+        connection.close()
+    return changes
+
+def summarize_changes(changes):
+    """
+    Returns the number of inserted, updated and deleted rows per table.
+
+    Args:
+    changes (dict): Result of diff_snapshots.
+
+    Returns:
+    DataFrame: One row per table, one column per kind of change.
+    """
+    counts = {table: df['change'].value_counts() for table, df in changes.items()}
+    return pd.DataFrame(counts, index=change_dtype.categories).T.fillna(0).astype(int)
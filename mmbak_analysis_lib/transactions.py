@@ -0,0 +1,88 @@
+import pandas as pd
+from .db_driver import DbDriver, default_chunksize
+from .mmbak_schema import known_dtypes
+
+# DO_TYPE of INOUTCOME -> name of the transactions
+do_types = {0: 'income', 1: 'expense', 3: 'transfer'}
+# Epoch millisecond columns of INOUTCOME, converted to datetime64
+date_columns = ['ZDATE', 'WDATE', 'UTIME']
+# Columns of INOUTCOME loaded by default
+default_columns = ['uid', 'ZDATE', 'WDATE', 'UTIME', 'DO_TYPE', 'ZMONEY', 'AMOUNT_ACCOUNT', 'ZCONTENT',
+                   'ctgUid', 'currencyUid', 'assetUid', 'toAssetUid']
+# Condition of the rows of INOUTCOME (aliased i) that are not deleted
+active_condition = "IFNULL(i.IS_DEL, 0) = 0"
+# Name columns joined through the uids: column -> (table, name column, uid column of INOUTCOME)
+joined_columns = {
+    'CATEGORY': ('ZCATEGORY', 'NAME', 'ctgUid'),
+    'CURRENCY': ('CURRENCY', 'ISO', 'currencyUid'),
+    'ASSET': ('ASSET', 'NIC_NAME', 'assetUid'),
+    'TO_ASSET': ('ASSET', 'NIC_NAME', 'toAssetUid'),
+}
+
+def transactions_query(columns, types):
+    """
+    Returns the query of the transactions of the given types, joined to the category, currency and asset names.
+
+    Args:
+    columns (list): Columns of INOUTCOME to select.
+    types (list): DO_TYPE values to select.
+
+    Returns:
+    str: SQL query, with one parameter per DO_TYPE.
+    """
+    select = [f"i.[{column}]" for column in columns]
+    joins = []
+    for index, (name, (table, name_column, uid_column)) in enumerate(joined_columns.items()):
+        select.append(f"j{index}.[{name_column}] AS [{name}]")
+        joins.append(f"LEFT JOIN [{table}] j{index} ON j{index}.uid = i.[{uid_column}]")
+    return (f"SELECT {', '.join(select)} FROM INOUTCOME i {' '.join(joins)} "
+            f"WHERE {active_condition} AND i.DO_TYPE IN ({', '.join('?' * len(types))})")
+
+def load_transactions(db_file, types=tuple(do_types), columns=None, in_memory=False, chunksize=default_chunksize):
+    """
+    Loads the income, expense and transfer transactions from the mmbak file in a single scan of INOUTCOME.
+    The deleted rows are skipped, the dates are converted to datetime64 (UTC), the other columns to their
+    compact types (see mmbak_schema), and the CATEGORY, CURRENCY, ASSET and TO_ASSET names are joined
+    through the uids of the rows.
+
+    Args:
+    db_file (str): Path to the mmbak file.
+    types (tuple): DO_TYPE values to load (see do_types).
+    columns (list, optional): Columns of INOUTCOME to load. Defaults to default_columns.
+    in_memory (bool): Whether to query an in-memory copy of the file (loaded once, for repeated analytics).
+    chunksize (int): Number of rows fetched at once.
+
+    Returns:
+    dict: Name of the transactions (see do_types) -> DataFrame, one per type.
+    """
+    columns = list(default_columns if columns is None else columns)
+    if 'DO_TYPE' not in columns:
+        columns.append('DO_TYPE')
+    # The names are fetched as strings, and made categorical only once all chunks are loaded,
+    # since chunks with different categories cannot be concatenated as categorical
+    dtypes = known_dtypes('INOUTCOME')
+    fetch_dtypes = {column: 'string' if dtypes[column] == 'category' else dtypes[column] for column in columns}
+    fetch_dtypes.update({name: 'string' for name in joined_columns})
+
+    db_driver = DbDriver(db_file, pooled=True, in_memory=in_memory)
+    chunks = list(db_driver.iter_query(transactions_query(columns, types), tuple(types), chunksize, fetch_dtypes))
+    db_driver.close()
+    if chunks:
+        df = pd.concat(chunks, ignore_index=True)
+    else:
+        df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in fetch_dtypes.items()})
+
+    for column in date_columns:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], unit='ms').astype('datetime64[ms]')
+    for column in df.columns:
+        if dtypes.get(column) == 'category' or column in joined_columns:
+            df[column] = df[column].astype('category')
+
+    transactions = {}
+    for do_type in types:
+        type_df = df[df['DO_TYPE'] == do_type].reset_index(drop=True)
+        if do_type != 3:
+            type_df = type_df.drop(columns=['toAssetUid', 'TO_ASSET'], errors='ignore')
+        transactions[do_types.get(do_type, do_type)] = type_df
+    return transactions
@@ -1,30 +1,105 @@
 import os
+import csv
+import json
+from email.utils import parsedate_to_datetime
 from time import sleep
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 import sys
 from datetime import datetime
+from ai_cache import AICategoryCache, categories_file_hash, normalize_description_key
+from instrumentation import count
+from rate_limiting import RateLimiter
 
 # Initialize the OpenAI API client (as you did before, not included here)
 #openai.api_key = ""
 model_engine = "gpt-4"
 
-def generate_category(description1, description2, categories_csv):
+_default_cache = None
 
-    transaction_description=f"{description1}; {description2}"
-    print(f"Using ChatGPT for {transaction_description}...")
+def get_default_cache():
+    """
+    Return the persistent cache of the AI responses, opening it on the first call.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AICategoryCache()
+    return _default_cache
 
-    # Read the categories
+def make_client(base_url=None, api_key=None):
+    """
+    Create the OpenAI client. The base URL is configurable, so that a local (fake) server can be used.
+
+    Args:
+    base_url (str, optional): Base URL of the API. Default is $OPENAI_BASE_URL, or the OpenAI API if not set.
+    api_key (str, optional): API key. Default is $OPENAI_API_KEY.
+
+    Returns:
+    OpenAI: Client instance.
+    """
+    # openai is imported only when a client is needed, it is slow to import
+    from openai import OpenAI
+    return OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                  base_url=base_url or os.getenv("OPENAI_BASE_URL"))
+
+client = None # Module client, created on the first use by get_client
+
+def get_client():
+    """
+    Return the module client, creating it on the first call.
+    """
+    global client
+    if client is None:
+        client = make_client()
+    return client
+
+def transient_errors():
+    """
+    Return the OpenAI exceptions worth retrying: rate limits, connection problems, timeouts and server errors.
+    """
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def retry_after_delay(error):
+    """
+    Return the delay asked by the server in the Retry-After (or retry-after-ms) header of the error response.
+
+    Args:
+    error (Exception): Error raised by the client.
+
+    Returns:
+    float or None: Delay in seconds, None if the error has no such header.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
     try:
-        with open(categories_csv, 'r') as template_file:
-            categories = template_file.read()
-    except FileNotFoundError:
-        print(f"Categories file {categories} not found.")
-        return
+        if headers.get('retry-after-ms') is not None:
+            return max(float(headers['retry-after-ms']) / 1000, 0.0)
+        retry_after = headers.get('retry-after')
+        if retry_after is None:
+            return None
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            # HTTP date
+            retry_date = parsedate_to_datetime(retry_after)
+            return max((retry_date - datetime.now(retry_date.tzinfo)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
 
-    # Generate content for the homework (Assuming you have initialized openai before this)
-    response = client.chat.completions.create(model=model_engine,  # or the model you are using
+def build_category_messages(transaction_description, categories):
+    """
+    Build the chat messages asking to categorize one transaction.
+
+    Args:
+    transaction_description (str): Description of the transaction.
+    categories (str): Contents of the categories file.
+
+    Returns:
+    list: Messages for the chat completion request.
+    """
     #messages = [
     #{"role": "user", "content": f"""
     #For the transaction described below, categorize it by selecting a category and subcategory from the provided list, and identify the vendor or a unique identifier for the transaction.
@@ -61,7 +136,7 @@ def generate_category(description1, description2, categories_csv):
 
     #Please follow this format strictly for accurate categorization.
     #"""}
-    messages = [
+    return [
     {"role": "user", "content": f"""
     Please categorize the following transaction:
     Transaction: {transaction_description}
@@ -82,22 +157,354 @@ def generate_category(description1, description2, categories_csv):
     Lunch
     Happy Burger
     """}
-    ])
+    ]
+
+def request_category(client, messages):
+    """
+    Send the categorization request and extract the generated content from the response.
+
+    Args:
+    client (OpenAI): Client to send the request with.
+    messages (list): Messages of the chat completion request.
 
+    Returns:
+    str or None: Generated content, None if the response has no content.
+    """
+    count('ai_requests')
+    response = client.chat.completions.create(model=model_engine, messages=messages)
 
     try:
         #generated_content = response['choices'][0]['message']['content'].strip()
-        generated_content = response.choices[0].message.content.strip()
+        return response.choices[0].message.content.strip()
     except KeyError as e:
         print(f"KeyError: {e}")
         print("Could not find the required key in the response.")
         return
 
+def generate_category(description1, description2, categories_csv, cache=None, use_cache=True):
+    """
+    Categorize the transaction with ChatGPT. The responses are cached on disk, so that the same
+    descriptions (with the same categories list) never cause a second API call.
+
+    Args:
+    description1 (str): First description of the transaction.
+    description2 (str): Second description of the transaction.
+    categories_csv (str): Path to the CSV file containing categories.
+    cache (AICategoryCache, optional): Cache to use. Default is the cache under ./data.
+    use_cache (bool): Whether to use the cache at all.
+
+    Returns:
+    str: Three-line response of the AI (category, subcategory, vendor).
+    """
+    transaction_description=f"{description1}; {description2}"
+
+    # Read the categories
+    try:
+        with open(categories_csv, 'r') as template_file:
+            categories = template_file.read()
+    except FileNotFoundError:
+        print(f"Categories file {categories_csv} not found.")
+        return
+
+    if use_cache:
+        cache = cache if cache is not None else get_default_cache()
+        categories_hash = categories_file_hash(categories_csv)
+        cached_content = cache.get(description1, description2, categories_hash)
+        if cached_content is not None:
+            return cached_content
+
+    print(f"Using ChatGPT for {transaction_description}...")
+
+    # Generate content for the homework (Assuming you have initialized openai before this)
+    messages = build_category_messages(transaction_description, categories)
+    generated_content = request_category(get_client(), messages)
+    if generated_content is None:
+        return
+
+    if use_cache:
+        cache.set(description1, description2, categories_hash, generated_content)
+
     #print("AI-generated response begin:")
     #print(generated_content)
     #print("AI-generated response end:")
     return generated_content
 
+def request_category_with_retries(client, messages, rate_limiter=None, max_retries=5, backoff=1.0, request=request_category):
+    """
+    Send the categorization request, retrying with exponential backoff on rate limits and transient errors.
+    If the server tells how long to wait (Retry-After header, e.g. on HTTP 429), that delay is used instead.
+
+    Args:
+    client (OpenAI): Client to send the request with.
+    messages (list): Messages of the chat completion request.
+    rate_limiter (RateLimiter, optional): Limiter to acquire a request slot (and tokens) from before every attempt.
+    max_retries (int): Maximal number of retries after the first attempt.
+    backoff (float): Delay before the first retry in seconds, doubled after every retry.
+    request (function): Function sending the request, request_category or request_category_batch.
+
+    Returns:
+    Result of the request function (generated content), None if the response has no content.
+    """
+    tokens = estimate_tokens(messages)
+    retried_errors = transient_errors()
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire(tokens)
+        try:
+            return request(client, messages)
+        except retried_errors as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_after_delay(e)
+            if delay is None:
+                delay = backoff * 2 ** attempt
+            print(f"Request failed ({type(e).__name__}), retrying in {delay:.1f} s...")
+            sleep(delay)
+
+def estimate_tokens(messages):
+    """
+    Roughly estimate the number of tokens of the request (about 4 characters per token).
+
+    Args:
+    messages (list): Messages of the chat completion request.
+
+    Returns:
+    int: Estimated number of tokens.
+    """
+    return sum(len(message["content"]) for message in messages) // 4 + 1
+
+def generate_categories_concurrent(descriptions, categories_csv, max_workers=8, requests_per_minute=None,
+                                   tokens_per_minute=None, max_retries=5, backoff=1.0, client=None,
+                                   cache=None, use_cache=True):
+    """
+    Categorize many transactions with ChatGPT at once, sending up to max_workers requests in parallel.
+    Cached descriptions are not sent, and every unique description pair is sent only once.
+
+    Args:
+    descriptions (list): List of (description1, description2) pairs.
+    categories_csv (str): Path to the CSV file containing categories.
+    max_workers (int): Maximal number of requests in flight.
+    requests_per_minute (float, optional): Limit of the requests per minute. Default is no limit.
+    tokens_per_minute (float, optional): Limit of the (estimated) tokens per minute. Default is no limit.
+    max_retries (int): Maximal number of retries of every request.
+    backoff (float): Delay before the first retry in seconds, doubled after every retry.
+    client (OpenAI, optional): Client to send the requests with. Default is the module client.
+    cache (AICategoryCache, optional): Cache to use. Default is the cache under ./data.
+    use_cache (bool): Whether to use the cache at all.
+
+    Returns:
+    list: Generated contents (three-line responses), in the order of the input descriptions.
+    """
+    client = client if client is not None else get_client()
+    with open(categories_csv, 'r') as template_file:
+        categories = template_file.read()
+
+    # The cache is only used from this thread, the workers only send requests
+    if use_cache:
+        cache = cache if cache is not None else get_default_cache()
+        categories_hash = categories_file_hash(categories_csv)
+    keys = [normalize_description_key(description1, description2) for description1, description2 in descriptions]
+    results = {}
+    pending = []
+    for key, (description1, description2) in zip(keys, descriptions):
+        if key in results:
+            continue
+        cached_content = cache.get(description1, description2, categories_hash) if use_cache else None
+        results[key] = cached_content
+        if cached_content is None:
+            pending.append((key, description1, description2))
+
+    if pending:
+        print(f"Using ChatGPT for {len(pending)} transactions...")
+        rate_limiter = None
+        if requests_per_minute is not None or tokens_per_minute is not None:
+            rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+        def categorize(request):
+            _, description1, description2 = request
+            messages = build_category_messages(f"{description1}; {description2}", categories)
+            return request_category_with_retries(client, messages, rate_limiter, max_retries, backoff)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for (key, description1, description2), generated_content in zip(pending, executor.map(categorize, pending)):
+                results[key] = generated_content
+                if use_cache and generated_content is not None:
+                    cache.set(description1, description2, categories_hash, generated_content)
+
+    return [results[key] for key in keys]
+
+def read_known_categories(categories_csv):
+    """
+    Read the categories file into a dictionary of the known categories and their subcategories.
+
+    Args:
+    categories_csv (str): Path to the CSV file containing categories.
+
+    Returns:
+    dict: Category -> set of its subcategories (empty set if it has none).
+    """
+    known_categories = {}
+    with open(categories_csv, 'r', newline='') as categories_file:
+        for row in csv.DictReader(categories_file):
+            subcategories = known_categories.setdefault(row['Category'], set())
+            if row.get('Subcategory'):
+                subcategories.add(row['Subcategory'])
+    return known_categories
+
+def build_batch_messages(transactions, categories):
+    """
+    Build the chat messages asking to categorize many transactions in one request.
+    The categories list is included only once, the transactions are sent as a JSON object keyed by id.
+
+    Args:
+    transactions (dict): Transaction id -> description of the transaction.
+    categories (str): Contents of the categories file.
+
+    Returns:
+    list: Messages for the chat completion request.
+    """
+    return [
+    {"role": "system", "content": f"""
+    You categorize bank transactions. Choose the category and subcategory only from this list (CSV, Category,Subcategory):
+    {categories}
+
+    The user sends a JSON object mapping transaction ids to transaction descriptions.
+    Reply with a JSON object mapping every transaction id to an object with the keys
+    "category", "subcategory" (empty string if not applicable) and "vendor" (vendor or identifier).
+
+    Notes:
+    - If details are insufficient, categorize as 'Other' without a subcategory.
+    - Exclude extraneous information (e.g., transaction numbers) from the vendor.
+
+    Example for {{"0": "HAPPY BURGER #1234 TORONTO ON"}}:
+    {{"0": {{"category": "Food", "subcategory": "Lunch", "vendor": "Happy Burger"}}}}
+    """},
+    {"role": "user", "content": json.dumps(transactions)}
+    ]
+
+def request_category_batch(client, messages):
+    """
+    Send the batched categorization request with JSON output and parse the reply.
+
+    Args:
+    client (OpenAI): Client to send the request with.
+    messages (list): Messages of the chat completion request, see build_batch_messages.
+
+    Returns:
+    dict: Transaction id -> reply object. Empty if the reply is not a valid JSON object.
+    """
+    count('ai_requests')
+    response = client.chat.completions.create(model=model_engine, messages=messages,
+                                              response_format={"type": "json_object"})
+    try:
+        replies = json.loads(response.choices[0].message.content)
+    except (TypeError, ValueError) as e:
+        print(f"Could not parse the batched response: {e}")
+        return {}
+    return replies if isinstance(replies, dict) else {}
+
+def validate_batch_reply(reply, known_categories):
+    """
+    Check a reply for one transaction against the known categories and convert it to the
+    three-line format of generate_category.
+
+    Args:
+    reply (dict): Reply object with the keys 'category', 'subcategory' and 'vendor'.
+    known_categories (dict): Category -> set of its subcategories, see read_known_categories.
+
+    Returns:
+    str or None: Three-line content (category, subcategory, vendor), None if the reply is not valid.
+    """
+    if not isinstance(reply, dict):
+        return None
+    category = str(reply.get('category') or '').strip()
+    subcategory = str(reply.get('subcategory') or '').strip()
+    vendor = str(reply.get('vendor') or '').strip()
+    if category not in known_categories:
+        return None
+    if subcategory and subcategory not in known_categories[category]:
+        return None
+    return f"{category}\n{subcategory}\n{vendor}"
+
+def generate_categories_batch(descriptions, categories_csv, batch_size=20, max_rounds=3, max_workers=4,
+                              requests_per_minute=None, tokens_per_minute=None, max_retries=5, backoff=1.0,
+                              client=None, cache=None, use_cache=True):
+    """
+    Categorize many transactions with ChatGPT, sending batch_size transactions per request with the categories
+    list included only once. The replies are validated against the known categories, and only the transactions
+    with invalid (or missing) replies are sent again, for up to max_rounds rounds.
+
+    Args:
+    descriptions (list): List of (description1, description2) pairs.
+    categories_csv (str): Path to the CSV file containing categories.
+    batch_size (int): Number of transactions per request.
+    max_rounds (int): Maximal number of attempts to get a valid reply for every transaction.
+    max_workers (int): Maximal number of requests in flight.
+    requests_per_minute (float, optional): Limit of the requests per minute. Default is no limit.
+    tokens_per_minute (float, optional): Limit of the (estimated) tokens per minute. Default is no limit.
+    max_retries (int): Maximal number of retries of every request on transient errors.
+    backoff (float): Delay before the first retry in seconds, doubled after every retry.
+    client (OpenAI, optional): Client to send the requests with. Default is the module client.
+    cache (AICategoryCache, optional): Cache to use. Default is the cache under ./data.
+    use_cache (bool): Whether to use the cache at all.
+
+    Returns:
+    list: Generated contents in the three-line format of generate_category, in the order of the input
+          descriptions. None for the transactions without a valid reply.
+    """
+    client = client if client is not None else get_client()
+    with open(categories_csv, 'r') as template_file:
+        categories = template_file.read()
+    known_categories = read_known_categories(categories_csv)
+
+    if use_cache:
+        cache = cache if cache is not None else get_default_cache()
+        categories_hash = categories_file_hash(categories_csv)
+    keys = [normalize_description_key(description1, description2) for description1, description2 in descriptions]
+    results = {}
+    pending = {}
+    for key, (description1, description2) in zip(keys, descriptions):
+        if key in results:
+            continue
+        cached_content = cache.get(description1, description2, categories_hash) if use_cache else None
+        results[key] = cached_content
+        if cached_content is None:
+            pending[str(len(pending))] = (key, description1, description2)
+
+    rate_limiter = None
+    if requests_per_minute is not None or tokens_per_minute is not None:
+        rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def categorize(batch):
+        transactions = {transaction_id: f"{pending[transaction_id][1]}; {pending[transaction_id][2]}" for transaction_id in batch}
+        messages = build_batch_messages(transactions, categories)
+        return request_category_with_retries(client, messages, rate_limiter, max_retries, backoff,
+                                             request=request_category_batch)
+
+    remaining = list(pending)
+    for round_number in range(max_rounds):
+        if not remaining:
+            break
+        print(f"Using ChatGPT for {len(remaining)} transactions (round {round_number + 1})...")
+        batches = [remaining[start:start + batch_size] for start in range(0, len(remaining), batch_size)]
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch, replies in zip(batches, executor.map(categorize, batches)):
+                for transaction_id in batch:
+                    generated_content = validate_batch_reply((replies or {}).get(transaction_id), known_categories)
+                    if generated_content is None:
+                        failed.append(transaction_id)
+                        continue
+                    key, description1, description2 = pending[transaction_id]
+                    results[key] = generated_content
+                    if use_cache:
+                        cache.set(description1, description2, categories_hash, generated_content)
+        remaining = failed
+
+    if remaining:
+        print(f"No valid category for {len(remaining)} transactions.")
+    return [results[key] for key in keys]
+
 if __name__ == "__main__":
     folder = "/home/vasilii/Documents/Tutoring/Olexandr/Fall 2023/"
     generated_file = generate_homework(folder)
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from instrumentation import count
+
+default_cache_file = './data/ai_cache.sqlite' # Path to the persistent cache of the AI categorization results
+
+def normalize_description_key(description1, description2): #{{{
+    """
+    Builds the cache key of a transaction from its two descriptions:
+    missing values become empty strings, digits are masked with '*', whitespace is collapsed and case is ignored.
+
+    Args:
+    description1 (str): First description of the transaction.
+    description2 (str): Second description of the transaction.
+
+    Returns:
+    str: Normalized key of the description pair.
+    """
+    parts = []
+    for description in (description1, description2):
+        if description is None or description != description: # None or NaN
+            description = ''
+        description = re.sub(r'\d', '*', str(description))
+        parts.append(' '.join(description.split()).casefold())
+    return '\x1f'.join(parts)
+#}}}
+
+def categories_file_hash(categories_csv): #{{{
+    """
+    Computes the hash of the categories file, so that cached results are invalidated when the categories change.
+
+    Args:
+    categories_csv (str): Path to the CSV file containing categories.
+
+    Returns:
+    str: SHA-256 hex digest of the file contents.
+    """
+    with open(categories_csv, 'rb') as categories_file:
+        return hashlib.sha256(categories_file.read()).hexdigest()
+#}}}
+
+class AICategoryCache: #{{{
+    """
+    Persistent SQLite cache of the AI categorization responses.
+    Entries are keyed on the normalized description pair and the hash of the categories list.
+
+    Methods:
+    __init__(self, db_file, max_entries, max_age_days) - Open (or create) the cache.
+    get(self, description1, description2, categories_hash) - Return the cached response or None.
+    set(self, description1, description2, categories_hash, response) - Store a response.
+    evict(self) - Remove the entries that are too old, then the least recently used ones above max_entries.
+    invalidate(self, categories_hash=None) - Remove the entries made with other categories (or all entries).
+    stats(self) - Return the hit/miss counters and the number of entries.
+    close(self) - Close the cache database.
+    """
+    def __init__(self, db_file=default_cache_file, max_entries=100000, max_age_days=365):
+        """
+        Open (or create) the cache.
+
+        Args:
+        db_file (str): Path to the SQLite file of the cache.
+        max_entries (int or None): Maximal number of entries to keep. None for no limit.
+        max_age_days (float or None): Maximal age of the entries in days. None for no limit.
+        """
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_file)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS ai_categories (
+                description_key TEXT NOT NULL,
+                categories_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (description_key, categories_hash)
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ai_categories_last_used ON ai_categories (last_used)")
+        self.connection.commit()
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.evict()
+
+    def get(self, description1, description2, categories_hash):
+        """
+        Return the cached response for the transaction, None if it is not cached.
+
+        Args:
+        description1 (str): First description of the transaction.
+        description2 (str): Second description of the transaction.
+        categories_hash (str): Hash of the categories file, see categories_file_hash.
+
+        Returns:
+        str or None: Cached AI response.
+        """
+        key = normalize_description_key(description1, description2)
+        row = self.connection.execute(
+            "SELECT response, created FROM ai_categories WHERE description_key = ? AND categories_hash = ?",
+            (key, categories_hash)).fetchone()
+        if row is None or self._is_expired(row[1]):
+            self.misses += 1
+            count('ai_cache_misses')
+            return None
+        self.hits += 1
+        count('ai_cache_hits')
+        self.connection.execute(
+            "UPDATE ai_categories SET last_used = ? WHERE description_key = ? AND categories_hash = ?",
+            (time.time(), key, categories_hash))
+        self.connection.commit()
+        return row[0]
+
+    def set(self, description1, description2, categories_hash, response):
+        """
+        Store the AI response for the transaction.
+
+        Args:
+        description1 (str): First description of the transaction.
+        description2 (str): Second description of the transaction.
+        categories_hash (str): Hash of the categories file, see categories_file_hash.
+        response (str): AI response to cache.
+        """
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO ai_categories VALUES (?, ?, ?, ?, ?)",
+            (normalize_description_key(description1, description2), categories_hash, response, now, now))
+        self.connection.commit()
+        if self.max_entries is not None and self._count() > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the entries older than max_age_days, then the least recently used entries above max_entries.
+        """
+        if self.max_age_days is not None:
+            self.connection.execute("DELETE FROM ai_categories WHERE created < ?",
+                                    (time.time() - self.max_age_days * 86400,))
+        if self.max_entries is not None:
+            self.connection.execute("""
+                DELETE FROM ai_categories WHERE rowid IN (
+                    SELECT rowid FROM ai_categories ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+        self.connection.commit()
+
+    def invalidate(self, categories_hash=None):
+        """
+        Remove the entries made with a different categories list. Call it when categories.csv changes.
+
+        Args:
+        categories_hash (str, optional): Hash of the current categories file. If None, all entries are removed.
+        """
+        if categories_hash is None:
+            self.connection.execute("DELETE FROM ai_categories")
+        else:
+            self.connection.execute("DELETE FROM ai_categories WHERE categories_hash != ?", (categories_hash,))
+        self.connection.commit()
+
+    def stats(self):
+        """
+        Return the hit/miss counters of this session and the number of stored entries.
+
+        Returns:
+        dict: 'hits', 'misses', 'hit_rate' and 'entries'.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': self._count(),
+        }
+
+    def close(self):
+        """
+        Close the cache database.
+        """
+        self.connection.close()
+
+    def _count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM ai_categories").fetchone()[0]
+
+    def _is_expired(self, created):
+        return self.max_age_days is not None and created < time.time() - self.max_age_days * 86400
+#}}}
@@ -0,0 +1,206 @@
+# Author: Vasilii Pustovoit. 01/2024.
+"""
+Declarative per-bank formats of the transactions CSV exports, read with pyarrow.
+
+Every bank is described in config/bank_formats.json by:
+- columns: source column -> {"name": internal column name, "type": "string" | "float64" | "int64" | "date"}.
+  Only these columns are read, all others (e.g. Cheque Number) are never materialized.
+- date_format: strptime format of the "date" columns.
+- sign (optional): 1, or -1 if the bank reports expenses as positive amounts.
+- account_translations (optional): CSV file translating the bank account numbers to MM accounts
+  (columns RBCAccount, MoneyManagerAccount). Default is the translations file given to the import.
+- account, account_type (optional): constant account number/type, for exports without such columns.
+- delimiter, encoding, skip_rows (optional): CSV parsing options.
+New banks are added by adding an entry to the file, no code changes are needed.
+"""
+import csv
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+default_bank_formats_file = './config/bank_formats.json' # Path to the bank formats
+
+# Columns of the DataFrame produced for every bank (the RBC columns, after alter_transactions_df)
+internal_columns = ["Account Type", "Account Number", "Date", "Description 1", "Description 2", "CAD$", "USD$"]
+amount_columns = ["CAD$", "USD$"]
+
+arrow_types = {
+    'string': pa.string(),
+    'float64': pa.float64(),
+    'int64': pa.int64(),
+    'date': pa.timestamp('s'),
+}
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def load_bank_formats(bank_formats_file=default_bank_formats_file): #{{{
+    """
+    Reads the bank formats file.
+
+    Args:
+    bank_formats_file (str): Path to the JSON file with the bank formats.
+
+    Returns:
+    dict: Bank name -> format specification.
+    """
+    with open(bank_formats_file, 'r') as formats_file:
+        return json.load(formats_file)
+#}}}
+
+def detect_bank_format(file_path, bank_formats): #{{{
+    """
+    Finds the bank format of the transactions file by its header: the first format whose source columns
+    are all present in the file.
+
+    Args:
+    file_path (str): Path to the transactions file.
+    bank_formats (dict): Bank name -> format specification.
+
+    Returns:
+    str: Name of the bank format.
+
+    Raises:
+    ValueError: If no format fits the file.
+    """
+    for bank_name, spec in bank_formats.items():
+        with open(file_path, 'r', newline='', encoding=spec.get('encoding', 'utf-8')) as transactions_file:
+            for _ in range(spec.get('skip_rows', 0)):
+                next(transactions_file, None)
+            header = next(csv.reader(transactions_file, delimiter=spec.get('delimiter', ',')), [])
+        if set(spec['columns']) <= {column.strip() for column in header}:
+            return bank_name
+    raise ValueError(f"No bank format fits the columns of {file_path}")
+#}}}
+
+def compile_bank_format(spec): #{{{
+    """
+    Compiles the format specification into pyarrow CSV reading options.
+
+    Args:
+    spec (dict): Format specification of the bank.
+
+    Returns:
+    tuple: (ReadOptions, ParseOptions, ConvertOptions) for pyarrow.csv.read_csv.
+    """
+    column_types = {source: arrow_types[column['type']] for source, column in spec['columns'].items()}
+    read_options = pa_csv.ReadOptions(skip_rows=spec.get('skip_rows', 0), encoding=spec.get('encoding', 'utf8'))
+    parse_options = pa_csv.ParseOptions(delimiter=spec.get('delimiter', ','))
+    convert_options = pa_csv.ConvertOptions(
+        column_types=column_types,
+        include_columns=list(spec['columns']),
+        timestamp_parsers=[spec['date_format']] if 'date_format' in spec else None,
+        strings_can_be_null=True,
+    )
+    return read_options, parse_options, convert_options
+#}}}
+
+def read_bank_csv(file_path, spec, account_translations=None): #{{{
+    """
+    Reads the transactions file of a bank into the internal DataFrame format
+    (the columns of RBC exports after alter_transactions_df, with datetime64 dates).
+
+    Args:
+    file_path (str): Path to the transactions file.
+    spec (dict): Format specification of the bank.
+    account_translations (dict, optional): Bank account number -> MM account, used if the spec has none.
+
+    Returns:
+    pd.DataFrame: Transactions with the columns 'Account Type', 'Account Number', 'Date', 'Description 1',
+                  'Description 2', 'CAD$', 'USD$'.
+    """
+    read_options, parse_options, convert_options = compile_bank_format(spec)
+    table = pa_csv.read_csv(file_path, read_options=read_options, parse_options=parse_options,
+                            convert_options=convert_options)
+    return table_to_internal_df(table, spec, bank_account_translations(spec, account_translations))
+#}}}
+
+def iter_bank_csv(file_path, spec, account_translations=None, chunksize=100000): #{{{
+    """
+    Reads the transactions file of a bank chunk by chunk, with the pyarrow streaming reader, so that only
+    one chunk is in memory at a time. The chunks are the same as read_bank_csv would give for the whole file.
+
+    Args:
+    file_path (str): Path to the transactions file.
+    spec (dict): Format specification of the bank.
+    account_translations (dict, optional): Bank account number -> MM account, used if the spec has none.
+    chunksize (int): Number of rows of every chunk (the last one may be shorter).
+
+    Yields:
+    pd.DataFrame: Transactions in the format of read_bank_csv.
+    """
+    read_options, parse_options, convert_options = compile_bank_format(spec)
+    account_translations = bank_account_translations(spec, account_translations)
+    reader = pa_csv.open_csv(file_path, read_options=read_options, parse_options=parse_options,
+                             convert_options=convert_options)
+    # The reader gives batches of its own block size, they are regrouped into chunks of chunksize rows
+    pending, pending_rows = [], 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield table_to_internal_df(table.slice(0, chunksize), spec, account_translations)
+            rest = table.slice(chunksize)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield table_to_internal_df(pa.Table.from_batches(pending), spec, account_translations)
+#}}}
+
+def bank_account_translations(spec, account_translations=None): #{{{
+    """
+    Returns the account translations of the bank: the ones of its spec if it has a file, otherwise the given ones.
+    """
+    if 'account_translations' in spec:
+        translation_df = pd.read_csv(spec['account_translations'], dtype=str)
+        return dict(zip(translation_df['RBCAccount'], translation_df['MoneyManagerAccount']))
+    return account_translations
+#}}}
+
+def table_to_internal_df(table, spec, account_translations=None): #{{{
+    """
+    Converts the table read by pyarrow to the internal DataFrame format (see read_bank_csv).
+
+    Args:
+    table (pa.Table): Columns read from the transactions file, with their source names.
+    spec (dict): Format specification of the bank.
+    account_translations (dict, optional): Bank account number -> MM account.
+
+    Returns:
+    pd.DataFrame: Transactions in the format of read_bank_csv.
+    """
+    table = table.rename_columns([spec['columns'][source]['name'] for source in table.column_names])
+    df = table.to_pandas()
+
+    for column in internal_columns:
+        if column not in df.columns:
+            df[column] = pd.Series(None, index=df.index, dtype='float64' if column in amount_columns else 'string')
+    if 'account' in spec:
+        df['Account Number'] = spec['account']
+    if 'account_type' in spec:
+        df['Account Type'] = spec['account_type']
+    for column in amount_columns:
+        df[column] = df[column].astype('float64') * spec.get('sign', 1)
+
+    if account_translations:
+        df = translate_accounts(df, account_translations)
+
+    return df[internal_columns]
+#}}}
+
+def translate_accounts(df, account_translations): #{{{
+    """
+    Replaces the bank account numbers with the MoneyManager account names.
+    Account numbers are read as strings, so the translations are matched as strings too.
+
+    Args:
+    df (pd.DataFrame): Transactions with the 'Account Number' column.
+    account_translations (dict): Bank account number -> MM account.
+
+    Returns:
+    pd.DataFrame: Transactions with the translated 'Account Number' column.
+    """
+    account_translations = {str(account): name for account, name in account_translations.items()}
+    df['Account Number'] = df['Account Number'].astype('string').replace(account_translations)
+    return df
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
@@ -0,0 +1,164 @@
+# Author: Vasilii Pustovoit. 01/2024.
+"""
+Command line entry point of the finance tracker.
+
+Usage (from the repository root):
+python src/cli.py import [--transactions ./data/Funds.csv] [--incremental] ...
+python src/cli.py upload [--file ./data/Funds2.tsv]
+python src/cli.py analyze [--mmbak ./data/file.mmbak] [--plot [--plot-dir ./data/plots]]
+
+Paths default to the config file (./config/finance_tracker.json), the options override them.
+Only the modules needed by the subcommand are imported: pandas/pyarrow for import, the Google API for upload,
+and matplotlib only for analyze --plot. openai is imported only if the AI categorization is actually used.
+"""
+import argparse
+import json
+import os
+import sys
+
+default_config_file = './config/finance_tracker.json' # Path to the config file of the CLI
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def read_config(config_file): #{{{
+    """
+    Reads the config file of the CLI. A missing file gives an empty config.
+
+    Args:
+    config_file (str): Path to the JSON config file.
+
+    Returns:
+    dict: Subcommand -> settings.
+    """
+    if not os.path.exists(config_file):
+        return {}
+    with open(config_file, 'r') as json_file:
+        return json.load(json_file)
+#}}}
+
+def setting(args, config, option, key, default=None): #{{{
+    """
+    Returns the value of the option if given on the command line, otherwise the config value, otherwise the default.
+    """
+    value = getattr(args, option, None)
+    if value is not None:
+        return value
+    return config.get(args.command, {}).get(key, default)
+#}}}
+
+def run_import(args, config): #{{{
+    """
+    Imports the bank statements (see extract_from_csv.main).
+    """
+    import extract_from_csv
+
+    file_locations = (
+        setting(args, config, 'transactions', 'transactions_file', extract_from_csv.transactions_file),
+        setting(args, config, 'accounts', 'account_translations_file', extract_from_csv.account_translations_file),
+        setting(args, config, 'categorizer', 'categorizer_csv', extract_from_csv.categorizer_csv),
+        setting(args, config, 'categories', 'categories_csv', extract_from_csv.categories_csv),
+        setting(args, config, 'history', 'total_xlsx', extract_from_csv.total_xlsx),
+    )
+    drop_date = setting(args, config, 'drop_date', 'drop_date', extract_from_csv.drop_date)
+    drop_date_flag = not args.keep_all and config.get('import', {}).get('drop_date_flag', True)
+    extract_from_csv.main(file_locations, drop_date, drop_date_flag=drop_date_flag, incremental=args.incremental,
+                          chunksize=args.chunksize, max_workers=args.workers, append_tsv=args.append,
+                          report_file=setting(args, config, 'report', 'report_file', './data/run_report.json'),
+                          partial_match=setting(args, config, 'partial_match', 'partial_match', False))
+#}}}
+
+def run_upload(args, config): #{{{
+    """
+    Uploads the exported file to Google Drive.
+    """
+    sys.path.insert(0, os.path.join(repo_dir, 'web'))
+    import upload_to_GDrive
+
+    upload_to_GDrive.main(setting(args, config, 'file', 'file', './data/Funds2.tsv'),
+                          setting(args, config, 'folder_id', 'folder_id'),
+                          setting(args, config, 'mime_type', 'mime_type', 'text/tab-separated-values'))
+#}}}
+
+def run_analyze(args, config): #{{{
+    """
+    Prints the monthly income and outcome totals of the Money Manager backup, and plots them with --plot.
+    """
+    sys.path.insert(0, repo_dir)
+    import pandas as pd
+    from mmbak_analysis_lib.db_driver import DbDriver
+
+    db_driver = DbDriver(setting(args, config, 'mmbak', 'mmbak_file'))
+    df = db_driver.query_to_dataframe("SELECT ZDATE, DO_TYPE, ZMONEY FROM INOUTCOME WHERE IS_DEL = 0 AND DO_TYPE IN (0, 1);")
+    db_driver.close()
+
+    df['Month'] = pd.to_datetime(pd.to_numeric(df['ZDATE']), unit='ms').dt.to_period('M')
+    df['Type'] = df['DO_TYPE'].map({0: 'Income', 1: 'Outcome'})
+    monthly_df = df.pivot_table(index='Month', columns='Type', values='ZMONEY', aggfunc=lambda money: pd.to_numeric(money).sum(), fill_value=0)
+    print(monthly_df)
+
+    if args.plot:
+        from mmbak_analysis_lib.data_analysis import plot_batch, plot_data
+        monthly_df = monthly_df.reset_index()
+        monthly_df['Month'] = monthly_df['Month'].dt.to_timestamp()
+        charts = [(monthly_df, f'{column} per month', 'Month', column) for column in monthly_df.columns.drop('Month')]
+        plot_dir = setting(args, config, 'plot_dir', 'plot_dir')
+        if plot_dir is not None:
+            # Headless: the charts are written to files
+            for file in plot_batch(charts, plot_dir, setting(args, config, 'plot_format', 'plot_format', 'png')):
+                print(f"Wrote {file}")
+        else:
+            for chart in charts:
+                plot_data(*chart)
+#}}}
+
+def build_parser(): #{{{
+    """
+    Builds the argument parser of the CLI.
+
+    Returns:
+    argparse.ArgumentParser: Parser with the import, upload and analyze subcommands.
+    """
+    parser = argparse.ArgumentParser(prog='finance-tracker', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=default_config_file, help="Path to the JSON config file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="Import the bank statements into a MoneyManager tsv file")
+    import_parser.add_argument('--transactions', nargs='+', help="Transactions file(s), directories or glob patterns")
+    import_parser.add_argument('--accounts', help="Account translations file")
+    import_parser.add_argument('--categorizer', help="Mappings of the descriptions to categories")
+    import_parser.add_argument('--categories', help="List of categories")
+    import_parser.add_argument('--history', nargs='+', help="Money Manager workbook(s) with the previous transactions")
+    import_parser.add_argument('--drop-date', help="Date before which the transactions are dropped")
+    import_parser.add_argument('--keep-all', action='store_true', help="Do not drop the transactions before the drop date")
+    import_parser.add_argument('--incremental', action='store_true', help="Import only the transactions not imported yet")
+    import_parser.add_argument('--append', action='store_true', help="With --incremental, append the new transactions to the full tsv file")
+    import_parser.add_argument('--chunksize', type=int, help="Stream the transactions file in chunks of this many rows")
+    import_parser.add_argument('--partial-match', action='store_true', default=None,
+                               help="Also match the categorization rules by Description 1 only and as substrings")
+    import_parser.add_argument('--workers', type=int, help="Number of processes for many transactions files")
+    import_parser.add_argument('--report', help="Path of the JSON run report")
+    import_parser.set_defaults(handler=run_import)
+
+    upload_parser = subparsers.add_parser('upload', help="Upload the exported file to Google Drive")
+    upload_parser.add_argument('--file', help="File to upload")
+    upload_parser.add_argument('--folder-id', help="ID of the Google Drive folder")
+    upload_parser.add_argument('--mime-type', help="MIME type of the file")
+    upload_parser.set_defaults(handler=run_upload)
+
+    analyze_parser = subparsers.add_parser('analyze', help="Summarize a Money Manager backup (mmbak)")
+    analyze_parser.add_argument('--mmbak', help="Money Manager backup file")
+    analyze_parser.add_argument('--plot', action='store_true', help="Plot the monthly totals")
+    analyze_parser.add_argument('--plot-dir', help="Write the plots to files in this directory instead of showing them")
+    analyze_parser.add_argument('--plot-format', choices=['png', 'svg'], help="Format of the plot files")
+    analyze_parser.set_defaults(handler=run_analyze)
+    return parser
+#}}}
+
+def main(argv=None): #{{{
+    args = build_parser().parse_args(argv)
+    args.handler(args, read_config(args.config))
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Author: Vasilii Pustovoit. 01/2024.
+import pandas as pd
+
+# Date formats found in the inputs: RBC statements, then MoneyManager workbooks (with or without time)
+known_date_formats = ['%m/%d/%Y', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+
+mm_date_format = '%Y/%m/%d' # Date format of MoneyManager
+mm_datetime_format = '%Y/%m/%d %H:%M:%S' # Date format of MoneyManager for the transactions with time
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def parse_dates(series, formats=known_date_formats): #{{{
+    """
+    Parses a column of dates in any of the known formats into datetime64, one vectorized pass per format.
+    Columns that are already datetime64 are returned unchanged.
+
+    Args:
+    series (pd.Series): Column with the dates (strings, datetime objects or datetime64).
+    formats (list): Formats to try, in order.
+
+    Returns:
+    pd.Series: Column of datetime64 values (NaT for missing values).
+
+    Raises:
+    ValueError: If some of the dates are in none of the formats.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    # datetime objects (e.g. from Excel cells) are converted by the first pass whatever the format
+    present = series.notna() & (series.astype('string') != '')
+    parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[us]')
+    for date_format in formats:
+        remaining = parsed.isna() & present
+        if not remaining.any():
+            break
+        parsed[remaining] = pd.to_datetime(series[remaining], format=date_format, errors='coerce')
+
+    unparsed = parsed.isna() & present
+    if unparsed.any():
+        raise ValueError(f"Unknown date format: {series[unparsed].iloc[0]!r} ({unparsed.sum()} dates)")
+    return parsed
+#}}}
+
+def format_dates(series): #{{{
+    """
+    Formats a datetime64 column for MoneyManager: dates without time as 'YYYY/MM/DD',
+    dates with time as 'YYYY/MM/DD HH:MM:SS'.
+
+    Args:
+    series (pd.Series): Column of datetime64 values.
+
+    Returns:
+    pd.Series: Column of formatted strings (empty for NaT).
+    """
+    has_time = series.notna() & (series != series.dt.normalize())
+    formatted = series.dt.strftime(mm_date_format)
+    if has_time.any():
+        formatted[has_time] = series[has_time].dt.strftime(mm_datetime_format)
+    return formatted.fillna('')
+#}}}
+
+def format_date_columns(df): #{{{
+    """
+    Returns the DataFrame with all its datetime64 columns formatted for MoneyManager (see format_dates).
+    Only the date columns are replaced, the other columns are not copied.
+
+    Args:
+    df (pd.DataFrame): DataFrame to be written.
+
+    Returns:
+    pd.DataFrame: DataFrame with the formatted date columns.
+    """
+    date_columns = [column for column in df.columns if pd.api.types.is_datetime64_any_dtype(df[column])]
+    if not date_columns:
+        return df
+    return df.assign(**{column: format_dates(df[column]) for column in date_columns})
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
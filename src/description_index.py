@@ -0,0 +1,199 @@
+# Author: Vasilii Pustovoit. 01/2024.
+from collections import deque
+import pandas as pd
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def normalize_description_column(series): #{{{
+    """
+    Normalizes a column of transaction descriptions the same way they are stored in descriptions_categorization.csv:
+    missing values become empty strings and every digit is masked with '*'.
+
+    Args:
+    series (pd.Series): Column with the raw descriptions.
+
+    Returns:
+    pd.Series: Column with the normalized descriptions.
+    """
+    return series.fillna('').astype(str).str.replace(r'\d', '*', regex=True)
+#}}}
+
+class PatternAutomaton: #{{{
+    """
+    Aho-Corasick automaton, finding all the occurrences of many patterns in a text in one pass over it.
+
+    Methods:
+    __init__(self, patterns) - Compile the automaton for the list of patterns.
+    find(self, text) - Return the ids (positions in the patterns list) of all patterns found in the text.
+    """
+    def __init__(self, patterns):
+        """
+        Compile the automaton.
+
+        Args:
+        patterns (list): List of the (non-empty) strings to search for.
+        """
+        # Trie of the patterns: transitions, failure links and pattern ids ending in every node
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node].append(pattern_id)
+
+        # Failure links are built breadth-first, so that the link of the parent is always ready
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """
+        Find all patterns occurring in the text.
+
+        Args:
+        text (str): Text to search in.
+
+        Returns:
+        set: Ids of the patterns found in the text.
+        """
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            found.update(self.output[node])
+        return found
+#}}}
+
+class DescriptionIndex: #{{{
+    """
+    Compiled matcher of the transaction descriptions against the rules of descriptions_categorization.csv.
+    Build it once per run, then match whole columns of descriptions at once.
+
+    The rules are tried in the following order:
+    1. 'exact': both Description 1 and Description 2 equal to the ones of the rule.
+    2. 'description1' (partial, opt-in): Description 1 equal to the one of a rule with an empty Description 2.
+    3. 'substring' (partial, opt-in): Description 1 of the rule is contained in Description 1 of the
+       transaction (and Description 2 of the rule, if not empty, in Description 2 of the transaction).
+       The longest matching rule wins.
+    If several rules are equally good, the first one in the file wins.
+    The partial matches are off by default, since a rule could then categorize unrelated transactions
+    (e.g. a rule 'SHELL' any transaction containing it); enable them with partial_match.
+
+    Methods:
+    __init__(self, mappings_df, partial_match=False) - Compile the index from the mappings DataFrame.
+    match(self, description1, description2) - Match one normalized description pair.
+    match_frame(self, df, ...) - Match the description columns of a whole DataFrame.
+    """
+    def __init__(self, mappings_df, partial_match=False):
+        """
+        Compile the index.
+
+        Args:
+        mappings_df (pd.DataFrame): DataFrame containing mappings for categorization
+                                    (columns 'Description 1', 'Description 2', 'Category', 'Subcategory', 'Note').
+        partial_match (bool): Whether to also use the 'description1' and 'substring' matches. Default is False.
+        """
+        self.rule_ids = list(mappings_df.index)
+        self.values = list(zip(mappings_df['Category'], mappings_df['Subcategory'], mappings_df['Note']))
+        self.descriptions1 = list(normalize_description_column(mappings_df['Description 1']))
+        self.descriptions2 = list(normalize_description_column(mappings_df['Description 2']))
+
+        # Hash tables for the exact rules
+        self.exact = {}
+        self.description1_only = {}
+        for rule, (description1, description2) in enumerate(zip(self.descriptions1, self.descriptions2)):
+            self.exact.setdefault((description1, description2), rule)
+            if partial_match and description2 == '':
+                self.description1_only.setdefault(description1, rule)
+
+        # Automaton for the substring rules, every pattern may be shared by several rules
+        self.automaton = None
+        if partial_match:
+            patterns = {}
+            for rule, description1 in enumerate(self.descriptions1):
+                if description1:
+                    patterns.setdefault(description1, []).append(rule)
+            self.pattern_rules = list(patterns.values())
+            self.automaton = PatternAutomaton(list(patterns.keys()))
+
+    def match(self, description1, description2):
+        """
+        Match one (already normalized) description pair.
+
+        Args:
+        description1 (str): Normalized Description 1 of the transaction.
+        description2 (str): Normalized Description 2 of the transaction.
+
+        Returns:
+        tuple or None: (rule number, match kind) of the matched rule, None if no rule matches.
+        """
+        rule = self.exact.get((description1, description2))
+        if rule is not None:
+            return rule, 'exact'
+        rule = self.description1_only.get(description1)
+        if rule is not None:
+            return rule, 'description1'
+        if self.automaton is None:
+            return None
+
+        best = None
+        for pattern_id in self.automaton.find(description1):
+            for rule in self.pattern_rules[pattern_id]:
+                if self.descriptions2[rule] in description2:
+                    candidate = (-len(self.descriptions1[rule]), rule)
+                    if best is None or candidate < best:
+                        best = candidate
+        if best is None:
+            return None
+        return best[1], 'substring'
+
+    def match_frame(self, df, description1_col='Description 1', description2_col='Description 2'):
+        """
+        Match the descriptions of a whole DataFrame. Every unique description pair is matched only once.
+
+        Args:
+        df (pd.DataFrame): DataFrame containing the transactions.
+        description1_col (str): Name of the Description 1 column.
+        description2_col (str): Name of the Description 2 column.
+
+        Returns:
+        pd.DataFrame: DataFrame with the same index as df and columns
+                      'Category', 'Subcategory', 'Note' (None for unmatched rows),
+                      'Rule' (index label of the matched row in the mappings, None if unmatched)
+                      and 'Match' (kind of the match, None if unmatched).
+        """
+        keys = pd.MultiIndex.from_arrays([normalize_description_column(df[description1_col]),
+                                          normalize_description_column(df[description2_col])])
+        codes, uniques = pd.factorize(keys)
+
+        matched = []
+        for description1, description2 in uniques:
+            result = self.match(description1, description2)
+            if result is None:
+                matched.append((None, None, None, None, None))
+            else:
+                rule, kind = result
+                matched.append(self.values[rule] + (self.rule_ids[rule], kind))
+
+        columns = ['Category', 'Subcategory', 'Note', 'Rule', 'Match']
+        unique_df = pd.DataFrame(matched, columns=columns, dtype=object)
+        result_df = unique_df.take(codes) if len(unique_df) else pd.DataFrame(columns=columns, dtype=object)
+        result_df.index = df.index
+        return result_df
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
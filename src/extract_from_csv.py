@@ -1,8 +1,21 @@
 # Author: Vasilii Pustovoit. 01/2024.
 import re
+import bisect
+import functools
+import glob
+import os
+import numpy as np
 import pandas as pd
-from categorization import convert_ai_tuple, categorize_ith_expense, extract_descriptions, read_mappings, user_edit_categorization, categorize_expense_from_descriptions, write_new_category
+from bank_formats import default_bank_formats_file, detect_bank_format, iter_bank_csv, load_bank_formats, read_bank_csv
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from description_index import DescriptionIndex, normalize_description_column
+from history_store import load_history
+from import_index import ImportIndex
+from instrumentation import ProgressBar, count, count_rule, default_report_file, instrumented, start_run_report, stop_run_report
+from dates import parse_dates
+from schema import concat_transactions, enforce_schema, to_cents
+from writers import write_mm_tsv
 
 # Specify the path to your CSV files
 transactions_file = './data/Funds.csv' # Path for RBC transactions file
@@ -12,6 +25,7 @@ categories_csv = './config/categories.csv' # Path to the list of categories
 total_xlsx = './data/Money Manager - Excel 2023-01-01 ~ 2023-12-31.xlsx' # Path to excel file with all previous transaction data (MM format)
 
 drop_date='2023-08-01' # A point in time before which the transactions should be dropped (needed to avoid duplicate transactions)
+duplicate_columns = ['Date', 'Account', 'CAD', 'Income/Expense', 'Currency', 'Amount'] # Columns identifying duplicate transactions
 
 file_locations = (transactions_file, account_translations_file, categorizer_csv, categories_csv, total_xlsx) 
 
@@ -42,41 +56,14 @@ def read_excel_to_df(file_path, sheet_name=0): #{{{
         raise ValueError(f"Sheet '{sheet_name}' not found in the Excel file.")
 #}}}
 
-def extract_csv_to_df(file_path): #{{{
+def extract_csv_to_df(file_path, chunksize=None): #{{{
     # Define the column names
     columns = ["Account Type", "Account Number", "Transaction Date", "Cheque Number", "Description 1", "Description 2", "CAD$", "USD$"]
     
-    # Read the CSV file into a Pandas DataFrame
-    df = pd.read_csv(file_path, usecols=columns)
+    # Read the CSV file into a Pandas DataFrame (or an iterator of DataFrames with chunksize rows each)
+    df = pd.read_csv(file_path, usecols=columns, chunksize=chunksize)
     return df
 #}}}
-
-def write_df_to_excel(df, file_path, sheet_name='Sheet1'): #{{{
-    """
-    Writes a DataFrame to an Excel file with a custom sheet name.
-
-    Args:
-    df (pd.DataFrame): The DataFrame to be written to the Excel file.
-    file_path (str): The path where the Excel file will be saved.
-    sheet_name (str): The name of the sheet in the Excel file. Default is 'Sheet1'.
-    """
-    # Write the DataFrame to an Excel file
-    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
-#}}}
-
-def write_df_to_tsv(df, file_path, sep='\t'): #{{{
-    """
-    Writes a DataFrame to a TSV file.
-
-    Args:
-    df (pd.DataFrame): The DataFrame to be written to the TSV file.
-    file_path (str): The path where the TSV file will be saved.
-    sep (str): The separator to use in the file. Default is tab character.
-    """
-    # Write the DataFrame to a TSV file
-    df.to_csv(file_path, sep=sep, index=False)
-#}}}
 #}}}
 
 # DataFrame Manipulation: RBC -> MM Conversion {{{
@@ -91,22 +78,7 @@ def alter_transactions_df(account_translations_file, df): #{{{
     return df
 #}}}
 
-def create_extra_column(df): #{{{
-    """ 
-    We need to create an extra copy of the 'Amount' column in order to make the xlsx readable by MoneyManager
-    """
-    # Create a new column 'Account' (duplicate) with values from 'Amount'
-    df['Account.1'] = df['Amount']
-    
-    # If you want to place this new column at the end, you can reorder the DataFrame
-    columns = df.columns.tolist()
-    columns.append(columns.pop(columns.index('Account.1')))
-    df = df[columns]
-    
-    return df
-#}}}
-
-def convert_rbc_df_to_MMxlsx(df, mappings_df, categories_csv, categorizer_csv): #{{{
+def convert_rbc_df_to_MMxlsx(df, mappings_df, categories_csv, categorizer_csv, batch=True, description_index=None): #{{{
     """
     Converts a DataFrame into the format required by MoneyManager Excel file,
     categorizing each transaction and formatting the DataFrame accordingly.
@@ -116,113 +88,152 @@ def convert_rbc_df_to_MMxlsx(df, mappings_df, categories_csv, categorizer_csv):
     mappings_df (pd.DataFrame): DataFrame containing mappings for categorization.
     categories_csv (str): Path to the CSV file containing categories.
     categorizer_csv (str): Path to the CSV file containing categorizer data.
+    batch (bool): Whether to categorize the whole DataFrame at once (default) or row by row.
+    description_index (DescriptionIndex, optional): Compiled index of the mappings, used in the batch mode.
 
     Returns:
     pd.DataFrame: DataFrame formatted for MoneyManager Excel file.
     """
-    #len_df = 1
-    len_df = len(df)
-
-    df = add_categorization_columns(df)
-    # Categorize every transaction (row) in the array
-    for i in range(len_df):
-        category, subcategory, note = categorize_ith_expense(df, i, mappings_df, categories_csv, categorizer_csv)
-        print(f"Categorized {i} transactions out of {len_df}")
-        write_to_df_row(df, i, category, subcategory, note)
+    df = categorize_rbc_df(df, mappings_df, categories_csv, categorizer_csv, batch, description_index)
     
     df = identify_transferout_transactions(df)
 
-    df = convert_df_to_MMxl_format_preCategory(df)
-    print()
-
-    # Last edit to align with the MoneyManager formatting
-    df = create_extra_column(df)
+    df = finalize_MMxlsx_df(df)
 
     return df
 #}}}
 
-def rename_last_column(df, new_name): #{{{
+@instrumented('categorization')
+def categorize_rbc_df(df, mappings_df, categories_csv, categorizer_csv, batch=True, description_index=None): #{{{
     """
-    Renames the last column of a pandas DataFrame.
+    Adds the categorization columns to the DataFrame and categorizes every transaction.
+    First part of convert_rbc_df_to_MMxlsx (before the transfers are matched).
 
     Args:
-    df (pd.DataFrame): The DataFrame whose last column needs to be renamed.
-    new_name (str): The new name for the last column.
+    df (pd.DataFrame): DataFrame containing transaction data.
+    mappings_df (pd.DataFrame): DataFrame containing mappings for categorization.
+    categories_csv (str): Path to the CSV file containing categories.
+    categorizer_csv (str): Path to the CSV file containing categorizer data.
+    batch (bool): Whether to categorize the whole DataFrame at once (default) or row by row.
+    description_index (DescriptionIndex, optional): Compiled index of the mappings, used in the batch mode.
 
     Returns:
-    pd.DataFrame: The DataFrame with the last column renamed.
+    pd.DataFrame: Categorized DataFrame, still in the RBC format.
     """
-    # Ensure the DataFrame has at least one column
-    if len(df.columns) == 0:
-        raise ValueError("DataFrame has no columns to rename.")
+    #len_df = 1
+    len_df = len(df)
 
-    # Get a list of the current column names
-    column_names = df.columns.tolist()
+    df = add_categorization_columns(df)
+    if batch:
+        # Categorize all transactions at once, fall back to AI/user only for unresolved rows
+        df = categorize_df_batch(df, mappings_df, categories_csv, categorizer_csv, description_index=description_index)
+        df = assign_amount_columns(df)
+    else:
+        # Categorize every transaction (row) in the array
+        from categorization import categorize_ith_expense
+        with ProgressBar(len_df, 'Categorized transactions') as progress:
+            for i in range(len_df):
+                category, subcategory, note = categorize_ith_expense(df, i, mappings_df, categories_csv, categorizer_csv)
+                write_to_df_row(df, i, category, subcategory, note)
+                progress.update()
+    return df
+#}}}
 
-    # Change the name of the last column
-    column_names[-1] = new_name
+@instrumented('conversion to MM format')
+def finalize_MMxlsx_df(df): #{{{
+    """
+    Converts the categorized (and transfer-matched) DataFrame to the MoneyManager format.
+    Last part of convert_rbc_df_to_MMxlsx.
 
-    # Assign the new list of column names to the DataFrame
-    df.columns = column_names
+    Args:
+    df (pd.DataFrame): Categorized DataFrame in the RBC format.
+
+    Returns:
+    pd.DataFrame: DataFrame formatted for MoneyManager Excel file.
+    """
+    df = convert_df_to_MMxl_format_preCategory(df)
+
+    # Compact typed columns: categories, int64 cents and datetime64 dates
+    df = enforce_schema(df)
 
     return df
 #}}}
+
 #}}}
 
 # Dataframe cleanup {{{
-def identify_transferout_transactions(df): #{{{
+@instrumented('transfer matching')
+def identify_transferout_transactions(df, tolerance=0.05, window_days=0): #{{{
     """
     Process transactions in the DataFrame to handle special case of matching income and expense transactions.
+    Every expense is paired with the closest (by amount) unmatched income of opposite type whose amount
+    differs by less than the tolerance, and which happened within window_days of the expense.
+    The paired expense becomes a Transfer-Out to the income account, while the income is dropped.
+
+    Incomes are bucketed by day and sorted by amount, so every expense only bisects into the
+    2*window_days+1 buckets around its date instead of comparing against every other row.
 
     Args:
     df (pd.DataFrame): DataFrame containing transaction data with columns 'Date', 'CAD$', 'Income/Expense', 'Account Number', 'Subcategory', 'Note'
+    tolerance (float): Maximal relative difference between the amounts of a matching pair. Default is 5%.
+    window_days (int): Maximal number of days between the two transactions of a pair. Default is 0 (same day only).
 
     Returns:
     pd.DataFrame: Updated DataFrame after processing.
     """
-    # Group the DataFrame by date
-    grouped = df.groupby('Date')
-
-    # Find indices of rows to be removed and rows to be updated
-    rows_to_remove = []
-    rows_to_update = []
-
-    for _, group in grouped:
-        # Iterate over each combination of transactions within the group
-        for i in group.index:
-            for j in group.index:
-                if i != j and i not in rows_to_remove and j not in rows_to_remove:
-                    #print(f"Checking date {group['Date']},")
-                    #print(f"i={i}, j={j}...")
-                    # Check if they are a matching pair
-                    compare = abs( (group.at[i, 'CAD'] - group.at[j, 'CAD']) / group.at[j, 'CAD'] )
-                    if (compare < 0.05 and
-                        group.at[i, 'Income/Expense'] != group.at[j, 'Income/Expense']):
-                        #print("Success!")
-                        #print(f"Date: {group['Date']}")
-                        
-                        # Identify income and expense rows
-                        income_row = i if group.at[i, 'Income/Expense'] == 'Income' else j
-                        expense_row = j if income_row == i else i
-
-                        # Record rows for removal and update
-                        rows_to_remove.append(income_row)
-                        rows_to_update.append(expense_row)
+    days = (df['Date'].dt.normalize() - pd.Timestamp(0)).dt.days.to_numpy()
+    amounts = df['CAD'].to_numpy(dtype=float)
+    is_income = (df['Income/Expense'] == 'Income').to_numpy()
+
+    # Bucket the incomes by day, each bucket sorted by amount
+    income_buckets = {}
+    for position in np.flatnonzero(is_income)[np.argsort(amounts[is_income], kind='stable')]:
+        amounts_list, positions_list = income_buckets.setdefault(days[position], ([], []))
+        amounts_list.append(amounts[position])
+        positions_list.append(position)
+
+    # Find the pairs of rows: expense -> income
+    pairs = {}
+    for expense in np.flatnonzero(~is_income):
+        amount = amounts[expense]
+        if not amount > 0:
+            continue
+        lower, upper = amount * (1 - tolerance), amount * (1 + tolerance)
+        best = None
+        for day in range(days[expense] - window_days, days[expense] + window_days + 1):
+            if day not in income_buckets:
+                continue
+            amounts_list, positions_list = income_buckets[day]
+            # The closest amounts in a sorted bucket are the neighbours of the insertion point
+            insertion = bisect.bisect_left(amounts_list, amount)
+            for position in (insertion - 1, insertion):
+                if 0 <= position < len(amounts_list) and lower < amounts_list[position] < upper:
+                    candidate = (abs(amounts_list[position] - amount), abs(day - days[expense]), day, position)
+                    if best is None or candidate < best:
+                        best = candidate
+        if best is not None:
+            _, _, day, position = best
+            amounts_list, positions_list = income_buckets[day]
+            # Remove the matched income from its bucket so it can not be matched twice
+            amounts_list.pop(position)
+            pairs[expense] = positions_list.pop(position)
 
     # Process updates and removals
-    for row in rows_to_update:
-        account_number = df.at[rows_to_remove[rows_to_update.index(row)], 'Account Number']
+    expense_rows = df.index[list(pairs.keys())]
+    income_rows = df.index[list(pairs.values())]
+    account_numbers = df.loc[income_rows, 'Account Number'].to_numpy()
 
-        # In case the transfer-out to the same account, drop this transaction so that it doesn't clutter anything
-        if account_number == df.at[row, 'Account Number']:
-            rows_to_remove.append(row)
-        else:
-            df.at[row, 'Category'] = account_number
-            df.at[row, 'Subcategory'] = ''
-            df.at[row, 'Note'] = ''
-            df.at[row, 'Income/Expense'] = 'Transfer-Out'
+    # In case the transfer-out to the same account, drop this transaction so that it doesn't clutter anything
+    same_account = account_numbers == df.loc[expense_rows, 'Account Number'].to_numpy()
+    rows_to_remove = set(income_rows) | set(expense_rows[same_account])
+
+    transfer_rows = expense_rows[~same_account]
+    df.loc[transfer_rows, 'Category'] = account_numbers[~same_account]
+    df.loc[transfer_rows, 'Subcategory'] = ''
+    df.loc[transfer_rows, 'Note'] = ''
+    df.loc[transfer_rows, 'Income/Expense'] = 'Transfer-Out'
 
-    df = df.drop(rows_to_remove)
+    df = df.drop(list(rows_to_remove))
     df = df.reset_index(drop=True)
 
     return df
@@ -238,21 +249,36 @@ def remove_duplicate_transactions(df): #{{{
     Returns:
     pd.DataFrame: A new DataFrame with duplicate transactions removed.
     """
-    # Columns to consider for identifying duplicates
-    columns_to_check = ['Date', 'Account', 'CAD', 'Income/Expense', 'Currency', 'Amount']
-
     # Remove duplicates
-    df_without_duplicates = df.drop_duplicates(subset=columns_to_check, keep='first')
+    df_without_duplicates = df.drop_duplicates(subset=duplicate_columns, keep='first')
 
     return df_without_duplicates
 #}}}
 
+def drop_transactions_in_history(df, df_history): #{{{
+    """
+    Drops the transactions that are already in the history, compared on the same columns as remove_duplicate_transactions.
+    Unlike remove_duplicate_transactions, identical transactions within df are all kept.
+
+    Args:
+    df (pd.DataFrame): The new transactions.
+    df_history (pd.DataFrame): All previous transactions.
+
+    Returns:
+    pd.DataFrame: The transactions of df missing from the history.
+    """
+    # Concatenated first, so that both sides have the same dtypes (e.g. categories)
+    keys = pd.MultiIndex.from_frame(concat_transactions([df_history[duplicate_columns], df[duplicate_columns]]))
+    in_history = keys[len(df_history):].isin(keys[:len(df_history)])
+    return df[~in_history]
+#}}}
+
 def drop_entries_before_date(df, date_str): #{{{
     """
     Drop all entries in the DataFrame that happened before the given date.
 
     Args:
-    df (pd.DataFrame): DataFrame containing a date column with mixed date formats.
+    df (pd.DataFrame): DataFrame containing a datetime64 date column (or strings in any of the known formats).
     date_str (str): The cutoff date in 'YYYY-MM-DD' format.
 
     Returns:
@@ -261,18 +287,8 @@ def drop_entries_before_date(df, date_str): #{{{
     # Convert date_str to a datetime object
     cutoff_date = datetime.strptime(date_str, '%Y-%m-%d')
 
-    # Standardize the date format in the DataFrame
-    def standardize_date(date_str):
-        try:
-            # Try parsing the full datetime format first
-            return datetime.strptime(date_str, '%Y/%m/%d %H:%M:%S')
-        except ValueError:
-            # If it fails, it's likely in the shorter date format
-            # Set the time to 12:00:00
-            return datetime.strptime(date_str + ' 12:00:00', '%Y/%m/%d %H:%M:%S')
-
-
-    df['Date'] = df['Date'].apply(standardize_date)
+    # Standardize the date format in the DataFrame (no-op for datetime64 columns)
+    df['Date'] = parse_dates(df['Date'])
 
     # Filter the DataFrame
     filtered_df = df[df['Date'] >= cutoff_date]
@@ -281,16 +297,57 @@ def drop_entries_before_date(df, date_str): #{{{
 #}}}
 #}}}
 
-def df_to_csv_main(transactions_data_file, account_translations_file): #{{{
-    """
-    This function is extracting the csv file to the dataframe and converts it to the format, usable by the code
-    """
-    df= extract_csv_to_df(transactions_data_file)
-    df = alter_transactions_df(account_translations_file, df)
+@instrumented('ingest')
+def df_to_csv_main(transactions_data_file, account_translations_file, bank_format=None, bank_formats_file=default_bank_formats_file): #{{{
+    """
+    This function is extracting the csv file to the dataframe and converts it to the format, usable by the code.
+    If the bank formats file exists, the file is read with pyarrow according to its bank format
+    (given by name, or detected from the header), otherwise it is read as an RBC export.
+    """
+    if os.path.exists(bank_formats_file):
+        bank_formats = load_bank_formats(bank_formats_file)
+        if bank_format is None:
+            bank_format = detect_bank_format(transactions_data_file, bank_formats)
+        df = read_bank_csv(transactions_data_file, bank_formats[bank_format], read_account_translations(account_translations_file))
+    else:
+        df = extract_csv_to_df(transactions_data_file)
+        df = alter_transactions_df(account_translations_file, df)
+    # Dates are parsed once here and stay datetime64 until the writer
+    df['Date'] = parse_dates(df['Date'])
     account_numbers, account_types = extract_account_numbers_and_types(df)
     return df, account_numbers, account_types
 #}}}
 
+def iter_transactions_chunks(transactions_data_file, account_translations_file, chunksize, bank_format=None,
+                             bank_formats_file=default_bank_formats_file): #{{{
+    """
+    Chunked version of df_to_csv_main: reads the transactions file chunk by chunk with the same reader
+    (the bank format reader if the bank formats file exists, otherwise the RBC export reader).
+
+    Args:
+    transactions_data_file (str): Path to the transactions file.
+    account_translations_file (str): Path for the file to convert from RBC account names to MM.
+    chunksize (int): Number of rows of every chunk.
+    bank_format (str, optional): Name of the bank format, detected from the header if not given.
+    bank_formats_file (str): Path to the bank formats.
+
+    Yields:
+    pd.DataFrame: Transactions of the chunk, with datetime64 dates.
+    """
+    if os.path.exists(bank_formats_file):
+        bank_formats = load_bank_formats(bank_formats_file)
+        if bank_format is None:
+            bank_format = detect_bank_format(transactions_data_file, bank_formats)
+        chunks = iter_bank_csv(transactions_data_file, bank_formats[bank_format],
+                               read_account_translations(account_translations_file), chunksize=chunksize)
+    else:
+        chunks = (alter_transactions_df(account_translations_file, chunk)
+                  for chunk in extract_csv_to_df(transactions_data_file, chunksize=chunksize))
+    for chunk in chunks:
+        chunk['Date'] = parse_dates(chunk['Date'])
+        yield chunk
+#}}}
+
 def replace_account_numbers(translation_file, df): # {{{
     """
     Replaces account numbers in the DataFrame based on a translation file.
@@ -299,11 +356,8 @@ def replace_account_numbers(translation_file, df): # {{{
     :param df: Pandas DataFrame with an 'Account Number' column to be replaced.
     :return: DataFrame with replaced account numbers.
     """
-    # Read the translation file into a DataFrame
-    translation_df = pd.read_csv(translation_file)
-
-    # Create a dictionary for account number translation
-    translation_dict = dict(zip(translation_df['RBCAccount'], translation_df['MoneyManagerAccount']))
+    # Dictionary for account number translation, the file is read only once
+    translation_dict = read_account_translations(translation_file)
 
     # Replace account numbers in the DataFrame
     df['Account Number'] = df['Account Number'].replace(translation_dict)
@@ -311,6 +365,201 @@ def replace_account_numbers(translation_file, df): # {{{
     return df
 #}}}
 
+def check_sorted_dates(dates, last_date=None, direction=0, transactions_file=''): #{{{
+    """
+    Checks that the dates of a chunk continue the order of the previous chunks.
+
+    Args:
+    dates (pd.Series): datetime64 dates of the chunk.
+    last_date (pd.Timestamp, optional): Last date of the previous chunks.
+    direction (int): Order of the previous chunks: 1 ascending, -1 descending, 0 not known yet (all dates equal).
+    transactions_file (str): Path of the file, for the error message.
+
+    Returns:
+    tuple: (last date, direction) after the chunk.
+
+    Raises:
+    ValueError: If the dates are not sorted.
+    """
+    dates = dates.dropna()
+    if len(dates) == 0:
+        return last_date, direction
+    if last_date is not None:
+        dates = pd.concat([pd.Series([last_date], dtype=dates.dtype), dates], ignore_index=True)
+    ascending, descending = dates.is_monotonic_increasing, dates.is_monotonic_decreasing
+    if not (ascending or descending) or (direction == 1 and not ascending) or (direction == -1 and not descending):
+        raise ValueError(f"The streaming import needs a transactions file sorted by date, {transactions_file} is not: "
+                         "sort it by date, or import it without chunksize.")
+    if not (ascending and descending):
+        direction = 1 if ascending else -1
+    return dates.iloc[-1], direction
+#}}}
+
+def stream_rbc_csv_to_tsv(transactions_file, account_translations_file, mappings_df, categories_csv, categorizer_csv,
+                          output_tsv_path, chunksize=100000, window_days=0, description_index=None, drop_date=None): #{{{
+    """
+    Converts the RBC transactions file to the MoneyManager tsv chunk by chunk, so that the memory use is bounded
+    by the chunk size rather than by the file size. Every chunk is translated, categorized, matched for transfers,
+    deduplicated and appended to the output file before the next one is read.
+
+    The only state kept between the chunks is:
+    - the unmatched transactions within window_days of the last date of the chunk, which may still be matched
+      with transfers in the next chunk. This needs the file to be sorted by date (in either direction, as the
+      bank exports are), otherwise a ValueError is raised: the transfers of unsorted files (e.g. grouped by
+      account) would be lost, so they have to be imported without chunksize;
+    - the set of fingerprints of the written transactions, to drop duplicates across chunks.
+
+    Args:
+    transactions_file (str): Path for RBC transactions file.
+    account_translations_file (str): Path for the file to convert from RBC account names to MM.
+    mappings_df (pd.DataFrame): DataFrame containing mappings for categorization.
+    categories_csv (str): Path to the CSV file containing categories.
+    categorizer_csv (str): Path to the CSV file containing categorizer data.
+    output_tsv_path (str): Path of the output tsv file.
+    chunksize (int): Number of rows read at once.
+    window_days (int): Maximal number of days between the two transactions of a transfer.
+    description_index (DescriptionIndex, optional): Compiled index of the mappings.
+    drop_date (str, optional): Date ('YYYY-MM-DD') before which the transactions are dropped, before they are categorized.
+
+    Returns:
+    int: Number of written transactions.
+    """
+    if description_index is None:
+        description_index = DescriptionIndex(mappings_df)
+    written_fingerprints = set()
+    rows_written = 0
+
+    def write_chunk(df):
+        nonlocal rows_written
+        df = finalize_MMxlsx_df(df)
+        fingerprints = pd.util.hash_pandas_object(df[duplicate_columns], index=False)
+        is_new = ~fingerprints.isin(written_fingerprints) & ~fingerprints.duplicated()
+        written_fingerprints.update(fingerprints[is_new])
+        write_mm_tsv(df[is_new], output_tsv_path, append=rows_written > 0)
+        rows_written += int(is_new.sum())
+
+    carry = None
+    last_date, direction = None, 0
+    for chunk in iter_transactions_chunks(transactions_file, account_translations_file, chunksize):
+        last_date, direction = check_sorted_dates(chunk['Date'], last_date, direction, transactions_file)
+        if drop_date is not None:
+            chunk = drop_entries_before_date(chunk, drop_date)
+            if len(chunk) == 0:
+                continue
+        chunk = categorize_rbc_df(chunk, mappings_df, categories_csv, categorizer_csv, description_index=description_index)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        chunk = identify_transferout_transactions(chunk, window_days=window_days)
+        if len(chunk) == 0:
+            continue
+
+        # Unmatched transactions close to the end of the chunk may still pair with the next chunk
+        days = chunk['Date'].dt.normalize()
+        near_end = ((days - days.iloc[-1]).abs() <= pd.Timedelta(days=window_days)) & (chunk['Income/Expense'] != 'Transfer-Out')
+        carry = chunk[near_end]
+        if (~near_end).any():
+            write_chunk(chunk[~near_end])
+
+    if carry is not None and len(carry):
+        write_chunk(carry)
+    return rows_written
+#}}}
+
+def expand_transactions_files(transactions_files): #{{{
+    """
+    Expands the transactions input into a sorted list of files.
+
+    Args:
+    transactions_files (str or list): Path to a transactions file, a directory (all its *.csv files are taken),
+                                      a glob pattern, or a list of those.
+
+    Returns:
+    list: Paths of the transactions files, sorted within every input.
+    """
+    if isinstance(transactions_files, str):
+        transactions_files = [transactions_files]
+    expanded = []
+    for path in transactions_files:
+        if os.path.isdir(path):
+            expanded.extend(sorted(glob.glob(os.path.join(path, '*.csv'))))
+        elif glob.has_magic(path):
+            expanded.extend(sorted(glob.glob(path)))
+        else:
+            expanded.append(path)
+    if not expanded:
+        raise FileNotFoundError(f"No transactions files found in {transactions_files}")
+    return expanded
+#}}}
+
+# Read-only state of the import worker processes, set once per process by init_import_worker
+_worker_state = {}
+
+def init_import_worker(account_translations_file, mappings_df, partial_match=False): #{{{
+    """
+    Initializes an import worker process: the mappings are sent (and the index compiled) once per process,
+    not once per file.
+    """
+    _worker_state['account_translations_file'] = account_translations_file
+    _worker_state['mappings_df'] = mappings_df
+    _worker_state['description_index'] = DescriptionIndex(mappings_df, partial_match)
+#}}}
+
+def read_file_worker(transactions_file): #{{{
+    """
+    Parses one transactions file and categorizes it by the mappings only (no AI/user categorization,
+    which needs the main process). Unresolved rows keep a missing Category.
+    """
+    df, _, _ = df_to_csv_main(transactions_file, _worker_state['account_translations_file'])
+    df = add_categorization_columns(df)
+    df = categorize_df_batch(df, _worker_state['mappings_df'], None, None, fallback=False,
+                             description_index=_worker_state['description_index'])
+    df = assign_amount_columns(df)
+    return df
+#}}}
+
+@instrumented('ingest (parallel)')
+def read_files_parallel(transactions_files, account_translations_file, mappings_df, max_workers=None, partial_match=False): #{{{
+    """
+    Parses and categorizes (by the mappings) many transactions files in parallel, in a process pool.
+    The results are merged in the order of the files, so the output does not depend on the scheduling.
+
+    Args:
+    transactions_files (list): Paths of the transactions files.
+    account_translations_file (str): Path for the file to convert from RBC account names to MM.
+    mappings_df (pd.DataFrame): DataFrame containing mappings for categorization.
+    max_workers (int, optional): Number of processes. Default is the number of CPUs.
+    partial_match (bool): Whether the rules also match partially (see DescriptionIndex).
+
+    Returns:
+    pd.DataFrame: Categorized transactions of all files, still in the RBC format. Rows not resolved by the
+                  mappings have a missing Category, see categorize_unresolved_rows.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_import_worker,
+                             initargs=(account_translations_file, mappings_df, partial_match)) as executor:
+        dfs = list(executor.map(read_file_worker, transactions_files))
+    # The rows of all files are the rows_out of the stage in the run report
+    count('transactions_files', len(dfs))
+    df = pd.concat(dfs, ignore_index=True)
+    # The workers have no run report, so the rule hits are counted on the merged result
+    count_rule_matches(df)
+    return df
+#}}}
+
+@functools.lru_cache(maxsize=None)
+def read_account_translations(translation_file): # {{{
+    """
+    Reads the account translations file into a dictionary (cached, so that every chunk does not read it again).
+
+    :param translation_file: Path to the CSV file containing account translations.
+    :return: Dictionary from RBC account numbers to MoneyManager account names.
+    """
+    # Read the translation file into a DataFrame
+    translation_df = pd.read_csv(translation_file)
+
+    # Create a dictionary for account number translation
+    return dict(zip(translation_df['RBCAccount'], translation_df['MoneyManagerAccount']))
+#}}}
+
 def extract_account_numbers_and_types(df): #{{{
     account_numbers = df["Account Number"].unique()
     
@@ -330,14 +579,14 @@ def add_categorization_columns(df): # {{{
     """
     This funciton adds columns, needed for categorization of the dataframe
     """
-    df["CAD"] = abs(df["CAD$"])
-    df["Income/Expense"] = None
+    df["CAD"] = to_cents(df["CAD$"].abs())
+    df["Income/Expense"] = pd.Series(pd.NA, index=df.index, dtype='string')
     df["Description"] = ''
-    df["Amount"] = None
-    df["Currency"] = None
-    df["Category"] = None
-    df["Subcategory"] = None
-    df["Note"] = None
+    df["Amount"] = df["CAD"]
+    df["Currency"] = 'CAD'
+    df["Category"] = pd.Series(pd.NA, index=df.index, dtype='string')
+    df["Subcategory"] = pd.Series(pd.NA, index=df.index, dtype='string')
+    df["Note"] = pd.Series(pd.NA, index=df.index, dtype='string')
     return df
 #}}}
 
@@ -355,10 +604,7 @@ def convert_df_to_MMxl_format_preCategory(df): # {{{
     df = df.drop("CAD$", axis=1)
     df = df.drop("USD$", axis=1)
 
-    # Convert the 'Date' column to datetime objects
-    df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y')
-    # Convert the datetime objects back to strings in the desired format
-    df['Date'] = df['Date'].dt.strftime('%Y/%m/%d')
+    # The 'Date' column stays datetime64, it is formatted only by the writers
 
     # Define the desired column order
     new_column_order = [
@@ -398,15 +644,153 @@ def sort_ith_expense(df, i): #{{{
     return income_expense
 #}}}
 
+def categorize_df_batch(df, mappings_df, categories_csv, categorizer_csv, fallback=True, description_index=None): #{{{
+    """
+    Categorizes all transactions of the DataFrame in one pass.
+    Rows whose descriptions match the mappings are resolved through the compiled DescriptionIndex.
+    Only the remaining rows go through categorize_ith_expense (AI/user categorization),
+    and it is called once per unique unresolved description pair.
+
+    Args:
+    df (pd.DataFrame): DataFrame containing transaction data with the categorization columns.
+    mappings_df (pd.DataFrame): DataFrame containing mappings for categorization.
+    categories_csv (str): Path to the CSV file containing categories.
+    categorizer_csv (str): Path to the CSV file containing categorizer data.
+    fallback (bool): Whether to categorize unresolved rows with categorize_ith_expense.
+                     If False, they are left with None categories.
+    description_index (DescriptionIndex, optional): Compiled index of the mappings.
+                                                    If not given, it is compiled from mappings_df.
+
+    Returns:
+    pd.DataFrame: DataFrame with the Category, Subcategory and Note columns filled in, and the Rule
+                  (index label of the matched rule in the mappings) and Match (kind of the match) columns,
+                  missing for the rows not resolved by the mappings.
+    """
+    if description_index is None:
+        description_index = DescriptionIndex(mappings_df)
+    matched = description_index.match_frame(df)
+    df['Category'] = matched['Category']
+    df['Subcategory'] = matched['Subcategory']
+    df['Note'] = matched['Note']
+    # The matched rule of every row is kept for auditing (dropped by finalize_MMxlsx_df)
+    df['Rule'] = matched['Rule']
+    df['Match'] = matched['Match']
+    count_rule_matches(df)
+
+    if fallback:
+        df = categorize_unresolved_rows(df, matched['Rule'].isna(), mappings_df, categories_csv, categorizer_csv)
+    return df
+#}}}
+
+def count_rule_matches(df): #{{{
+    """
+    Counts the rule hits and the unresolved rows in the run report, per kind of match and per rule.
+
+    Args:
+    df (pd.DataFrame): DataFrame with the Rule and Match columns set by categorize_df_batch.
+    """
+    resolved = df['Rule'].notna()
+    count('rule_hits', resolved.sum())
+    count('unresolved_rows', (~resolved).sum())
+    for kind, hits in df.loc[resolved, 'Match'].value_counts().items():
+        count(f'rule_matches_{kind}', hits)
+    for (rule, kind), hits in df[resolved].groupby(['Rule', 'Match'], sort=False).size().items():
+        count_rule(rule, kind, hits)
+#}}}
+
+def prefetch_ai_categories(descriptions, categories_csv): #{{{
+    """
+    Sends the descriptions to the AI with generate_categories_batch (many transactions per request, requests
+    in parallel), which stores the responses in the AI cache read by generate_category.
+    If the AI can not be reached, nothing is prefetched and the transactions are categorized one by one.
+
+    Args:
+    descriptions (list): List of (description1, description2) pairs.
+    categories_csv (str): Path to the CSV file containing categories.
+    """
+    # Imported here, like the rest of the AI categorization, only when it is needed
+    from AI_categorization import generate_categories_batch
+    try:
+        # Few retries, so that an unreachable API does not hold up the import for long
+        contents = generate_categories_batch(descriptions, categories_csv, max_retries=2)
+    except Exception as e:
+        print(f"Could not prefetch the AI categories ({type(e).__name__}: {e}), categorizing one by one.")
+        return
+    count('ai_prefetched', sum(content is not None for content in contents))
+#}}}
+
+@instrumented('AI/user categorization')
+def categorize_unresolved_rows(df, unresolved_mask, mappings_df, categories_csv, categorizer_csv): #{{{
+    """
+    Categorizes the rows not resolved by the mappings with categorize_ith_expense (AI/user categorization).
+    Rows are grouped by description pair, so that each pair is categorized only once.
+    The unique pairs are first sent to the AI in batched, concurrent requests (see prefetch_ai_categories),
+    so that categorize_ith_expense finds the AI responses in the cache instead of requesting them one by one.
+
+    Args:
+    df (pd.DataFrame): DataFrame containing transaction data with the categorization columns.
+    unresolved_mask (pd.Series): Boolean mask of the rows to categorize.
+    mappings_df (pd.DataFrame): DataFrame containing mappings for categorization.
+    categories_csv (str): Path to the CSV file containing categories.
+    categorizer_csv (str): Path to the CSV file containing categorizer data.
+
+    Returns:
+    pd.DataFrame: DataFrame with the Category, Subcategory and Note columns filled in for the unresolved rows.
+    """
+    unresolved = df[unresolved_mask]
+    groups = unresolved.groupby([normalize_description_column(unresolved['Description 1']),
+                                 normalize_description_column(unresolved['Description 2'])], sort=False).groups
+    count('ai_categorizations', len(groups))
+    if not groups:
+        return df
+    if categories_csv is not None:
+        prefetch_ai_categories([(df.at[rows[0], 'Description 1'], df.at[rows[0], 'Description 2']) for rows in groups.values()],
+                               categories_csv)
+    # The AI/user categorization module is imported only when there are unresolved rows
+    from categorization import categorize_ith_expense
+    with ProgressBar(len(groups), 'Categorized unknown descriptions') as progress:
+        for rows in groups.values():
+            category, subcategory, note = categorize_ith_expense(df, rows[0], mappings_df, categories_csv, categorizer_csv)
+            df.loc[rows, 'Category'] = category
+            df.loc[rows, 'Subcategory'] = subcategory
+            df.loc[rows, 'Note'] = note
+            progress.update()
+    return df
+#}}}
+
+def assign_amount_columns(df): #{{{
+    """
+    Vectorized version of sort_ith_expense/write_to_df_row for the money columns:
+    sets Income/Expense, CAD, Amount (int64 cents) and Currency for all rows at once.
+
+    Args:
+    df (pd.DataFrame): DataFrame containing transaction data with the 'CAD$' column.
+
+    Returns:
+    pd.DataFrame: DataFrame with the money columns filled in.
+    """
+    money_difference = pd.to_numeric(df['CAD$'], errors='coerce')
+    if money_difference.isna().any():
+        print(f"Conversion error for values at indices {list(df.index[money_difference.isna()])}")
+
+    df['Income/Expense'] = np.where(money_difference > 0, 'Income', 'Expense')
+    df['CAD'] = to_cents(money_difference.abs())
+    df['Amount'] = df['CAD']
+    df['Currency'] = 'CAD'
+    return df
+#}}}
+
+@instrumented('join')
 def join_dfs(df1, df2): #{{{
-    df1 = df1.reset_index(drop=True)
-    df2 = df2.reset_index(drop=True)
-    df_joined = pd.concat([df1, df2], ignore_index=True)
+    # Categorical columns stay categorical in the joined dataframe
+    df_joined = concat_transactions([df1, df2])
     return df_joined
 #}}}
 
+@instrumented('cleanup')
 def cleanup_df(df): #{{{
-    df = df.sort_values(by='Date')
+    # Stable sort, so that the first of the duplicates kept is always the same
+    df = df.sort_values(by='Date', kind='stable')
     df = remove_duplicate_transactions(df)
     return df
 #}}}
@@ -435,33 +819,136 @@ def write_to_df_row(df, i, category, subcategory, note): #{{{
 #}}}
 
 
-def main(file_locations, drop_date, drop_date_flag=False): #{{{
+def main(file_locations, drop_date, drop_date_flag=False, incremental=False, chunksize=None, max_workers=None, append_tsv=False,
+         report_file=default_report_file, partial_match=False): #{{{
     """
     Main function to process transaction files and convert them into the
     format required by MoneyManager Excel file.
+    Runs import_transactions and writes the run report (time of every stage, rule hits, AI calls, cache hit rates).
+
+    Args:
+    file_locations, drop_date, drop_date_flag, incremental, chunksize, max_workers, append_tsv, partial_match: See import_transactions.
+    report_file: Path of the JSON run report. None to skip the report.
+    """
+    report = start_run_report()
+    try:
+        import_transactions(file_locations, drop_date, drop_date_flag, incremental, chunksize, max_workers, append_tsv, partial_match)
+    finally:
+        stop_run_report()
+        if report_file is not None:
+            report.write(report_file)
+            print(f"Run report written to {report_file}")
+#}}}
+
+def import_transactions(file_locations, drop_date, drop_date_flag=False, incremental=False, chunksize=None, max_workers=None, append_tsv=False,
+                        partial_match=False): #{{{
+    """
+    Processes transaction files and converts them into the format required by MoneyManager Excel file.
 
     Args:
     file_locations (tuple): A tuple containing paths to the files. The tuple should contain:
-                            - Path to the transactions file.
+                            - Path to the transactions file (or a directory, a glob pattern or a list of
+                              those, to import many statements at once in parallel).
                             - Path to the account translations file.
                             - Path to the CSV file containing categorizer data.
                             - Path to the CSV file containing categories.
-                            - Path to the xlsx file containing all previous transactions.
+                            - Path to the xlsx file containing all previous transactions
+                              (or a list of paths, e.g. one workbook per year).
     drop_date: A date before which all transactions should be dropped.
     drop_date_flag: A flag that determines if the transactions will be dropped before a drop_date date. By default, no drop occurs.
-    """
+    incremental: A flag that enables the incremental import. Only the transactions missing from the persisted
+                 import index are processed and written to a separate tsv file. The history is loaded only for
+                 accounts missing from the index (first incremental import): their transactions get the drop_date
+                 cutoff and those already in the history are dropped. Identical transactions of one statement are
+                 all kept, while the full import keeps only one of them.
+    chunksize: If given, the transactions file is streamed in chunks of this many rows straight to the separate
+               tsv file, with bounded memory. The history is not loaded, the drop_date cutoff applies to every chunk.
+               Can not be combined with incremental, and takes a single transactions file.
+    max_workers: Number of processes for the import of many transactions files. Default is the number of CPUs.
+    append_tsv: With incremental, the new transactions are appended to the full tsv file instead of being written
+                to the separate one, so the full file is never rewritten.
+    partial_match: Whether the categorization rules also match by Description 1 only and as substrings
+                   (see DescriptionIndex). By default, only the exact rules are used.
+    """
+    # The categorization module (mappings, AI/user categorization) is imported only by the import itself
+    from categorization import read_mappings
     transactions_file, account_translations_file, categorizer_csv, categories_csv, total_xlsx = file_locations
     output_tsv_path = './data/Funds2.tsv'
-    drop_date = '2023-07-01' # A date before all transactions are dropped from the file
+    output_new_tsv_path = './data/Funds2_new.tsv'
+
+    if append_tsv and not incremental:
+        raise ValueError("Appending to the tsv file requires the incremental import, otherwise transactions would be duplicated.")
+
+    if chunksize is not None:
+        if incremental:
+            raise ValueError("The streaming import can not be combined with the incremental import.")
+        # The CLI always gives a list of inputs; the streaming import reads one file
+        transactions_files = expand_transactions_files(transactions_file)
+        if len(transactions_files) > 1:
+            raise ValueError(f"The streaming import reads one transactions file at a time, got {len(transactions_files)}: "
+                             f"{', '.join(transactions_files)}")
+        mappings_df = read_mappings(categorizer_csv)
+        rows_written = stream_rbc_csv_to_tsv(transactions_files[0], account_translations_file, mappings_df, categories_csv,
+                                             categorizer_csv, output_new_tsv_path, chunksize=chunksize,
+                                             description_index=DescriptionIndex(mappings_df, partial_match),
+                                             drop_date=drop_date if drop_date_flag else None)
+        print(f"Streaming export of {rows_written} transactions to tsv is complete!")
+        return
 
-    df, account_numbers, account_types = df_to_csv_main(transactions_file, account_translations_file)
     mappings_df = read_mappings(categorizer_csv)
+    description_index = DescriptionIndex(mappings_df, partial_match)
+
+    transactions_files = expand_transactions_files(transactions_file)
+    multi_input = len(transactions_files) > 1
+    if multi_input:
+        # Files are parsed and categorized by the mappings in parallel, then merged in a fixed order
+        df = read_files_parallel(transactions_files, account_translations_file, mappings_df, max_workers, partial_match)
+    else:
+        df, account_numbers, account_types = df_to_csv_main(transactions_files[0], account_translations_file)
+
+    if incremental:
+        import_index = ImportIndex()
+        # Accounts missing from the index (first incremental import) get the cutoff and the history dedup of the full import
+        first_import = ~df['Account Number'].astype(str).isin(list(import_index.watermarks()))
+        first_import_accounts = set(df.loc[first_import, 'Account Number'].astype(str))
+        if drop_date_flag and first_import.any():
+            df = df[~first_import | df.index.isin(drop_entries_before_date(df, drop_date).index)]
+        df, fingerprints = import_index.filter_new(df)
+        imported_df = df[['Date', 'Account Number', 'CAD$', 'Description 1', 'Description 2']]
+        df = df.reset_index(drop=True)
+        print(f"{len(df)} new transactions to import")
+
+    if multi_input:
+        # AI/user categorization and transfer matching run on the merged data, since transfers span files
+        df = categorize_unresolved_rows(df, df['Category'].isna(), mappings_df, categories_csv, categorizer_csv)
+        df = identify_transferout_transactions(df)
+        df = finalize_MMxlsx_df(df)
+    else:
+        df = convert_rbc_df_to_MMxlsx(df, mappings_df, categories_csv, categorizer_csv, description_index=description_index)
+
+    if incremental:
+        if first_import_accounts:
+            # Only these accounts are checked against the history, the others were checked against the index.
+            # The accounts were translated at ingest, so they are the MM accounts of the converted rows
+            first_import_rows = df['Account'].astype(str).isin(first_import_accounts)
+            missing = drop_transactions_in_history(df[first_import_rows], load_history(total_xlsx, 'Money Manager'))
+            df = df[~first_import_rows | df.index.isin(missing.index)]
+            print(f"{len(missing)} transactions of {len(first_import_accounts)} new accounts missing from the history")
+        if append_tsv:
+            write_mm_tsv(df, output_tsv_path, append=True) # Append only the new transactions to the full file
+        else:
+            write_mm_tsv(df, output_new_tsv_path) # Write only the new transactions
+        import_index.record(imported_df, fingerprints)
+        import_index.close()
+        print("Export of the new transactions to tsv is complete!")
+        return
 
-    df = convert_rbc_df_to_MMxlsx(df, mappings_df, categories_csv, categorizer_csv)
+    # Obtain dataframe with all data (through the Parquet cache of the workbooks)
+    df_total = load_history(total_xlsx, 'Money Manager')
 
-    # Obtain dataframe with all data
-    df_total = read_excel_to_df(total_xlsx,'Money Manager')
-    df_total = rename_last_column(df_total, 'Account.1')
+    # Drop the new transactions before a certain point in time (the history is kept as is)
+    if drop_date_flag:
+        df = drop_entries_before_date(df, drop_date)
 
     # Join the new and old transactions dataframes
     df_joined = join_dfs(df, df_total)
@@ -469,15 +956,9 @@ def main(file_locations, drop_date, drop_date_flag=False): #{{{
     # Clean up of the combined dataframe
     df_joined = cleanup_df(df_joined)
 
-    # Drop the transactions before a certain point in time
-    if drop_date_flag:
-        df = drop_entries_before_date(df, drop_date)
-
-    # Last step before writing the file - without this MM would not be able to read the tsv file
-    df_joined = rename_last_column(df_joined, 'Account') 
-
-    #write_df_to_excel(df_joined, output_tsv_path, sheet_name='Money Manager') # Write as xlsx
-    write_df_to_tsv(df_joined, output_tsv_path) # Write as tsv
+    # The writers apply the MoneyManager formatting (dates, amounts, last 'Account' column) on the fly
+    #write_mm_xlsx(df_joined, './data/Funds2.xlsx', sheet_name='Money Manager') # Write as xlsx
+    write_mm_tsv(df_joined, output_tsv_path) # Write as tsv
 
     print("Export to tsv is complete!")
  
@@ -492,4 +973,5 @@ def main(file_locations, drop_date, drop_date_flag=False): #{{{
 #}}}
 #-------------------------SOURCE CODE END------------------------------ }}}
 
-main(file_locations,drop_date, drop_date_flag=True)
+if __name__ == "__main__":
+    main(file_locations,drop_date, drop_date_flag=True)
@@ -0,0 +1,108 @@
+# Author: Vasilii Pustovoit. 01/2024.
+import hashlib
+import json
+import os
+import pandas as pd
+from instrumentation import count, instrumented
+from schema import concat_transactions, enforce_schema
+
+default_cache_dir = './data/cache' # Directory for the Parquet copies of the Money Manager workbooks
+cache_version = 4 # Bump when the stored column types change, so that the old copies are rebuilt
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def workbook_signature(file_path, hash_contents=False): #{{{
+    """
+    Computes the signature of the workbook, which tells if the cached copy is still up to date.
+
+    Args:
+    file_path (str): Path to the workbook.
+    hash_contents (bool): Whether to include the SHA-256 of the contents (slower, but safe against
+                          modifications that keep mtime and size).
+
+    Returns:
+    dict: Signature with 'mtime_ns', 'size' and optionally 'sha256'.
+    """
+    stat = os.stat(file_path)
+    signature = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    if hash_contents:
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as workbook:
+            for block in iter(lambda: workbook.read(1 << 20), b''):
+                sha256.update(block)
+        signature['sha256'] = sha256.hexdigest()
+    return signature
+#}}}
+
+def load_workbook_cached(file_path, sheet_name='Money Manager', cache_dir=default_cache_dir, hash_contents=False): #{{{
+    """
+    Reads the Money Manager workbook through a Parquet sidecar cache.
+    The workbook is parsed only if the cache is missing or the signature of the workbook has changed.
+
+    Args:
+    file_path (str): Path to the workbook.
+    sheet_name (str or int): The name or index of the sheet to read.
+    cache_dir (str): Directory for the cached copies.
+    hash_contents (bool): Whether to compare the hash of the contents as well as mtime and size.
+
+    Returns:
+    pd.DataFrame: DataFrame containing the contents of the sheet, last column named 'Account.1'.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"No file found at specified path: {file_path}")
+
+    # The hash of the full path tells apart workbooks with the same name in different directories
+    path_hash = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:8]
+    cache_name = os.path.basename(file_path) + f'.{path_hash}.{sheet_name}'
+    parquet_path = os.path.join(cache_dir, cache_name + '.parquet')
+    meta_path = os.path.join(cache_dir, cache_name + '.json')
+    signature = workbook_signature(file_path, hash_contents)
+
+    if os.path.exists(parquet_path) and os.path.exists(meta_path):
+        with open(meta_path, 'r') as meta_file:
+            meta = json.load(meta_file)
+        if (meta.get('version') == cache_version and meta.get('source') == os.path.abspath(file_path)
+                and meta.get('signature') == signature):
+            count('history_cache_hits')
+            return pd.read_parquet(parquet_path)
+    count('history_cache_misses')
+
+    try:
+        df = pd.read_excel(file_path, sheet_name=sheet_name)
+    except ValueError:
+        raise ValueError(f"Sheet '{sheet_name}' not found in the Excel file.")
+    # The last column of MM workbooks is a second 'Account' column
+    df.columns = df.columns[:-1].tolist() + ['Account.1']
+    # Canonical transaction schema (categories, int64 cents, datetime64 dates).
+    # The workbook amounts are in dollars, even when read_excel gives integers (whole-dollar columns)
+    df = enforce_schema(df, integer_cents=False)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(parquet_path, index=False)
+    with open(meta_path, 'w') as meta_file:
+        json.dump({'version': cache_version, 'source': os.path.abspath(file_path), 'signature': signature}, meta_file)
+    return df
+#}}}
+
+@instrumented('history load')
+def load_history(file_paths, sheet_name='Money Manager', cache_dir=default_cache_dir, hash_contents=False): #{{{
+    """
+    Loads all previous transactions from one or several (e.g. yearly) Money Manager workbooks into one DataFrame.
+    Every workbook is cached separately, so only the changed ones are parsed again.
+
+    Args:
+    file_paths (str or list): Path to the workbook, or list of paths to the workbooks.
+    sheet_name (str or int): The name or index of the sheet to read.
+    cache_dir (str): Directory for the cached copies.
+    hash_contents (bool): Whether to compare the hash of the contents as well as mtime and size.
+
+    Returns:
+    pd.DataFrame: DataFrame with the transactions of all workbooks, in the order of the workbooks.
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    dfs = [load_workbook_cached(file_path, sheet_name, cache_dir, hash_contents) for file_path in file_paths]
+    if len(dfs) == 1:
+        return dfs[0]
+    return concat_transactions(dfs)
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
@@ -0,0 +1,151 @@
+# Author: Vasilii Pustovoit. 01/2024.
+import os
+import sqlite3
+import pandas as pd
+from dates import parse_dates
+from instrumentation import count
+
+default_index_file = './data/import_index.sqlite' # Path to the persisted index of already imported transactions
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def transaction_fingerprints(df): #{{{
+    """
+    Computes a fingerprint for every bank transaction from its date, account, signed amount
+    (which also encodes the Income/Expense type) and the hash of its descriptions.
+    Identical transactions within the DataFrame are told apart by their occurrence number,
+    so that two equal purchases on the same day are not merged into one (the full import instead keeps
+    only one of them, see remove_duplicate_transactions).
+
+    Args:
+    df (pd.DataFrame): DataFrame with the columns 'Date', 'Account Number', 'CAD$', 'Description 1', 'Description 2'.
+
+    Returns:
+    pd.Series: Fingerprints (int64) with the same index as df.
+    """
+    key_df = pd.DataFrame({
+        'Date': parse_dates(df['Date']).dt.strftime('%Y-%m-%d'),
+        'Account': df['Account Number'].astype(str),
+        'Cents': (pd.to_numeric(df['CAD$'], errors='coerce') * 100).round().fillna(0).astype('int64'),
+        'Description': df['Description 1'].fillna('').astype(str) + '\x1f' + df['Description 2'].fillna('').astype(str),
+    }, index=df.index)
+    key_df['Occurrence'] = key_df.groupby(list(key_df.columns), sort=False).cumcount()
+    # hash_pandas_object uses a fixed key, so the fingerprints are stable between runs
+    hashes = pd.util.hash_pandas_object(key_df, index=False).to_numpy(dtype='uint64')
+    return pd.Series(hashes.view('int64'), index=df.index)
+#}}}
+
+class ImportIndex: #{{{
+    """
+    Persisted index of the already imported transactions: fingerprints of all imported transactions
+    and a per-account watermark (date of the latest imported transaction).
+
+    Methods:
+    __init__(self, db_file) - Open (or create) the index.
+    filter_new(self, df, slack_days) - Return only the transactions that were not imported yet.
+    record(self, df, fingerprints) - Add the transactions to the index after they were exported.
+    watermarks(self) - Return the watermark of every account.
+    close(self) - Close the index database.
+    """
+    def __init__(self, db_file=default_index_file):
+        """
+        Open (or create) the index.
+
+        Args:
+        db_file (str): Path to the SQLite file of the index.
+        """
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_file)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                fingerprint INTEGER PRIMARY KEY,
+                account TEXT NOT NULL,
+                date TEXT NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS fingerprints_date ON fingerprints (date)")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                account TEXT PRIMARY KEY,
+                date TEXT NOT NULL
+            )""")
+        self.connection.commit()
+
+    def watermarks(self):
+        """
+        Return the watermark (date of the latest imported transaction) of every account.
+
+        Returns:
+        dict: Account -> watermark date in 'YYYY-MM-DD' format.
+        """
+        return dict(self.connection.execute("SELECT account, date FROM watermarks"))
+
+    def filter_new(self, df, slack_days=7):
+        """
+        Return only the transactions that were not imported yet.
+        Transactions older than the watermark of their account minus slack_days are dropped without
+        a lookup (they are counted as 'import_index_stale_rows' in the run report, with a warning,
+        since they may be late postings), the rest are checked against the fingerprints. Only the fingerprints within that
+        window are loaded, so the cost depends on the size of the new statement, not on the history.
+
+        Args:
+        df (pd.DataFrame): DataFrame with the bank transactions (see transaction_fingerprints).
+        slack_days (int): Number of days before the watermark in which late postings are still looked for.
+
+        Returns:
+        tuple: (new transactions DataFrame with the original index, their fingerprints).
+               Pass both to record once the transactions are exported.
+        """
+        fingerprints = transaction_fingerprints(df)
+        if len(df) == 0:
+            return df, fingerprints
+        dates = parse_dates(df['Date'])
+        accounts = df['Account Number'].astype(str)
+        watermarks = pd.to_datetime(accounts.map(self.watermarks()))
+        cutoffs = watermarks - pd.Timedelta(days=slack_days)
+        in_window = watermarks.isna() | (dates >= cutoffs)
+        stale = int((~in_window).sum())
+        if stale:
+            count('import_index_stale_rows', stale)
+            print(f"Warning: skipped {stale} transactions dated more than {slack_days} days before the last import "
+                  f"of their account (accounts: {', '.join(sorted(accounts[~in_window].unique()))}). "
+                  "If they were posted late, import them without --incremental.")
+
+        window_start = dates[in_window].min()
+        known = set()
+        if pd.notna(window_start):
+            known = {fingerprint for (fingerprint,) in self.connection.execute(
+                "SELECT fingerprint FROM fingerprints WHERE date >= ?", (window_start.strftime('%Y-%m-%d'),))}
+        is_new = in_window & ~fingerprints.isin(known)
+        return df[is_new], fingerprints[is_new]
+
+    def record(self, df, fingerprints=None):
+        """
+        Add the transactions to the index and move the watermarks forward.
+        Call it only after the transactions were successfully exported.
+
+        Args:
+        df (pd.DataFrame): DataFrame with the bank transactions (see transaction_fingerprints).
+        fingerprints (pd.Series, optional): Fingerprints returned by filter_new. Computed from df if not given.
+        """
+        if len(df) == 0:
+            return
+        dates = parse_dates(df['Date']).dt.strftime('%Y-%m-%d')
+        accounts = df['Account Number'].astype(str)
+        if fingerprints is None:
+            fingerprints = transaction_fingerprints(df)
+        self.connection.executemany("INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?)",
+                                    zip(fingerprints.tolist(), accounts, dates))
+        latest = dates.groupby(accounts).max()
+        self.connection.executemany("""
+            INSERT INTO watermarks VALUES (?, ?)
+            ON CONFLICT(account) DO UPDATE SET date = MAX(date, excluded.date)""", latest.items())
+        self.connection.commit()
+
+    def close(self):
+        """
+        Close the index database.
+        """
+        self.connection.close()
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
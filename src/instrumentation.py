@@ -0,0 +1,294 @@
+# Author: Vasilii Pustovoit. 01/2024.
+"""
+Instrumentation of the import pipeline: per-stage wall/CPU time and row counts, counters (rule hits, AI calls,
+cache hits) and a throttled progress bar.
+Stages and counters are recorded into the active run report, if there is one (see start_run_report),
+and cost nothing otherwise, e.g. in the worker processes.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+default_report_file = './data/run_report.json' # Path of the JSON run report
+
+_active_report = None
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+class RunReport: #{{{
+    """
+    Report of one run of the pipeline.
+    Stage times are inclusive: a stage called from another one is counted in both.
+
+    Methods:
+    __init__(self) - Start the report.
+    add_stage(self, name, wall, cpu, rows_in, rows_out) - Record one call of a stage.
+    count(self, name, n) - Increase a counter.
+    count_rule(self, rule, kind, n) - Count the transactions matched by a categorization rule.
+    to_dict(self) - Return the report as a dictionary.
+    write(self, report_file) - Write the report as JSON.
+    """
+    def __init__(self):
+        """
+        Start the report.
+        """
+        self.started = datetime.now()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.stages = {}
+        self.counters = {}
+        self.rules = {}
+        self.lock = threading.Lock() # Counters are increased from the AI request threads
+
+    def add_stage(self, name, wall, cpu, rows_in=None, rows_out=None):
+        """
+        Record one call of a stage. Repeated calls (e.g. one per chunk) are summed up.
+
+        Args:
+        name (str): Name of the stage.
+        wall (float): Wall time in seconds.
+        cpu (float): CPU time of the process in seconds.
+        rows_in (int, optional): Number of input rows.
+        rows_out (int, optional): Number of output rows.
+        """
+        with self.lock:
+            stage = self.stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows_in': 0, 'rows_out': 0})
+            stage['calls'] += 1
+            stage['wall_s'] += wall
+            stage['cpu_s'] += cpu
+            stage['rows_in'] += rows_in or 0
+            stage['rows_out'] += rows_out or 0
+
+    def count(self, name, n=1):
+        """
+        Increase a counter.
+
+        Args:
+        name (str): Name of the counter.
+        n (int): Increment.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def count_rule(self, rule, kind, n=1):
+        """
+        Count the transactions matched by a categorization rule, so that the report tells which rules are used.
+
+        Args:
+        rule: Index label of the rule in the mappings (descriptions_categorization.csv).
+        kind (str): Kind of the match ('exact', 'description1' or 'substring').
+        n (int): Number of transactions.
+        """
+        with self.lock:
+            hits = self.rules.setdefault(str(rule), {})
+            hits[kind] = hits.get(kind, 0) + int(n)
+
+    def to_dict(self):
+        """
+        Return the report as a dictionary. The hit rates are derived from the '<name>_hits'/'<name>_misses'
+        counters, and the rule hit rate from 'rule_hits'/'unresolved_rows'.
+
+        Returns:
+        dict: Report with the total times, the stages, the counters, the rates and the hits of every rule.
+        """
+        counters = dict(self.counters)
+        rates = {}
+        lookups = {'rule': ('rule_hits', 'unresolved_rows')}
+        for name in counters:
+            for suffix in ('_hits', '_misses'):
+                if name.endswith(suffix) and name != 'rule_hits':
+                    prefix = name[:-len(suffix)]
+                    lookups.setdefault(prefix, (prefix + '_hits', prefix + '_misses'))
+        for prefix, (hits_name, misses_name) in lookups.items():
+            hits, misses = counters.get(hits_name, 0), counters.get(misses_name, 0)
+            if hits + misses:
+                rates[prefix + '_hit_rate'] = round(hits / (hits + misses), 4)
+        stages = {name: {key: round(value, 4) if isinstance(value, float) else value for key, value in stage.items()}
+                  for name, stage in self.stages.items()}
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'wall_s': round(time.perf_counter() - self.start_wall, 4),
+            'cpu_s': round(time.process_time() - self.start_cpu, 4),
+            'stages': stages,
+            'counters': counters,
+            'rates': rates,
+            'rules': {rule: dict(hits) for rule, hits in self.rules.items()},
+        }
+
+    def write(self, report_file):
+        """
+        Write the report as JSON.
+
+        Args:
+        report_file (str): Path of the JSON file.
+        """
+        directory = os.path.dirname(report_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(report_file, 'w') as json_file:
+            json.dump(self.to_dict(), json_file, indent=2)
+#}}}
+
+def start_run_report(): #{{{
+    """
+    Start a new run report and make it the active one.
+
+    Returns:
+    RunReport: The new report.
+    """
+    global _active_report
+    _active_report = RunReport()
+    return _active_report
+#}}}
+
+def stop_run_report(): #{{{
+    """
+    Stop recording into the active run report.
+
+    Returns:
+    RunReport or None: The report that was active.
+    """
+    global _active_report
+    report, _active_report = _active_report, None
+    return report
+#}}}
+
+def count(name, n=1): #{{{
+    """
+    Increase a counter of the active run report (no-op without one).
+
+    Args:
+    name (str): Name of the counter.
+    n (int): Increment.
+    """
+    if _active_report is not None:
+        _active_report.count(name, n)
+#}}}
+
+def count_rule(rule, kind, n=1): #{{{
+    """
+    Count the transactions matched by a categorization rule in the active run report (no-op without one).
+
+    Args:
+    rule: Index label of the rule in the mappings.
+    kind (str): Kind of the match.
+    n (int): Number of transactions.
+    """
+    if _active_report is not None:
+        _active_report.count_rule(rule, kind, n)
+#}}}
+
+def _is_frame(value): #{{{
+    """
+    Whether the value is a DataFrame. Checked by its attributes, so that this module does not import pandas
+    (it is imported by the light modules too, e.g. AI_categorization).
+    """
+    return hasattr(value, 'columns') and hasattr(value, 'index')
+#}}}
+
+def _rows(value): #{{{
+    """
+    Number of rows of a DataFrame, or of the first DataFrame of a tuple. None for anything else.
+    """
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    return len(value) if _is_frame(value) else None
+#}}}
+
+def instrumented(stage_name): #{{{
+    """
+    Decorator recording every call of the function as a stage of the active run report:
+    wall and CPU time, rows of the first DataFrame argument and rows of the returned DataFrame.
+
+    Args:
+    stage_name (str): Name of the stage in the report.
+
+    Returns:
+    function: Decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            report = _active_report
+            if report is None:
+                return function(*args, **kwargs)
+            rows_in = next((_rows(arg) for arg in args if _is_frame(arg)), None)
+            start_wall = time.perf_counter()
+            start_cpu = time.process_time()
+            result = function(*args, **kwargs)
+            report.add_stage(stage_name, time.perf_counter() - start_wall, time.process_time() - start_cpu,
+                             rows_in, _rows(result))
+            return result
+        return wrapper
+    return decorator
+#}}}
+
+class ProgressBar: #{{{
+    """
+    Progress bar on stderr, redrawn at most every min_interval seconds, so that it costs nothing
+    even when updated for every row. Can be used as a context manager, which closes it.
+
+    Methods:
+    __init__(self, total, description, min_interval, width) - Create the progress bar.
+    update(self, n) - Advance the progress bar by n steps.
+    close(self) - Draw the final state and end the line.
+    """
+    def __init__(self, total, description='', min_interval=0.2, width=30, stream=None):
+        """
+        Create the progress bar.
+
+        Args:
+        total (int): Total number of steps.
+        description (str): Text in front of the bar.
+        min_interval (float): Minimal time between two redraws in seconds.
+        width (int): Width of the bar in characters.
+        stream (file, optional): Stream to draw on. Default is stderr.
+        """
+        self.total = total
+        self.description = description
+        self.min_interval = min_interval
+        self.width = width
+        self.stream = stream if stream is not None else sys.stderr
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last_draw = None
+
+    def update(self, n=1):
+        """
+        Advance the progress bar by n steps.
+
+        Args:
+        n (int): Number of steps.
+        """
+        self.done += n
+        now = time.perf_counter()
+        if self.last_draw is None or now - self.last_draw >= self.min_interval:
+            self._draw(now)
+
+    def close(self):
+        """
+        Draw the final state and end the line.
+        """
+        self._draw(time.perf_counter())
+        self.stream.write('\n')
+        self.stream.flush()
+
+    def _draw(self, now):
+        self.last_draw = now
+        fraction = self.done / self.total if self.total else 1.0
+        filled = int(self.width * min(fraction, 1.0))
+        elapsed = now - self.start
+        self.stream.write(f"\r{self.description}: [{'#' * filled}{'.' * (self.width - filled)}] "
+                          f"{self.done}/{self.total} ({fraction:4.0%}) {elapsed:6.1f} s")
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
@@ -1,8 +1,10 @@
+import pandas as pd
 from mmbak_analysis_lib.db_driver import DbDriver
 from mmbak_analysis_lib.data_analysis import plot_data
 from mmbak_analysis_lib.categories_analysis import get_active_categories
 from mmbak_analysis_lib.currencies_analysis import get_currencies
-from datetime import datetime, timezone
+from mmbak_analysis_lib.transactions import load_transactions
+from mmbak_analysis_lib.balances import load_balances
 
 # Path to your mmbak file
 mmbak_file_path = './data/MMAuto[GF231230](2023-12-30-115403).mmbak'
@@ -11,21 +13,22 @@ mmbak_file_path = './data/MMAuto[GF231230](2023-12-30-115403).mmbak'
 db_driver = DbDriver(mmbak_file_path)
 
 # Example: Fetch and plot income/outcome data
-#query = "SELECT ZDATE, ZMONEY FROM INOUTCOME WHERE IS_DEL = 0;"
-income_query =   "SELECT ZDATE, ASSET_NIC, ZMONEY FROM INOUTCOME WHERE DO_TYPE = 0;"
-outcome_query =  "SELECT ZDATE, ASSET_NIC, ZMONEY FROM INOUTCOME WHERE DO_TYPE = 1;"
-transfer_query = "SELECT ZDATE, ASSET_NIC, WDATE, toAssetUid, ZMONEY FROM INOUTCOME WHERE DO_TYPE = 3;"
-income_df = db_driver.query_to_dataframe(income_query)
-outcome_df = db_driver.query_to_dataframe(outcome_query)
-transfer_df = db_driver.query_to_dataframe(transfer_query)
+# Income, expense and transfer rows are loaded in one scan, with the dates already converted to datetime64 (UTC)
+transactions = load_transactions(mmbak_file_path, columns=['ZDATE', 'WDATE', 'ASSET_NIC', 'toAssetUid', 'ZMONEY'])
+income_df, outcome_df, transfer_df = transactions['income'], transactions['expense'], transactions['transfer']
 # Convert each timestamp to a readable date format
-income_df['formatted_date']   =   income_df['ZDATE'].apply(lambda x: datetime.fromtimestamp(int(x) / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC'))
-outcome_df['formatted_date']  =  outcome_df['ZDATE'].apply(lambda x: datetime.fromtimestamp(int(x) / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC'))
-transfer_df['formatted_date'] = transfer_df['ZDATE'].apply(lambda x: datetime.fromtimestamp(int(x) / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC'))
+income_df['formatted_date']   =   income_df['ZDATE'].dt.strftime('%Y-%m-%d %H:%M:%S UTC')
+outcome_df['formatted_date']  =  outcome_df['ZDATE'].dt.strftime('%Y-%m-%d %H:%M:%S UTC')
+transfer_df['formatted_date'] = transfer_df['ZDATE'].dt.strftime('%Y-%m-%d %H:%M:%S UTC')
 
 print(income_df)
 print(outcome_df)
 print(transfer_df)
+
+# Balance of every account today, and at the end of every month of the history
+balances = load_balances(mmbak_file_path)
+print(balances.as_of('today'))
+print(balances.as_of(pd.date_range(income_df['ZDATE'].min().normalize(), 'today', freq='ME')))
 """
 #plot_data(income_outcome_df, 'Income/Outcome Over Time', 'ZDATE', 'ZMONEY', log_scale=True)
 
@@ -0,0 +1,58 @@
+import threading
+import time
+
+class RateLimiter: #{{{
+    """
+    Thread-safe limiter of the requests and tokens per minute (two token buckets refilled continuously).
+
+    Methods:
+    __init__(self, requests_per_minute, tokens_per_minute) - Create the limiter.
+    acquire(self, tokens=0) - Block until one request and the given number of tokens may be spent.
+    """
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Create the limiter. Both buckets start full, so a burst of up to one minute worth of requests is allowed.
+
+        Args:
+        requests_per_minute (float, optional): Maximal number of requests per minute. None for no limit.
+        tokens_per_minute (float, optional): Maximal number of tokens per minute. None for no limit.
+        """
+        self.capacities = (requests_per_minute, tokens_per_minute)
+        self.levels = [requests_per_minute or 0, tokens_per_minute or 0]
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        """
+        Block until one request and the given number of tokens may be spent, then spend them.
+
+        Args:
+        tokens (int): Number of tokens the request is going to use.
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                needed = (1, tokens)
+                wait = 0.0
+                for capacity, level, amount in zip(self.capacities, self.levels, needed):
+                    if capacity is None:
+                        continue
+                    # A request larger than the whole bucket is let through once the bucket is full
+                    amount = min(amount, capacity)
+                    if level < amount:
+                        wait = max(wait, (amount - level) * 60.0 / capacity)
+                if wait == 0.0:
+                    for position, (capacity, amount) in enumerate(zip(self.capacities, needed)):
+                        if capacity is not None:
+                            self.levels[position] -= min(amount, capacity)
+                    return
+            time.sleep(wait)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        for position, capacity in enumerate(self.capacities):
+            if capacity is not None:
+                self.levels[position] = min(capacity, self.levels[position] + elapsed * capacity / 60.0)
+#}}}
@@ -0,0 +1,117 @@
+# Author: Vasilii Pustovoit. 01/2024.
+import numpy as np
+import pandas as pd
+from dates import parse_dates
+
+# Canonical schema of the MoneyManager transactions DataFrame
+mm_columns = ['Date', 'Account', 'Category', 'Subcategory', 'Note', 'CAD', 'Income/Expense', 'Description', 'Amount', 'Currency', 'Account.1']
+date_columns = ['Date']
+categorical_columns = ['Account', 'Category', 'Subcategory', 'Currency', 'Income/Expense']
+money_columns = ['CAD', 'Amount', 'Account.1'] # int64 cents
+text_columns = ['Note', 'Description']
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def to_cents(series): #{{{
+    """
+    Converts a column of money amounts to int64 cents. Missing or invalid amounts become 0.
+    Strings may have thousands separators and a '$' sign, and negative amounts may be in parentheses
+    (accounting format), e.g. '1,234.50' or '($5.00)'.
+
+    Args:
+    series (pd.Series): Column with the amounts (numbers or numeric strings).
+
+    Returns:
+    pd.Series: Column of int64 cents.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        amounts = pd.to_numeric(series, errors='coerce')
+    else:
+        text = series.astype('string').str.strip()
+        negative = text.str.startswith('(') & text.str.endswith(')')
+        text = text.str.replace(r'[\s,$()]', '', regex=True)
+        amounts = pd.to_numeric(text.astype(object), errors='coerce')
+        amounts = amounts.where(~negative.fillna(False), -amounts)
+    if amounts.isna().any():
+        print(f"{amounts.isna().sum()} missing or invalid amounts in column '{series.name}' are set to 0")
+    return pd.Series(np.rint(amounts.fillna(0).to_numpy(dtype='float64') * 100).astype('int64'), index=series.index, name=series.name)
+#}}}
+
+def from_cents(series): #{{{
+    """
+    Converts a column of int64 cents back to decimal amounts.
+
+    Args:
+    series (pd.Series): Column of int64 cents.
+
+    Returns:
+    pd.Series: Column of float amounts.
+    """
+    return series / 100
+#}}}
+
+def enforce_schema(df, integer_cents=True): #{{{
+    """
+    Converts the columns of the transactions DataFrame to the canonical types:
+    datetime64 dates, categorical accounts/categories/subcategories/currencies/types,
+    int64 cents for money and strings for the free text. Columns already of the right type are not touched.
+
+    Args:
+    df (pd.DataFrame): Transactions DataFrame in the MoneyManager format.
+    integer_cents (bool): Whether money columns of integer type are in cents already (frames built by this code).
+                          Must be False for data read from files, where whole-dollar amounts are read as integers.
+
+    Returns:
+    pd.DataFrame: DataFrame with the canonical column types.
+    """
+    for column in df.columns:
+        if column in date_columns:
+            df[column] = parse_dates(df[column])
+        elif column in categorical_columns:
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype('string').astype('category')
+        elif column in money_columns:
+            if not (integer_cents and pd.api.types.is_integer_dtype(df[column])):
+                df[column] = to_cents(df[column])
+        elif column in text_columns:
+            df[column] = df[column].astype('string')
+    return df
+#}}}
+
+def concat_transactions(dfs): #{{{
+    """
+    Concatenates transactions DataFrames in the canonical schema, keeping the categorical columns
+    categorical (their categories are unified first, otherwise pandas would fall back to objects).
+
+    Args:
+    dfs (list): DataFrames to concatenate.
+
+    Returns:
+    pd.DataFrame: Concatenated DataFrame with a new RangeIndex.
+    """
+    dfs = [df for df in dfs if len(df.columns)]
+    for column in categorical_columns:
+        if not all(column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype) for df in dfs):
+            continue
+        # The categories may differ in dtype (e.g. after a Parquet round trip), so they are unified as objects
+        categories = pd.unique(np.concatenate([df[column].cat.categories.to_numpy(dtype=object) for df in dfs]))
+        dfs = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in dfs]
+    return pd.concat(dfs, ignore_index=True)
+#}}}
+
+def format_money_columns(df): #{{{
+    """
+    Returns the DataFrame with its int64 cents columns converted back to decimal amounts for the writers.
+    Only the money columns are replaced, the other columns are not copied.
+
+    Args:
+    df (pd.DataFrame): DataFrame to be written.
+
+    Returns:
+    pd.DataFrame: DataFrame with the decimal money columns.
+    """
+    columns = [column for column in df.columns if column in money_columns and pd.api.types.is_numeric_dtype(df[column])]
+    if not columns:
+        return df
+    return df.assign(**{column: from_cents(df[column]) for column in columns})
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
@@ -0,0 +1,99 @@
+# Author: Vasilii Pustovoit. 01/2024.
+"""
+Writers of the transactions DataFrame in the MoneyManager format.
+The MoneyManager formatting is applied here, chunk by chunk, so the frame itself is never copied or changed:
+- dates are formatted as 'YYYY/MM/DD' (see format_date_columns) and the int64 cents are written as decimal amounts,
+- the last column is written as a second 'Account' column (the 'Account.1' column of the Money Manager workbooks,
+  or a copy of 'Amount' for the transactions that do not have it).
+"""
+import os
+from openpyxl import Workbook
+from dates import format_date_columns
+from instrumentation import instrumented
+from schema import format_money_columns
+
+default_chunk_rows = 50000 # Number of rows formatted at once by the writers
+
+#-------------------------SOURCE CODE---------------------------------- {{{
+def mm_header(df): #{{{
+    """
+    Returns the header of the MoneyManager file for the DataFrame.
+
+    Args:
+    df (pd.DataFrame): Transactions DataFrame in the MoneyManager format.
+
+    Returns:
+    list: Column names, the last one being the second 'Account' column.
+    """
+    return [column for column in df.columns if column != 'Account.1'] + ['Account']
+#}}}
+
+def iter_mm_chunks(df, chunk_rows=default_chunk_rows): #{{{
+    """
+    Yields the DataFrame formatted for MoneyManager, chunk_rows rows at a time.
+    Only one chunk is formatted at once, so the memory does not grow with the size of the DataFrame.
+
+    Args:
+    df (pd.DataFrame): Transactions DataFrame in the MoneyManager format.
+    chunk_rows (int): Number of rows per chunk.
+
+    Yields:
+    pd.DataFrame: Formatted chunk with the columns of mm_header.
+    """
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        last_column = chunk['Amount']
+        if 'Account.1' in chunk.columns:
+            # The transactions joined with the workbooks have no 'Account.1' of their own
+            last_column = chunk['Account.1'].fillna(last_column)
+            chunk = chunk.drop(columns='Account.1')
+        chunk = format_money_columns(format_date_columns(chunk.assign(**{'Account.1': last_column})))
+        chunk.columns = mm_header(chunk)
+        yield chunk
+#}}}
+
+@instrumented('write tsv')
+def write_mm_tsv(df, file_path, sep='\t', append=False, chunk_rows=default_chunk_rows): #{{{
+    """
+    Writes the DataFrame to a TSV file readable by MoneyManager.
+
+    Args:
+    df (pd.DataFrame): Transactions DataFrame in the MoneyManager format.
+    file_path (str): The path where the TSV file will be saved.
+    sep (str): The separator to use in the file. Default is tab character.
+    append (bool): Whether to append the rows to the existing file instead of rewriting it.
+                   The header is written only if the file does not exist yet.
+    chunk_rows (int): Number of rows formatted at once.
+    """
+    write_header = not (append and os.path.exists(file_path) and os.path.getsize(file_path) > 0)
+    with open(file_path, 'a' if append else 'w', newline='') as tsv_file:
+        if write_header:
+            tsv_file.write(sep.join(mm_header(df)) + '\n')
+        for chunk in iter_mm_chunks(df, chunk_rows):
+            chunk.to_csv(tsv_file, sep=sep, index=False, header=False)
+#}}}
+
+@instrumented('write xlsx')
+def write_mm_xlsx(df, file_path, sheet_name='Money Manager', chunk_rows=default_chunk_rows): #{{{
+    """
+    Writes the DataFrame to an Excel file readable by MoneyManager.
+    The workbook is written in the openpyxl write-only mode, which streams the rows to the file
+    instead of building all the cells in memory.
+
+    Args:
+    df (pd.DataFrame): Transactions DataFrame in the MoneyManager format.
+    file_path (str): The path where the Excel file will be saved.
+    sheet_name (str): The name of the sheet in the Excel file. Default is 'Money Manager'.
+    chunk_rows (int): Number of rows formatted at once.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(mm_header(df))
+    for chunk in iter_mm_chunks(df, chunk_rows):
+        # Missing values are written as empty cells
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(file_path)
+#}}}
+#-------------------------SOURCE CODE END------------------------------ }}}
@@ -0,0 +1,77 @@
+"""
+Shared fixtures of the tests: the repository root (mmbak_analysis_lib) and src (flat imports of the import pipeline)
+are put on the path, and make_mmbak writes small Money Manager backups.
+
+Run from the repository root:
+python -m pytest -q tests
+"""
+import os
+import sqlite3
+import sys
+import pytest
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, repo_dir)
+sys.path.insert(0, os.path.join(repo_dir, 'src'))
+
+from mmbak_analysis_lib.connection_pool import close_pools
+from mmbak_analysis_lib.mmbak_schema import mmbak_dtypes
+
+default_categories = [
+    {'uid': 'ctg-food', 'NAME': 'Food', 'TYPE': 1, 'STATUS': 0, 'pUid': None, 'C_IS_DEL': 0},
+    {'uid': 'ctg-food-lunch', 'NAME': 'Lunch', 'TYPE': 1, 'STATUS': 0, 'pUid': 'ctg-food', 'C_IS_DEL': 0},
+    {'uid': 'ctg-salary', 'NAME': 'Salary', 'TYPE': 0, 'STATUS': 0, 'pUid': None, 'C_IS_DEL': 0},
+]
+default_assets = [
+    {'uid': 'ast-chequing', 'NIC_NAME': 'Chequing', 'ZGROUP': 1, 'IS_DEL': 0},
+    {'uid': 'ast-credit', 'NIC_NAME': 'Credit', 'ZGROUP': 2, 'IS_DEL': 0},
+]
+default_currencies = [
+    {'uid': 'cur-cad', 'ISO': 'CAD', 'NAME': 'Canadian dollar', 'SYMBOL': '$'},
+    {'uid': 'cur-usd', 'ISO': 'USD', 'NAME': 'US dollar', 'SYMBOL': 'US$'},
+]
+
+def write_mmbak(file_path, transactions, categories=None, assets=None, currencies=None): #{{{
+    """
+    Writes a small mmbak file with all INOUTCOME columns of mmbak_dtypes (the ones not given stay NULL)
+    and the lookup tables.
+
+    Args:
+    file_path (str): Path of the file, replaced if it exists.
+    transactions (list): INOUTCOME rows, as dicts of column -> value.
+    categories, assets, currencies (list, optional): Rows of ZCATEGORY, ASSET and CURRENCY. Default are the ones above.
+
+    Returns:
+    str: Path of the file.
+    """
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    tables = {
+        'INOUTCOME': transactions,
+        'ZCATEGORY': default_categories if categories is None else categories,
+        'ASSET': default_assets if assets is None else assets,
+        'CURRENCY': default_currencies if currencies is None else currencies,
+    }
+    connection = sqlite3.connect(file_path)
+    try:
+        for table, rows in tables.items():
+            columns = list(mmbak_dtypes[table])
+            connection.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+            connection.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                                   [tuple(row.get(column) for column in columns) for row in rows])
+        connection.commit()
+    finally:
+        connection.close()
+    return file_path
+#}}}
+
+@pytest.fixture
+def make_mmbak(tmp_path):
+    """
+    Returns write_mmbak with the file names taken in the temporary directory of the test.
+    The connection pools of the library are closed after the test, so that no file stays open.
+    """
+    def make(name, transactions, **tables):
+        return write_mmbak(str(tmp_path / name), transactions, **tables)
+    yield make
+    close_pools()
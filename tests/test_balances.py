@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from mmbak_analysis_lib.balances import Balances, load_balances
+
+def day_ms(date):
+    return int(pd.Timestamp(date).value // 1_000_000)
+
+def transaction(uid, date, do_type, money, asset, to_asset=None, deleted=0):
+    return {'uid': uid, 'ZDATE': day_ms(date), 'DO_TYPE': do_type, 'ZMONEY': money, 'assetUid': asset,
+            'toAssetUid': to_asset, 'IS_DEL': deleted, 'ctgUid': None if do_type == 3 else 'ctg-food',
+            'currencyUid': 'cur-cad'}
+
+transactions = [
+    transaction('salary', '2023-01-01 09:00', 0, 1000.0, 'ast-chequing'),
+    transaction('rent', '2023-01-02 10:00', 1, 800.10, 'ast-chequing'),
+    transaction('lunch', '2023-01-02 12:00', 1, 12.35, 'ast-credit'),
+    transaction('payment', '2023-01-05 08:00', 3, 12.35, 'ast-chequing', 'ast-credit'),
+    transaction('refund', '2023-01-07 18:00', 0, 0.1, 'ast-credit'),
+    transaction('deleted', '2023-01-03 10:00', 1, 500.0, 'ast-chequing', deleted=1),
+]
+
+def reference_entries():
+    """
+    Signed entries of the accounts, written out by hand from the transactions above.
+    """
+    return pd.DataFrame([
+        ('Chequing', '2023-01-01 09:00', 1000.0), ('Chequing', '2023-01-02 10:00', -800.10),
+        ('Credit', '2023-01-02 12:00', -12.35), ('Chequing', '2023-01-05 08:00', -12.35),
+        ('Credit', '2023-01-05 08:00', 12.35), ('Credit', '2023-01-07 18:00', 0.1),
+    ], columns=['Account', 'Date', 'Amount']).assign(Date=lambda df: pd.to_datetime(df['Date']))
+
+def reference_balance(entries, account, end):
+    return entries.loc[(entries['Account'] == account) & (entries['Date'] <= end), 'Amount'].sum()
+
+def test_as_of_matches_cumulative_sum(make_mmbak):
+    balances = load_balances(make_mmbak('balances.mmbak', transactions))
+    entries = reference_entries()
+
+    dates = ['2022-12-31', '2023-01-01', '2023-01-02', '2023-01-04', '2023-01-05 07:59', '2023-01-05', '2023-02-01']
+    df = balances.as_of([pd.Timestamp(date) for date in dates])
+    for date, row in zip(dates, df.itertuples(index=False)):
+        timestamp = pd.Timestamp(date)
+        # Dates without a time include the whole day
+        end = timestamp + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1) if timestamp == timestamp.normalize() else timestamp
+        for account, value in zip(df.columns, row):
+            assert np.isclose(value, reference_balance(entries, account, end)), (date, account)
+    # One date gives a Series
+    assert balances.as_of('2023-01-02').to_dict() == {'Chequing': 199.9, 'Credit': -12.35}
+
+def test_history_running_balance(make_mmbak):
+    history = load_balances(make_mmbak('balances.mmbak', transactions)).history()
+    entries = reference_entries().sort_values(['Account', 'Date'], kind='stable', ignore_index=True)
+    expected = entries.groupby('Account')['Amount'].cumsum()
+    assert history['Account'].astype(str).tolist() == entries['Account'].tolist()
+    np.testing.assert_allclose(history['Balance'].to_numpy(), expected.to_numpy())
+
+def test_accounts_without_entries():
+    ledger = pd.DataFrame({'Account': ['A', 'B'], 'Date': pd.to_datetime(['2023-01-10', '2023-01-20']).astype('datetime64[ms]'),
+                           'Amount': np.array([150, -275], dtype=np.int64)})
+    balances = Balances(ledger)
+    # B has no entry at or before the date, so its balance is 0
+    assert balances.as_of('2023-01-15').to_dict() == {'A': 1.5, 'B': 0.0}
+
+def test_opening_balances(make_mmbak):
+    balances = load_balances(make_mmbak('balances.mmbak', transactions), opening_balances={'Chequing': 50.25, 'Savings': 10.0})
+    entries = pd.concat([reference_entries(), pd.DataFrame({'Account': ['Chequing', 'Savings'], 'Date': pd.Timestamp(0),
+                                                            'Amount': [50.25, 10.0]})], ignore_index=True)
+    df = balances.as_of([pd.Timestamp('2023-01-02'), pd.Timestamp('2023-02-01')])
+    for date, row in df.iterrows():
+        for account, value in row.items():
+            end = date + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1)
+            assert np.isclose(value, reference_balance(entries, account, end)), (date, account)
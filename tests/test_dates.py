@@ -0,0 +1,38 @@
+from datetime import datetime
+import pandas as pd
+import pytest
+from dates import format_dates, known_date_formats, parse_dates
+
+def reference_parse(value):
+    """
+    Parses one date with the first known format that fits it, element by element.
+    """
+    if isinstance(value, datetime):
+        return pd.Timestamp(value)
+    if value is None or value == '':
+        return pd.NaT
+    for date_format in known_date_formats:
+        try:
+            return pd.Timestamp(datetime.strptime(value, date_format))
+        except ValueError:
+            pass
+    raise ValueError(value)
+
+def test_mixed_formats_match_reference():
+    values = ['01/31/2023', '2023/02/01 13:45:10', '2023/02/02', '2023-02-03 08:00:00', '2023-02-04',
+              datetime(2023, 2, 5, 9, 30), None, '', '12/1/2022', '2023/2/6']
+    series = pd.Series(values, index=range(10, 20), dtype=object)
+    parsed = parse_dates(series)
+    expected = pd.Series([reference_parse(value) for value in values], index=series.index, dtype='datetime64[us]')
+    pd.testing.assert_series_equal(parsed, expected)
+
+def test_unknown_format_raises():
+    with pytest.raises(ValueError, match="'31.01.2023'"):
+        parse_dates(pd.Series(['2023-01-01', '31.01.2023']))
+
+def test_datetime_column_unchanged_and_formatting_round_trip():
+    dates = pd.Series([pd.Timestamp(2023, 1, 1), pd.Timestamp(2023, 1, 2, 10, 11, 12)])
+    assert parse_dates(dates) is dates
+    formatted = format_dates(dates)
+    assert formatted.tolist() == ['2023/01/01', '2023/01/02 10:11:12']
+    pd.testing.assert_series_equal(parse_dates(formatted), dates.astype('datetime64[us]'))
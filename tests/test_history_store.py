@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+import pytest
+from history_store import load_history, load_workbook_cached
+from instrumentation import start_run_report, stop_run_report
+
+def write_workbook(path, amounts):
+    # MM workbooks end with a second 'Account' column, holding the amounts again
+    df = pd.DataFrame({
+        'Date': pd.date_range('2023-01-01', periods=len(amounts), freq='D'), 'Account': 'Chequing',
+        'Category': 'Food', 'Subcategory': 'Lunch', 'Note': 'note', 'CAD': amounts, 'Income/Expense': 'Exp.',
+        'Description': 'description', 'Amount': amounts, 'Currency': 'CAD', 'Account ': amounts,
+    })
+    df.to_excel(path, sheet_name='Money Manager', index=False)
+
+@pytest.fixture
+def report():
+    report = start_run_report()
+    yield report
+    stop_run_report()
+
+def test_cache_miss_then_hit(tmp_path, report):
+    workbook = tmp_path / 'history.xlsx'
+    write_workbook(workbook, [12.5, 3.0])
+    first = load_workbook_cached(str(workbook), cache_dir=str(tmp_path / 'cache'))
+    second = load_workbook_cached(str(workbook), cache_dir=str(tmp_path / 'cache'))
+    assert report.counters == {'history_cache_misses': 1, 'history_cache_hits': 1}
+    # The dtype of the categories may change in the Parquet round trip, the values may not
+    pd.testing.assert_frame_equal(first, second, check_dtype=False, check_categorical=False)
+    # The workbook amounts are in dollars, even the whole-dollar ones
+    assert first['CAD'].tolist() == [1250, 300]
+    assert first.columns[-1] == 'Account.1'
+
+def test_changed_workbook_invalidates_cache(tmp_path, report):
+    workbook = tmp_path / 'history.xlsx'
+    write_workbook(workbook, [12.5, 3.0])
+    load_workbook_cached(str(workbook), cache_dir=str(tmp_path / 'cache'))
+
+    write_workbook(workbook, [12.5, 3.0, 7.25])
+    # Make sure that the modification time changes even on file systems with a coarse one
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    df = load_workbook_cached(str(workbook), cache_dir=str(tmp_path / 'cache'))
+    assert report.counters == {'history_cache_misses': 2}
+    assert df['CAD'].tolist() == [1250, 300, 725]
+
+def test_same_name_in_different_directories(tmp_path, report):
+    os.makedirs(tmp_path / '2022')
+    os.makedirs(tmp_path / '2023')
+    write_workbook(tmp_path / '2022' / 'history.xlsx', [1.0])
+    write_workbook(tmp_path / '2023' / 'history.xlsx', [2.0, 3.0])
+    paths = [str(tmp_path / '2022' / 'history.xlsx'), str(tmp_path / '2023' / 'history.xlsx')]
+    df = load_history(paths, cache_dir=str(tmp_path / 'cache'))
+    assert df['CAD'].tolist() == [100, 200, 300]
+    df = load_history(paths, cache_dir=str(tmp_path / 'cache'))
+    assert df['CAD'].tolist() == [100, 200, 300]
+    assert report.counters == {'history_cache_misses': 2, 'history_cache_hits': 2}
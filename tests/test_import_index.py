@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from import_index import ImportIndex
+from instrumentation import start_run_report, stop_run_report
+
+def statement(rows):
+    return pd.DataFrame(rows, columns=['Account Number', 'Date', 'Description 1', 'Description 2', 'CAD$'])
+
+first_statement = statement([
+    ('Chequing', '1/5/2023', 'COFFEE SHOP', '', -4.5),
+    ('Chequing', '1/5/2023', 'COFFEE SHOP', '', -4.5), # Same purchase twice on the same day
+    ('Chequing', '1/10/2023', 'PAYROLL', 'ACME', 1000.0),
+    ('Credit', '1/12/2023', 'GROCERY', 'STORE 12', -56.78),
+])
+
+@pytest.fixture
+def index(tmp_path):
+    index = ImportIndex(str(tmp_path / 'import_index.sqlite'))
+    yield index
+    index.close()
+
+def test_reimport_gives_nothing(tmp_path, index):
+    new_df, fingerprints = index.filter_new(first_statement)
+    # Nothing imported yet: everything is new, the repeated purchase included
+    pd.testing.assert_frame_equal(new_df, first_statement)
+    index.record(new_df, fingerprints)
+    assert index.watermarks() == {'Chequing': '2023-01-10', 'Credit': '2023-01-12'}
+
+    new_df, fingerprints = index.filter_new(first_statement)
+    assert new_df.empty and fingerprints.empty
+
+    # Also after reopening the index, as in the next run
+    reopened = ImportIndex(str(tmp_path / 'import_index.sqlite'))
+    assert reopened.filter_new(first_statement)[0].empty
+    reopened.close()
+
+def test_overlapping_statement_gives_only_new_rows(index):
+    index.record(*index.filter_new(first_statement))
+    second_statement = statement([
+        ('Chequing', '1/5/2023', 'COFFEE SHOP', '', -4.5),
+        ('Chequing', '1/5/2023', 'COFFEE SHOP', '', -4.5),
+        ('Chequing', '1/5/2023', 'COFFEE SHOP', '', -4.5), # A third equal purchase, posted late
+        ('Chequing', '1/10/2023', 'PAYROLL', 'ACME', 1000.0),
+        ('Credit', '1/12/2023', 'GROCERY', 'STORE 12', -56.78),
+        ('Credit', '1/13/2023', 'GROCERY', 'STORE 12', -56.78),
+    ])
+    new_df, fingerprints = index.filter_new(second_statement)
+    assert new_df.index.tolist() == [2, 5]
+    index.record(new_df, fingerprints)
+    assert index.filter_new(second_statement)[0].empty
+
+def test_stale_rows_are_counted(index):
+    index.record(*index.filter_new(first_statement))
+    late_statement = statement([
+        ('Chequing', '12/1/2022', 'OLD', '', -1.0), # More than 7 days before the watermark of Chequing
+        ('Chequing', '1/6/2023', 'LATE POSTING', '', -2.0), # Within the slack
+        ('Savings', '12/1/2022', 'NEW ACCOUNT', '', 5.0), # No watermark yet
+    ])
+    report = start_run_report()
+    try:
+        new_df, _ = index.filter_new(late_statement)
+    finally:
+        stop_run_report()
+    assert new_df['Description 1'].tolist() == ['LATE POSTING', 'NEW ACCOUNT']
+    assert report.counters == {'import_index_stale_rows': 1}
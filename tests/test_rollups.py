@@ -0,0 +1,73 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from mmbak_analysis_lib.rollups import RollupStore
+
+def day_ms(date):
+    return int(pd.Timestamp(date).value // 1_000_000)
+
+transactions = [
+    {'uid': 'lunch-1', 'ZDATE': day_ms('2023-01-05 12:00'), 'DO_TYPE': 1, 'ZMONEY': 12.5, 'ctgUid': 'ctg-food-lunch'},
+    {'uid': 'lunch-2', 'ZDATE': day_ms('2023-01-20 12:00'), 'DO_TYPE': 1, 'ZMONEY': 7.25, 'ctgUid': 'ctg-food-lunch'},
+    {'uid': 'food-1', 'ZDATE': day_ms('2023-01-31 23:00'), 'DO_TYPE': 1, 'ZMONEY': 40.0, 'ctgUid': 'ctg-food'},
+    {'uid': 'food-2', 'ZDATE': day_ms('2023-02-01 08:00'), 'DO_TYPE': 1, 'ZMONEY': 15.0, 'ctgUid': 'ctg-food'},
+    {'uid': 'salary-1', 'ZDATE': day_ms('2023-01-15'), 'DO_TYPE': 0, 'ZMONEY': 1000.0, 'ctgUid': 'ctg-salary'},
+    {'uid': 'deleted', 'ZDATE': day_ms('2023-01-10'), 'DO_TYPE': 1, 'ZMONEY': 99.0, 'ctgUid': 'ctg-food', 'IS_DEL': 1},
+]
+for row in transactions:
+    row.update({'UTIME': row['ZDATE'], 'syncVersion': 1, 'assetUid': 'ast-chequing', 'currencyUid': 'cur-cad'})
+    row.setdefault('IS_DEL', 0)
+
+def reference_totals(mmbak_file, types=(1,)):
+    """
+    Totals per month and category computed with pandas over all rows of INOUTCOME.
+    """
+    connection = sqlite3.connect(mmbak_file)
+    df = pd.read_sql_query("SELECT * FROM INOUTCOME", connection)
+    categories = pd.read_sql_query("SELECT uid, NAME, pUid FROM ZCATEGORY", connection).set_index('uid')
+    connection.close()
+    df = df[(df['IS_DEL'] == 0) & df['DO_TYPE'].isin(types)]
+    parent = df['ctgUid'].map(categories['pUid'])
+    df = df.assign(Period=pd.to_datetime(df['ZDATE'], unit='ms').dt.to_period('M').dt.to_timestamp(),
+                   Category=parent.fillna(df['ctgUid']).map(categories['NAME']))
+    totals = df.groupby(['Period', 'Category']).agg(Amount=('ZMONEY', 'sum'), Count=('ZMONEY', 'size')).reset_index()
+    return totals.sort_values(['Period', 'Category'], ignore_index=True)
+
+def assert_same_totals(rollup_df, reference_df):
+    rollup_df = rollup_df.sort_values(['Period', 'Category'], ignore_index=True)
+    assert list(rollup_df['Period']) == list(reference_df['Period'])
+    assert list(rollup_df['Category'].astype(str)) == list(reference_df['Category'])
+    np.testing.assert_allclose(rollup_df['Amount'].to_numpy(dtype=float), reference_df['Amount'].to_numpy(dtype=float))
+    assert list(rollup_df['Count']) == list(reference_df['Count'])
+
+def test_sync_matches_groupby(make_mmbak, tmp_path):
+    mmbak_file = make_mmbak('first.mmbak', transactions)
+    store = RollupStore(str(tmp_path / 'rollups.sqlite'))
+
+    assert store.sync(mmbak_file) == {'changed': 5, 'removed': 0}
+    assert_same_totals(store.query(by=('category',), period='month'), reference_totals(mmbak_file))
+    # Subcategories are summed into their category
+    assert store.query(by=('category',), period=None)['Amount'].tolist() == [74.75]
+    store.close()
+
+def test_incremental_sync_matches_groupby(make_mmbak, tmp_path):
+    store = RollupStore(str(tmp_path / 'rollups.sqlite'))
+    store.sync(make_mmbak('first.mmbak', transactions))
+
+    later = [dict(row) for row in transactions if row['uid'] != 'food-2']  # removed from the backup
+    for row in later:
+        if row['uid'] == 'lunch-1':
+            row.update({'ZMONEY': 20.0, 'UTIME': row['UTIME'] + 1000, 'syncVersion': 2})
+        if row['uid'] == 'lunch-2':
+            row.update({'IS_DEL': 1, 'UTIME': row['UTIME'] + 1000, 'syncVersion': 2})
+    later.append({'uid': 'food-3', 'ZDATE': day_ms('2023-03-03'), 'UTIME': day_ms('2023-03-03'), 'DO_TYPE': 1,
+                  'ZMONEY': 5.0, 'ctgUid': 'ctg-food', 'IS_DEL': 0, 'syncVersion': 1,
+                  'assetUid': 'ast-chequing', 'currencyUid': 'cur-cad'})
+    second_file = make_mmbak('second.mmbak', later)
+
+    assert store.sync(second_file) == {'changed': 2, 'removed': 2}
+    assert_same_totals(store.query(by=('category',), period='month'), reference_totals(second_file))
+    # An already synced backup is skipped
+    assert store.sync(second_file) == {'changed': 0, 'removed': 0}
+    assert_same_totals(store.query(by=('category',), period='month'), reference_totals(second_file))
+    store.close()
@@ -0,0 +1,37 @@
+from decimal import Decimal, InvalidOperation
+import numpy as np
+import pandas as pd
+from schema import enforce_schema, from_cents, to_cents
+
+def reference_cents(value):
+    """
+    Converts one amount to cents with exact decimal arithmetic.
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return 0
+    text = str(value).strip()
+    negative = text.startswith('(') and text.endswith(')')
+    text = text.strip('()').replace(',', '').replace('$', '').strip()
+    try:
+        cents = (Decimal(text) * 100).quantize(Decimal(1))
+    except InvalidOperation:
+        return 0
+    return -int(cents) if negative else int(cents)
+
+def test_formatted_amounts_match_reference():
+    values = ['1,234.50', '(5.00)', '12', '-0.01', ' $3,000,000.99 ', '($1,000.01)', '0.105', 'abc', '', None, 7, 2.5]
+    series = pd.Series(values, name='CAD', dtype=object)
+    assert to_cents(series).tolist() == [reference_cents(value) for value in values]
+    assert to_cents(series)[:2].tolist() == [123450, -500]
+
+def test_numeric_amounts_and_round_trip():
+    series = pd.Series([0.1, 0.2, -19.99, 1234.5, np.nan], name='Amount')
+    cents = to_cents(series)
+    assert cents.dtype == 'int64'
+    assert cents.tolist() == [10, 20, -1999, 123450, 0]
+    np.testing.assert_allclose(from_cents(cents), series.fillna(0))
+
+def test_enforce_schema_reads_formatted_amounts():
+    df = enforce_schema(pd.DataFrame({'CAD': ['1,234.50', '(5.00)'], 'Amount': [3, 4]}), integer_cents=False)
+    assert df['CAD'].tolist() == [123450, -500]
+    assert df['Amount'].tolist() == [300, 400]
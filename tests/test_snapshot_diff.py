@@ -0,0 +1,50 @@
+import pandas as pd
+from mmbak_analysis_lib.snapshot_diff import diff_snapshots, summarize_changes
+
+def transaction(uid, version=1, money=10.0, deleted=0):
+    return {'uid': uid, 'ZDATE': 1672531200000, 'DO_TYPE': 1, 'ZMONEY': money, 'IS_DEL': deleted, 'syncVersion': version,
+            'assetUid': 'ast-chequing', 'ctgUid': 'ctg-food', 'currencyUid': 'cur-cad'}
+
+def changes_of(df):
+    return dict(zip(df['uid'], df['change'].astype(str)))
+
+def test_inserted_updated_and_deleted_rows(make_mmbak):
+    old_file = make_mmbak('old.mmbak', [
+        transaction('same'), transaction('updated'), transaction('removed'), transaction('undeleted', deleted=1),
+        transaction('flagged'),
+    ])
+    new_file = make_mmbak('new.mmbak', [
+        transaction('same'), transaction('updated', version=2, money=12.5), transaction('undeleted', version=2),
+        transaction('flagged', version=2, deleted=1), transaction('new'),
+    ])
+
+    changes = diff_snapshots(old_file, new_file, columns={'INOUTCOME': ['ZMONEY']})
+    inoutcome = changes['INOUTCOME']
+    assert changes_of(inoutcome) == {'new': 'inserted', 'undeleted': 'inserted', 'updated': 'updated',
+                                     'removed': 'deleted', 'flagged': 'deleted'}
+    updated = inoutcome.set_index('uid').loc['updated']
+    assert (updated['old_version'], updated['new_version'], updated['ZMONEY']) == (1, 2, 12.5)
+    assert inoutcome.set_index('uid')['ZMONEY'].isna()[['removed', 'flagged']].all()
+
+def test_tables_without_sync_version_compare_the_values(make_mmbak):
+    currencies = [{'uid': 'cur-cad', 'ISO': 'CAD', 'NAME': 'Canadian dollar', 'SYMBOL': '$'},
+                  {'uid': 'cur-usd', 'ISO': 'USD', 'NAME': 'US dollar', 'SYMBOL': 'US$'}]
+    old_file = make_mmbak('old.mmbak', [], currencies=currencies)
+    new_file = make_mmbak('new.mmbak', [], currencies=[
+        {'uid': 'cur-cad', 'ISO': 'CAD', 'NAME': 'Canadian dollar', 'SYMBOL': 'C$'},
+        {'uid': 'cur-usd', 'ISO': 'USD', 'NAME': 'US dollar', 'SYMBOL': 'US$'},
+        {'uid': 'cur-eur', 'ISO': 'EUR', 'NAME': 'Euro', 'SYMBOL': '€'},
+    ])
+
+    changes = diff_snapshots(old_file, new_file)
+    assert changes_of(changes['CURRENCY']) == {'cur-cad': 'updated', 'cur-eur': 'inserted'}
+    assert changes['INOUTCOME'].empty
+    # BUDGET is missing from both snapshots
+    assert 'BUDGET' not in changes
+
+def test_summarize_changes(make_mmbak):
+    old_file = make_mmbak('old.mmbak', [transaction('a'), transaction('b')])
+    new_file = make_mmbak('new.mmbak', [transaction('b', version=2), transaction('c'), transaction('d')])
+
+    summary = summarize_changes(diff_snapshots(old_file, new_file, tables=('INOUTCOME',)))
+    assert summary.loc['INOUTCOME'].to_dict() == {'inserted': 2, 'updated': 1, 'deleted': 1}
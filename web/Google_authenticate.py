@@ -30,4 +30,5 @@ def authenticate_google():
     service = build('drive', 'v3', credentials=creds)
     return service
 
-authenticate_google()
+if __name__ == "__main__":
+    authenticate_google()
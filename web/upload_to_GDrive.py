@@ -54,13 +54,20 @@ def upload_file(service, file_path, mime_type, folder_id): #{{{
         print(f"Uploaded File ID: {file.get('id')}")
 #}}}
 
-# Authenticate with Google Drive
-service = authenticate_google()
+def main(tsv_file='./data/Funds2.tsv', folder_id='16MN1Dk06bZp42rsVDjtjr77ZX2cZu7uu', mime_type='text/tab-separated-values'): #{{{
+    """
+    Uploads the exported file to the Google Drive folder.
 
-# Example usage: replace '/path/to/your/file.tsv', 'your-folder-id' with your file path and folder ID
-tsv_file = './data/Funds2.tsv'
-folder_id = '16MN1Dk06bZp42rsVDjtjr77ZX2cZu7uu'
-#mime_type =  'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' # xlsx mime
-mime_type = 'text/tab-separated-values' # tsv mime
-upload_file(service,tsv_file, mime_type, folder_id)
+    Args:
+    tsv_file (str): Path of the file to upload.
+    folder_id (str): ID of the Google Drive folder.
+    mime_type (str): MIME type of the file ('text/tab-separated-values' for tsv,
+                     'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' for xlsx).
+    """
+    # Authenticate with Google Drive
+    service = authenticate_google()
+    upload_file(service, tsv_file, mime_type, folder_id)
+#}}}
 
+if __name__ == "__main__":
+    main()